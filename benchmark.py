@@ -0,0 +1,1338 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmarks do sistema de raspagem do PNCP. Os cenários rodam contra um servidor local que imita
+a API do PNCP, de modo que as medições não dependem da latência do pncp.gov.br nem correm o risco
+de provocar limitação de taxa.
+"""
+
+import argparse
+import asyncio
+import configparser
+import contextlib
+import datetime
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+
+import aiohttp
+import pandas as pd
+import py7zr
+from aiohttp import web
+
+import raspagem
+
+# ---------------------------- Servidor PNCP Falso ---------------------------- #
+
+DATA_BASE = datetime.datetime(2024, 1, 1)
+UFS = ('MG', 'SP', 'RJ', 'BA', 'RS', 'PR', 'PE', 'CE')
+MODALIDADES = ('Pregão - Eletrônico', 'Dispensa', 'Concorrência - Eletrônica', 'Inexigibilidade')
+IDS_MODALIDADES = ('6', '8', '4', '9')
+STATUS = ('recebendo_proposta', 'propostas_encerradas', 'encerradas')
+# Situação de cada item (situacaoCompraItem), pelo número do item: em andamento, homologado,
+# cancelado, deserto e fracassado; só os homologados têm resultado
+SITUACOES_ITENS = ('1', '2', '3', '4', '5')
+
+
+class ServidorPNCPFalso:
+    """
+    Servidor aiohttp local que responde às rotas da API do PNCP usadas pelo raspador.
+
+    As respostas levam um 'ETag' derivado do corpo, e requisições com 'If-None-Match' igual
+    recebem 304 sem corpo. Quando 'capacidade' é informada, o servidor simula limitação de taxa: a latência cresce com o
+    número de requisições em andamento e, acima da capacidade, ele responde 429 com Retry-After.
+    Com 'taxa_erro', uma fração das respostas da API vira erro 500, sorteada por um gerador com
+    semente fixa, de modo que execuções com os mesmos parâmetros sejam reprodutíveis. A busca
+    aceita os filtros 'ufs', 'modalidades' e 'status' e, com 'limite_paginas', devolve páginas
+    vazias além do limite, como o limite de paginação da API. Com 'situacoes_itens', os itens
+    trazem 'temResultado' e 'situacaoCompraItem' e só os homologados têm resultados. Em
+    'revisoes', cada licitação alterada (pelo número) tem a data de atualização adiada e ganha
+    um item a mais por revisão.
+
+    Args:
+        latencia: Latência simulada de cada resposta, em segundos.
+        itens_por_licitacao: Número de itens devolvidos por licitação.
+        capacidade: Número de requisições simultâneas suportadas antes de responder 429 (opcional).
+        retry_after: Valor do cabeçalho Retry-After enviado nas respostas 429, em segundos.
+        total_licitacoes: Número de licitações do catálogo sintético da busca.
+        taxa_erro: Fração das respostas da API devolvidas com status 500.
+        tamanho_descricao: Caracteres de texto extra nas descrições de licitações e itens, para
+            simular respostas maiores.
+        semente: Semente do gerador usado no sorteio dos erros.
+        limite_paginas: Última página com resultados na busca (opcional).
+    """
+
+    def __init__(self, latencia=0.005, itens_por_licitacao=5, capacidade=None, retry_after=1, total_licitacoes=100000,
+                 taxa_erro=0.0, tamanho_descricao=0, semente=0, limite_paginas=None):
+        self.latencia = latencia
+        self.taxa_erro = taxa_erro
+        self.enchimento = ('objeto da contratação ' * (tamanho_descricao // 22 + 1))[:tamanho_descricao]
+        self.aleatorio = random.Random(semente)
+        self.arquivos_compactados = False
+        self.situacoes_itens = False
+        self.total_licitacoes = total_licitacoes
+        self.limite_paginas = limite_paginas
+        self.filtradas = {}
+        self.novas = 0
+        self.revisoes = {}
+        self.itens_por_licitacao = itens_por_licitacao
+        self.capacidade = capacidade
+        self.retry_after = retry_after
+        self.em_andamento = 0
+        self.suporta_range = True
+        self.diretorio_arquivos = None
+        self.url_base = None
+        self._runner = None
+        self.zerar_contadores()
+
+    def _registrar(self, request):
+        self.requisicoes += 1
+        self.conexoes.add(request.transport.get_extra_info('peername'))
+
+    async def _responder(self, request, dados):
+        self._registrar(request)
+        if self.capacidade and self.em_andamento >= self.capacidade:
+            self.limitadas += 1
+            return web.Response(status=429, headers={'Retry-After': str(self.retry_after)})
+        self.em_andamento += 1
+        self.pico_em_andamento = max(self.pico_em_andamento, self.em_andamento)
+        try:
+            latencia = self.latencia
+            if self.capacidade:
+                # Congestionamento: a latência cresce com a ocupação do servidor
+                latencia *= 1 + 4 * self.em_andamento / self.capacidade
+            if latencia:
+                await asyncio.sleep(latencia)
+            if self.taxa_erro and self.aleatorio.random() < self.taxa_erro:
+                self.erros += 1
+                return web.Response(status=500)
+            corpo = json.dumps(dados).encode()
+            etag = f'"{hashlib.sha1(corpo).hexdigest()[:16]}"'
+            if request.headers.get('If-None-Match') == etag:
+                self.nao_modificadas += 1
+                return web.Response(status=304, headers={'ETag': etag})
+            self.bytes_enviados += len(corpo)
+            return web.Response(body=corpo, content_type='application/json', headers={'ETag': etag})
+        finally:
+            self.em_andamento -= 1
+
+    def licitacao(self, identificador):
+        """
+        Gera a licitação sintética de número 'identificador'; números maiores são mais recentes.
+        """
+        publicacao = DATA_BASE + datetime.timedelta(minutes=identificador)
+        atualizacao = publicacao + datetime.timedelta(days=self.revisoes.get(identificador, 0))
+        return {
+            'numero_controle_pncp': f"{identificador:014d}-1-{identificador:06d}/2024",
+            'orgao_cnpj': f"{identificador:014d}",
+            'ano': '2024',
+            'numero_sequencial': str(identificador),
+            'uf': UFS[identificador % len(UFS)],
+            'modalidade_licitacao_nome': MODALIDADES[identificador % len(MODALIDADES)],
+            'modalidade_licitacao_id': IDS_MODALIDADES[identificador % len(IDS_MODALIDADES)],
+            'status': STATUS[identificador // len(UFS) % len(STATUS)],
+            'description': f"Licitação sintética {identificador} {self.enchimento}".rstrip(),
+            'data_publicacao_pncp': publicacao.strftime('%Y-%m-%dT%H:%M:%S'),
+            'data_atualizacao_pncp': atualizacao.strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+
+    async def busca(self, request):
+        # Catálogo em ordem decrescente de publicação; 'novas' simula publicações posteriores
+        pagina = int(request.query.get('pagina', 1))
+        tam_pagina = int(request.query.get('tam_pagina', 10))
+        mais_recente = self.total_licitacoes + self.novas
+        inicio = (pagina - 1) * tam_pagina
+        filtros = tuple(request.query.get(nome) for nome in ('ufs', 'modalidades', 'status'))
+        if filtros[2] == 'todos':
+            filtros = filtros[:2] + (None,)
+        if any(filtros):
+            identificadores = self.filtrar(mais_recente, *filtros)
+        else:
+            identificadores = range(mais_recente, 0, -1)
+        total = len(identificadores)
+        if self.limite_paginas and pagina > self.limite_paginas:
+            identificadores = []
+        itens = [self.licitacao(identificador) for identificador in identificadores[inicio:inicio + tam_pagina]]
+        return await self._responder(request, {'items': itens, 'total': total})
+
+    def filtrar(self, mais_recente, uf, modalidade, status):
+        chave = (mais_recente, uf, modalidade, status)
+        if chave not in self.filtradas:
+            self.filtradas[chave] = [
+                identificador for identificador in range(mais_recente, 0, -1)
+                if (uf is None or UFS[identificador % len(UFS)] == uf)
+                and (modalidade is None or IDS_MODALIDADES[identificador % len(IDS_MODALIDADES)] == modalidade)
+                and (status is None or STATUS[identificador // len(UFS) % len(STATUS)] == status)
+            ]
+        return self.filtradas[chave]
+
+    async def itens(self, request):
+        pagina = int(request.query.get('pagina', 1))
+        tamanho_pagina = int(request.query.get('tamanhoPagina', 20))
+        inicio = (pagina - 1) * tamanho_pagina + 1
+        quantidade = self.itens_por_licitacao + self.revisoes.get(int(request.match_info['seq']), 0)
+        fim = min(inicio + tamanho_pagina, quantidade + 1)
+        itens = [{'numeroItem': i, 'descricao': f"Item {i} {self.enchimento}".rstrip(), 'valorTotal': 10.0 * i} for i in range(inicio, fim)]
+        if self.situacoes_itens:
+            for item in itens:
+                situacao = SITUACOES_ITENS[(item['numeroItem'] - 1) % len(SITUACOES_ITENS)]
+                item.update({'situacaoCompraItem': situacao, 'temResultado': situacao == '2'})
+        return await self._responder(request, itens)
+
+    async def quantidade_itens(self, request):
+        return await self._responder(request, self.itens_por_licitacao)
+
+    async def arquivos(self, request):
+        if self.arquivos_compactados:
+            # Alterna entre os arquivos .zip e .7zip gerados por gerar_arquivos_compactados
+            extensao = 'zip' if int(request.match_info['seq']) % 2 else '7zip'
+            arquivos = [{'sequencialDocumento': 1, 'titulo': f"edital.{extensao}", 'url': f"{self.url_base}/arquivos/grande.{extensao}"}]
+        else:
+            arquivos = [{'sequencialDocumento': 1, 'titulo': 'edital.pdf', 'url': f"{self.url_base}/arquivos/edital.pdf"}]
+        return await self._responder(request, arquivos)
+
+    async def resultados(self, request):
+        numero_item = int(request.match_info['numero_item'])
+        if self.situacoes_itens and SITUACOES_ITENS[(numero_item - 1) % len(SITUACOES_ITENS)] != '2':
+            return await self._responder(request, [])
+        return await self._responder(request, [{'numeroItem': numero_item, 'sequencialResultado': 1, 'valorTotalHomologado': 9.5}])
+
+    def gerar_arquivos_compactados(self, arquivos_internos=20, tamanho_interno=512 * 1024):
+        """
+        Gera 'grande.zip' e 'grande.7zip' com conteúdo incompressível, simulando editais digitalizados.
+        """
+        self.diretorio_arquivos = tempfile.mkdtemp(prefix='pncp_falso_')
+        nomes = [f"anexo_{i:03d}.pdf" for i in range(arquivos_internos)]
+        with zipfile.ZipFile(os.path.join(self.diretorio_arquivos, 'grande.zip'), 'w', zipfile.ZIP_STORED) as arquivo_zip:
+            for nome in nomes:
+                arquivo_zip.writestr(nome, os.urandom(tamanho_interno))
+        with py7zr.SevenZipFile(os.path.join(self.diretorio_arquivos, 'grande.7zip'), 'w', filters=[{'id': py7zr.FILTER_COPY}]) as arquivo_7z:
+            for nome in nomes:
+                arquivo_7z.writestr(os.urandom(tamanho_interno), nome)
+        # Arquivos pequenos, mas com muitas entradas: a listagem pesa na CPU, não na rede
+        nomes = [f"pasta_{i // 100:03d}/anexo_{i:05d}.txt" for i in range(20000)]
+        with zipfile.ZipFile(os.path.join(self.diretorio_arquivos, 'muitos.zip'), 'w', zipfile.ZIP_DEFLATED) as arquivo_zip:
+            for nome in nomes:
+                arquivo_zip.writestr(nome, b'x' * 64)
+        with py7zr.SevenZipFile(os.path.join(self.diretorio_arquivos, 'muitos.7zip'), 'w') as arquivo_7z:
+            for nome in nomes:
+                arquivo_7z.writestr(b'x' * 64, nome)
+
+    async def arquivo(self, request):
+        # Serve os arquivos compactados gerados, respeitando o cabeçalho Range se 'suporta_range'
+        self._registrar(request)
+        caminho = os.path.join(self.diretorio_arquivos, request.match_info['nome'])
+        if not os.path.exists(caminho):
+            return web.Response(status=404)
+        tamanho = os.path.getsize(caminho)
+        if self.suporta_range and request.headers.get('Range'):
+            self.bytes_enviados += len(range(tamanho)[request.http_range])
+            return web.FileResponse(caminho)
+        self.bytes_enviados += tamanho
+        with open(caminho, 'rb') as f:
+            return web.Response(body=f.read(), content_type='application/octet-stream')
+
+    async def iniciar(self):
+        app = web.Application()
+        prefixo = '/api/pncp/v1/orgaos/{cnpj}/compras/{ano}/{seq}'
+        app.router.add_get('/api/search/', self.busca)
+        app.router.add_get(prefixo + '/itens', self.itens)
+        app.router.add_get(prefixo + '/itens/quantidade', self.quantidade_itens)
+        app.router.add_get(prefixo + '/arquivos', self.arquivos)
+        app.router.add_get(prefixo + '/itens/{numero_item}/resultados', self.resultados)
+        app.router.add_get('/arquivos/{nome}', self.arquivo)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', 0)
+        await site.start()
+        porta = site._server.sockets[0].getsockname()[1]
+        self.url_base = f"http://127.0.0.1:{porta}"
+        return self
+
+    async def parar(self):
+        await self._runner.cleanup()
+        if self.diretorio_arquivos:
+            shutil.rmtree(self.diretorio_arquivos, ignore_errors=True)
+
+    def zerar_contadores(self):
+        self.conexoes = set()
+        self.requisicoes = 0
+        self.limitadas = 0
+        self.pico_em_andamento = 0
+        self.nao_modificadas = 0
+        self.bytes_enviados = 0
+        self.erros = 0
+
+def _servir_em_processo(conexao, parametros):
+    """
+    Processo do ServidorEmProcesso: sobe o servidor falso no próprio loop de eventos e atende aos
+    comandos recebidos pela conexão ('zerar', 'contadores' e 'parar').
+    """
+    async def servir():
+        servidor = await ServidorPNCPFalso(**parametros).iniciar()
+        conexao.send(servidor.url_base)
+        loop = asyncio.get_running_loop()
+        while True:
+            comando = await loop.run_in_executor(None, conexao.recv)
+            if comando == 'zerar':
+                servidor.zerar_contadores()
+                conexao.send(None)
+            elif comando == 'contadores':
+                conexao.send({'requisicoes': servidor.requisicoes, 'conexoes': len(servidor.conexoes), 'erros': servidor.erros})
+            elif comando == 'parar':
+                await servidor.parar()
+                conexao.send(None)
+                return
+    asyncio.run(servir())
+
+class ServidorEmProcesso:
+    """
+    ServidorPNCPFalso rodando em um processo próprio, para os cenários em que o processo do
+    benchmark também faz parte do que é medido (ex.: o coordenador do modo distribuído): o servidor
+    não disputa o loop de eventos nem a CPU desse processo.
+
+    Args:
+        parametros: Argumentos repassados ao ServidorPNCPFalso.
+    """
+
+    def __init__(self, **parametros):
+        self.parametros = parametros
+        self.url_base = None
+        self._conexao = None
+        self._processo = None
+
+    def _comando(self, comando):
+        self._conexao.send(comando)
+        return self._conexao.recv()
+
+    def iniciar(self):
+        contexto = multiprocessing.get_context('spawn')
+        self._conexao, conexao_filho = contexto.Pipe()
+        self._processo = contexto.Process(target=_servir_em_processo, args=(conexao_filho, self.parametros), daemon=True)
+        self._processo.start()
+        self.url_base = self._conexao.recv()
+        return self
+
+    def zerar_contadores(self):
+        self._comando('zerar')
+
+    def contadores(self):
+        return self._comando('contadores')
+
+    def parar(self):
+        self._comando('parar')
+        self._processo.join()
+
+# ---------------------------- Utilitários ---------------------------- #
+
+def criar_config(url_base, **ajustes):
+    """
+    Cria uma configuração do raspador apontada para o servidor falso.
+
+    Args:
+        url_base: URL base do servidor falso.
+        ajustes: Chaves de configuração a sobrescrever.
+
+    Returns:
+        config: Dicionário de configurações.
+    """
+    config = raspagem.load_config(raspagem.parse_arguments([]))
+    config.update({
+        'url_base_api': f"{url_base}/api",
+        'tentativas_maximas': 0,
+        'tempo_espera_inicial': 0,
+        'verbose': False,
+    })
+    config.update(ajustes)
+    return config
+
+def registros_sinteticos(total):
+    """
+    Gera licitações sintéticas para alimentar os fetchers de detalhes.
+    """
+    return [
+        {'numero_controle_pncp': f"{i:014d}-1-{i:06d}/2024", 'orgao_cnpj': f"{i:014d}", 'ano': '2024', 'numero_sequencial': str(i)}
+        for i in range(total)
+    ]
+
+def silencioso():
+    """
+    Descarta as mensagens de progresso impressas pelo raspador durante as medições.
+    """
+    return contextlib.redirect_stdout(io.StringIO())
+
+class MonitorLaco:
+    """
+    Mede o atraso do loop de eventos: uma tarefa dorme 'intervalo' segundos repetidamente e
+    registra quanto cada despertar atrasou em relação ao previsto.
+    """
+
+    def __init__(self, intervalo=0.01):
+        self.intervalo = intervalo
+        self.atrasos = []
+        self._tarefa = None
+
+    async def _medir(self):
+        while True:
+            inicio = time.perf_counter()
+            await asyncio.sleep(self.intervalo)
+            self.atrasos.append(time.perf_counter() - inicio - self.intervalo)
+
+    async def __aenter__(self):
+        self._tarefa = asyncio.create_task(self._medir())
+        return self
+
+    async def __aexit__(self, *exc):
+        self._tarefa.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._tarefa
+
+    def resumo(self):
+        atrasos = sorted(self.atrasos) or [0.0]
+        return {
+            'atraso_p95_ms': f"{atrasos[int(0.95 * (len(atrasos) - 1))] * 1000:.1f}",
+            'atraso_max_ms': f"{atrasos[-1] * 1000:.1f}",
+        }
+
+# Resultados impressos na execução atual, na ordem: (nome, métricas)
+RESULTADOS = []
+
+def imprimir_resultado(nome, metricas):
+    RESULTADOS.append((nome, dict(metricas)))
+    colunas = ', '.join(f"{chave}={valor}" for chave, valor in metricas.items())
+    print(f"{nome:<28} {colunas}")
+
+def pico_rss_mb(uso=None):
+    """
+    Pico de memória residente (RSS) de um processo, em MB. Sem 'uso', mede o próprio processo.
+    """
+    uso = uso or resource.getrusage(resource.RUSAGE_SELF)
+    # ru_maxrss vem em KB no Linux e em bytes no macOS
+    return uso.ru_maxrss / (1024 ** 2 if sys.platform == 'darwin' else 1024)
+
+def custo_checkpoint(resumo):
+    """
+    Soma, a partir do resumo de métricas do raspador, o tempo gasto nas gravações em lote.
+
+    Returns:
+        (segundos, gravacoes): Tempo total e número de gravações em lote.
+    """
+    histogramas = resumo['histogramas'].get('duracao_gravacao_segundos', {})
+    return sum(h['soma'] for h in histogramas.values()), sum(h['contagem'] for h in histogramas.values())
+
+# ---------------------------- Cenários ---------------------------- #
+
+async def cenario_sessao(servidor, total, tamanho_lote, conexoes):
+    """
+    Compara uma sessão nova por lote (comportamento anterior de main()) com a sessão
+    compartilhada criada por raspagem.criar_sessao.
+    """
+    registros = registros_sinteticos(total)
+    config = criar_config(servidor.url_base, numero_maximo_conexoes=conexoes)
+
+    async def consumir(session, lote):
+        limitador = raspagem.criar_limitador(config)
+        with silencioso():
+            async for _ in raspagem.fetch_detalhes(session, limitador, lote, 'itens', config):
+                pass
+
+    # Uma sessão aiohttp padrão por lote de registros
+    servidor.zerar_contadores()
+    inicio = time.perf_counter()
+    for i in range(0, total, tamanho_lote):
+        async with aiohttp.ClientSession() as session:
+            await consumir(session, registros[i:i + tamanho_lote])
+    duracao = time.perf_counter() - inicio
+    imprimir_resultado('sessao_por_lote', {
+        'requisicoes': servidor.requisicoes,
+        'conexoes_abertas': len(servidor.conexoes),
+        'req_por_s': f"{servidor.requisicoes / duracao:.1f}",
+    })
+
+    # Uma única sessão ajustada para toda a execução
+    servidor.zerar_contadores()
+    inicio = time.perf_counter()
+    async with raspagem.criar_sessao(config) as session:
+        for i in range(0, total, tamanho_lote):
+            await consumir(session, registros[i:i + tamanho_lote])
+    duracao = time.perf_counter() - inicio
+    imprimir_resultado('sessao_compartilhada', {
+        'requisicoes': servidor.requisicoes,
+        'conexoes_abertas': len(servidor.conexoes),
+        'req_por_s': f"{servidor.requisicoes / duracao:.1f}",
+    })
+
+async def cenario_limitacao(servidor, total, tamanho_lote, conexoes):
+    """
+    Executa as requisições de itens contra um servidor que limita a taxa (429 + Retry-After),
+    comparando a concorrência fixa com o limitador adaptativo (AIMD).
+    """
+    registros = registros_sinteticos(total)
+    servidor.capacidade = servidor.capacidade or max(2, conexoes // 2)
+    variantes = {
+        'concorrencia_fixa': {'controle_adaptativo': False},
+        'concorrencia_adaptativa': {'controle_adaptativo': True},
+    }
+    for nome, ajustes in variantes.items():
+        config = criar_config(
+            servidor.url_base,
+            numero_maximo_conexoes=conexoes,
+            concorrencia_maxima=conexoes * 4 if ajustes['controle_adaptativo'] else conexoes,
+            tentativas_maximas=8,
+            latencia_alvo_p95=servidor.latencia * 4,
+            **ajustes,
+        )
+        limitador = raspagem.criar_limitador(config)
+        servidor.zerar_contadores()
+        falhas = 0
+        inicio = time.perf_counter()
+        async with raspagem.criar_sessao(config) as session:
+            with silencioso():
+                async for _, itens in raspagem.fetch_detalhes(session, limitador, registros, 'itens', config):
+                    falhas += itens is None
+        duracao = time.perf_counter() - inicio
+        imprimir_resultado(nome, {
+            'concluidas': total - falhas,
+            'falhas': falhas,
+            'respostas_429': servidor.limitadas,
+            'pico_simultaneas': servidor.pico_em_andamento,
+            'limite_final': f"{limitador.limite:.1f}",
+            'duracao_s': f"{duracao:.2f}",
+        })
+
+async def cenario_incremental(servidor, total, tamanho_lote, conexoes):
+    """
+    Mede o custo de uma atualização incremental: uma carga inicial seguida de uma nova execução
+    após a publicação de algumas licitações, comparada com a varredura completa equivalente.
+    """
+    config = criar_config(servidor.url_base, numero_maximo_conexoes=conexoes, tam_pagina=tamanho_lote, ordenacao=['relevancia', 'data', '-data'])
+    paginas = list(range(1, max(2, total // tamanho_lote + 1)))
+    with tempfile.TemporaryDirectory() as diretorio:
+        armazenamento = raspagem.ArmazenamentoSQLite(os.path.join(diretorio, 'raspagem.db'))
+        limitador = raspagem.criar_limitador(config)
+        async with raspagem.criar_sessao(config) as session:
+            for nome, novas in (('carga_inicial', 0), ('atualizacao_incremental', tamanho_lote // 3)):
+                servidor.novas = novas
+                servidor.zerar_contadores()
+                marcas = {}
+                with silencioso():
+                    fluxo = raspagem.fetch_licitacoes_incremental(session, limitador, armazenamento, config['tipos_documento'], paginas, config, marcas)
+                    gravadas = await raspagem.gravar_licitacoes(fluxo, armazenamento, config)
+                for chave, valor in marcas.items():
+                    armazenamento.gravar_estado(chave, valor)
+                imprimir_resultado(nome, {'requisicoes': servidor.requisicoes, 'licitacoes_recebidas': gravadas})
+
+            servidor.zerar_contadores()
+            with silencioso():
+                fluxo = raspagem.fetch_licitacoes(session, limitador, config['tipos_documento'], config['ordenacao'], paginas, config)
+                gravadas = await raspagem.gravar_licitacoes(fluxo, armazenamento, config)
+            imprimir_resultado('varredura_completa', {'requisicoes': servidor.requisicoes, 'licitacoes_recebidas': gravadas})
+        armazenamento.fechar()
+    servidor.novas = 0
+
+async def cenario_cache(servidor, total, tamanho_lote, conexoes):
+    """
+    Mede o cache de respostas em três passagens sobre os mesmos itens: cache vazio,
+    revalidação com requisições condicionais (304) e replay offline a partir do disco.
+    """
+    registros = registros_sinteticos(total)
+    with tempfile.TemporaryDirectory() as diretorio:
+        cache = raspagem.CacheRespostas(os.path.join(diretorio, 'cache.db'), ttl=86400, tamanho_maximo=1024 ** 3)
+        for nome, replay in (('cache_vazio', False), ('revalidacao', False), ('replay', True)):
+            config = criar_config(servidor.url_base, numero_maximo_conexoes=conexoes, modo_replay=replay)
+            limitador = raspagem.criar_limitador(config)
+            servidor.zerar_contadores()
+            falhas = 0
+            inicio = time.perf_counter()
+            async with raspagem.criar_sessao(config) as session:
+                with silencioso():
+                    async for _, itens in raspagem.fetch_detalhes(session, limitador, registros, 'itens', config, cache=cache):
+                        falhas += itens is None
+            duracao = time.perf_counter() - inicio
+            imprimir_resultado(nome, {
+                'requisicoes': servidor.requisicoes,
+                'respostas_304': servidor.nao_modificadas,
+                'bytes_recebidos': servidor.bytes_enviados,
+                'falhas': falhas,
+                'duracao_s': f"{duracao:.2f}",
+            })
+        cache.fechar()
+
+def itens_sinteticos(total, itens_por_licitacao=10, inicio=0):
+    """
+    Gera itens no formato da API, com campos repetitivos, valores, datas e um objeto aninhado.
+    Os itens são numerados a partir de 'inicio'.
+    """
+    return [
+        {
+            'numero_controle_pncp': f"{i // itens_por_licitacao:014d}-1-{i // itens_por_licitacao:06d}/2024",
+            'numeroItem': i % itens_por_licitacao + 1,
+            'descricao': f"Item sintético {i}",
+            'orgao_cnpj': f"{i // itens_por_licitacao % 500:014d}",
+            'ano': '2024',
+            'materialOuServico': 'M' if i % 3 else 'S',
+            'materialOuServicoNome': 'Material' if i % 3 else 'Serviço',
+            'unidadeMedida': ('UN', 'CX', 'KG', 'L')[i % 4],
+            'situacaoCompraItemNome': ('Em andamento', 'Homologado', 'Deserto')[i % 3],
+            'quantidade': i % 50 + 1,
+            'valorUnitarioEstimado': 1.5 * (i % 1000),
+            'valorTotal': 1.5 * (i % 1000) * (i % 50 + 1),
+            'orcamentoSigiloso': False,
+            'temResultado': bool(i % 2),
+            'dataInclusao': f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}T10:00:00",
+            'dataAtualizacao': f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}T11:00:00",
+            'catalogo': {'id': i % 20, 'nome': f"Catálogo {i % 20}"},
+            'Resultados verificados': False,
+        }
+        for i in range(inicio, inicio + total)
+    ]
+
+def processamento_legado(registros):
+    """
+    Reproduz o processamento anterior dos detalhes: varredura de dicionários coluna a coluna,
+    conversão para string e deduplicação sobre todas as colunas, com tudo tratado como texto,
+    seguido da conversão para o formato do armazenamento.
+    """
+    df = pd.DataFrame(registros)
+    for coluna in df.columns:
+        if df[coluna].apply(lambda x: isinstance(x, dict)).any():
+            df[coluna] = df[coluna].apply(str)
+    df = df.drop_duplicates().astype(str)
+    # Conversão para o formato do armazenamento, valor a valor
+    texto = pd.DataFrame({coluna: df[coluna].map(raspagem._valor_texto) for coluna in df.columns}, dtype=object)
+    return df, texto
+
+def processamento_tipado(registros):
+    df = raspagem.processar_detalhes_registros(registros, pd.DataFrame(), 'itens')
+    return df, raspagem.normalizar_para_texto(df, 'itens')
+
+async def cenario_processamento(servidor, total, tamanho_lote, conexoes):
+    """
+    Compara o processamento legado dos itens com o processamento tipado (achatamento dos objetos,
+    esquema por entidade e deduplicação pela chave), em tempo total até o formato do armazenamento
+    e memória do DataFrame processado.
+    """
+    registros = itens_sinteticos(total * 100)
+    variantes = {
+        'processamento_legado': processamento_legado,
+        'processamento_tipado': processamento_tipado,
+    }
+    for nome, processar in variantes.items():
+        inicio = time.perf_counter()
+        df, _ = processar(registros)
+        duracao = time.perf_counter() - inicio
+        imprimir_resultado(nome, {
+            'linhas': len(df),
+            'memoria_mb': f"{df.memory_usage(deep=True).sum() / 1024 ** 2:.1f}",
+            'duracao_s': f"{duracao:.2f}",
+        })
+
+async def cenario_arquivos(servidor, total, tamanho_lote, conexoes):
+    """
+    Compara a verificação de arquivos compactados por download completo com a leitura por
+    requisições Range, e o fallback quando o servidor não suporta Range.
+    """
+    if servidor.diretorio_arquivos is None:
+        servidor.gerar_arquivos_compactados()
+    quantidade = min(total, 20)
+    registros = pd.DataFrame([
+        {
+            'numero_controle_pncp': f"{i:014d}-1-{i:06d}/2024",
+            'sequencialDocumento': '1',
+            'titulo': f"edital_{i}.{'zip' if i % 2 else '7zip'}",
+            'url': f"{servidor.url_base}/arquivos/grande.{'zip' if i % 2 else '7zip'}",
+        }
+        for i in range(quantidade)
+    ])
+    variantes = {
+        'download_completo': (False, True),
+        'leitura_range': (True, True),
+        'servidor_sem_range': (True, False),
+    }
+    for nome, (leitura_remota, suporta_range) in variantes.items():
+        config = criar_config(servidor.url_base, numero_maximo_conexoes=conexoes, conexoes_arquivos=conexoes, leitura_remota_arquivos=leitura_remota)
+        servidor.suporta_range = suporta_range
+        with tempfile.TemporaryDirectory() as diretorio:
+            armazenamento = raspagem.ArmazenamentoSQLite(os.path.join(diretorio, 'raspagem.db'))
+            armazenamento.upsert('arquivos', registros)
+            servidor.zerar_contadores()
+            inicio = time.perf_counter()
+            async with raspagem.criar_sessao(config) as session:
+                with silencioso():
+                    await raspagem.verify_compressed_files(session, armazenamento, config)
+            duracao = time.perf_counter() - inicio
+            listados = sum(lote['titulo'].str.contains('anexo_000.pdf').sum() for lote in armazenamento.iterar('arquivos', config['tamanho_lote_gravacao']))
+            armazenamento.fechar()
+        imprimir_resultado(nome, {
+            'arquivos_listados': f"{listados}/{quantidade}",
+            'requisicoes': servidor.requisicoes,
+            'mb_recebidos': f"{servidor.bytes_enviados / 1024 ** 2:.1f}",
+            'duracao_s': f"{duracao:.2f}",
+        })
+    servidor.suporta_range = True
+
+async def cenario_documentos(servidor, total, tamanho_lote, conexoes):
+    """
+    Baixa os documentos de várias licitações que publicam os mesmos dois arquivos para o repositório
+    local e verifica os arquivos compactados em seguida. A segunda execução usa um banco novo, mas o
+    mesmo repositório, como faria outro consumidor: nenhum byte deve ser baixado de novo.
+    """
+    if servidor.diretorio_arquivos is None:
+        servidor.gerar_arquivos_compactados()
+    quantidade = min(total, 40)
+    registros = pd.DataFrame([
+        {
+            'numero_controle_pncp': f"{i:014d}-1-{i:06d}/2024",
+            'sequencialDocumento': '1',
+            'titulo': f"edital_{i}.{'zip' if i % 2 else '7zip'}",
+            'url': f"{servidor.url_base}/arquivos/grande.{'zip' if i % 2 else '7zip'}",
+        }
+        for i in range(quantidade)
+    ])
+    with tempfile.TemporaryDirectory() as diretorio_repositorio:
+        for nome in ('primeira_execucao', 'segunda_execucao'):
+            config = criar_config(servidor.url_base, numero_maximo_conexoes=conexoes, conexoes_arquivos=conexoes, baixar_documentos=True)
+            repositorio = raspagem.RepositorioDocumentos(diretorio_repositorio)
+            with tempfile.TemporaryDirectory() as diretorio:
+                armazenamento = raspagem.ArmazenamentoSQLite(os.path.join(diretorio, 'raspagem.db'))
+                armazenamento.upsert('arquivos', registros)
+                servidor.zerar_contadores()
+                inicio = time.perf_counter()
+                async with raspagem.criar_sessao(config) as session:
+                    with silencioso():
+                        await raspagem.baixar_documentos(session, armazenamento, repositorio, config)
+                        await raspagem.verify_compressed_files(session, armazenamento, config, repositorio=repositorio)
+                duracao = time.perf_counter() - inicio
+                armazenados = armazenamento.contar('arquivos') - armazenamento.contar_pendentes('arquivos', 'documento_armazenado')
+                armazenamento.fechar()
+            repositorio.fechar()
+            imprimir_resultado(nome, {
+                'documentos_armazenados': f"{armazenados}/{quantidade}",
+                'requisicoes': servidor.requisicoes,
+                'mb_recebidos': f"{servidor.bytes_enviados / 1024 ** 2:.1f}",
+                'duracao_s': f"{duracao:.2f}",
+            })
+
+async def verificar_no_laco(session, registros, config):
+    """
+    Verificação como era feita originalmente: download completo e listagem síncrona dentro do
+    loop de eventos. Serve de referência para o cenário 'laco'.
+    """
+    async def trabalhador(row):
+        async with session.get(row['url'], timeout=30) as response:
+            conteudo = await response.read()
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho = os.path.join(diretorio, os.path.basename(row['url']))
+            with open(caminho, 'wb') as f:
+                f.write(conteudo)
+            return raspagem.listar_conteudo_compactado(caminho, row['titulo'], row['url'], config)
+
+    async for _ in raspagem.executar_em_pool((row for _, row in registros.iterrows()), trabalhador, config['conexoes_arquivos']):
+        pass
+
+async def cenario_laco(servidor, total, tamanho_lote, conexoes):
+    """
+    Mede o atraso do loop de eventos enquanto arquivos compactados com muitas entradas são
+    baixados e listados: no próprio loop (referência), em um pool de threads e em um pool de
+    processos.
+    """
+    if servidor.diretorio_arquivos is None:
+        servidor.gerar_arquivos_compactados()
+    quantidade = min(total, 40)
+    registros = pd.DataFrame([
+        {
+            'numero_controle_pncp': f"{i:014d}-1-{i:06d}/2024",
+            'sequencialDocumento': '1',
+            'titulo': f"edital_{i}.{'zip' if i % 2 else '7zip'}",
+            'url': f"{servidor.url_base}/arquivos/muitos.{'zip' if i % 2 else '7zip'}",
+        }
+        for i in range(quantidade)
+    ])
+    for nome in ('no_laco', 'thread', 'process'):
+        config = criar_config(
+            servidor.url_base, numero_maximo_conexoes=conexoes, conexoes_arquivos=conexoes,
+            leitura_remota_arquivos=False, executor_compactados=nome,
+        )
+        with tempfile.TemporaryDirectory() as diretorio:
+            armazenamento = raspagem.ArmazenamentoSQLite(os.path.join(diretorio, 'raspagem.db'))
+            armazenamento.upsert('arquivos', registros)
+            inicio = time.perf_counter()
+            async with raspagem.criar_sessao(config) as session, MonitorLaco() as monitor:
+                with silencioso():
+                    if nome == 'no_laco':
+                        await verificar_no_laco(session, registros, config)
+                    else:
+                        await raspagem.verify_compressed_files(session, armazenamento, config)
+            duracao = time.perf_counter() - inicio
+            armazenamento.fechar()
+        imprimir_resultado(nome, {**monitor.resumo(), 'duracao_s': f"{duracao:.2f}"})
+
+def trabalhador_silencioso(config, paths, identificador, pronto):
+    """
+    Processo trabalhador do cenário 'distribuido', sem as mensagens de progresso do raspador.
+    'pronto' é sinalizado depois das importações, para que a partida dos processos fique fora da medição.
+    """
+    logging.basicConfig(level=logging.ERROR)
+    pronto.set()
+    with open(os.devnull, 'w') as saida, contextlib.redirect_stdout(saida):
+        raspagem.executar_trabalhador_processo(config, paths, identificador)
+
+async def cenario_distribuido(servidor, total, tamanho_lote, conexoes):
+    """
+    Executa a raspagem completa (páginas, itens, arquivos e resultados) no modo distribuído com
+    1, 2 e 4 processos trabalhadores. Cada trabalhador fica limitado a 'conexoes' requisições
+    simultâneas, como um processo único; a vazão deve crescer com o número de trabalhadores
+    enquanto o servidor e a CPU não saturam.
+
+    O servidor falso roda em um processo próprio, com a latência do servidor do benchmark, e o
+    relógio só começa quando todos os trabalhadores terminaram de importar os módulos. Os
+    trabalhos têm o tamanho necessário para que cada etapa ocupe todos os trabalhadores.
+    """
+    tam_pagina = 20
+    servidor_processo = ServidorEmProcesso(latencia=servidor.latencia, taxa_erro=servidor.taxa_erro).iniciar()
+    try:
+        for quantidade in (1, 2, 4):
+            config = criar_config(
+                servidor_processo.url_base, numero_maximo_conexoes=conexoes, controle_adaptativo=False, concorrencia_maxima=conexoes,
+                tam_pagina=tam_pagina, pagina_inicial=1, pagina_final=(total + tam_pagina - 1) // tam_pagina + 1,
+                ordenacao=['-data'], tipos_documento=['edital'], intervalo_fila=0.2, trabalhadores_locais=0,
+                tamanho_trabalho=min(50, max(10, total // 16)), trabalhos_simultaneos=4,
+            )
+            with tempfile.TemporaryDirectory() as diretorio:
+                paths = {
+                    'banco_sqlite': os.path.join(diretorio, 'raspagem.db'),
+                    'fila_db': os.path.join(diretorio, 'fila.db'),
+                    'log_file': os.path.join(diretorio, 'raspagem.log'),
+                }
+                armazenamento = raspagem.ArmazenamentoSQLite(paths['banco_sqlite'])
+                fila = raspagem.criar_fila(config, paths)
+                contexto = multiprocessing.get_context('spawn')
+                prontos = [contexto.Event() for _ in range(quantidade)]
+                processos = [contexto.Process(target=trabalhador_silencioso, args=(config, paths, f"bench{i}", prontos[i])) for i in range(quantidade)]
+                for processo in processos:
+                    processo.start()
+                for pronto in prontos:
+                    await asyncio.to_thread(pronto.wait)
+                servidor_processo.zerar_contadores()
+                inicio = time.perf_counter()
+                with silencioso():
+                    await raspagem.coordenar_raspagem(config, armazenamento, fila, paths)
+                duracao = time.perf_counter() - inicio
+                for processo in processos:
+                    await asyncio.to_thread(processo.join)
+                resultados = armazenamento.contar('resultados')
+                fila.fechar()
+                armazenamento.fechar()
+            requisicoes = servidor_processo.contadores()['requisicoes']
+            imprimir_resultado(f"trabalhadores_{quantidade}", {
+                'requisicoes': requisicoes,
+                'resultados': resultados,
+                'req_por_s': f"{requisicoes / duracao:.1f}",
+                'duracao_s': f"{duracao:.2f}",
+            })
+    finally:
+        servidor_processo.parar()
+
+async def cenario_etapas(servidor, total, tamanho_lote, conexoes):
+    """
+    Executa cada etapa da raspagem isoladamente, na ordem do pipeline e sobre o mesmo banco:
+    páginas da busca, itens, resultados, arquivos e verificação dos arquivos compactados. Para
+    cada etapa informa requisições por segundo, tempo total, pico de RSS do processo (que só
+    cresce) e o custo das gravações em lote (checkpoints) medido pelas métricas do raspador.
+    """
+    if servidor.diretorio_arquivos is None:
+        servidor.gerar_arquivos_compactados()
+    servidor.arquivos_compactados = True
+    tam_pagina = 100
+    config = criar_config(
+        servidor.url_base, numero_maximo_conexoes=conexoes, conexoes_arquivos=conexoes, tam_pagina=tam_pagina,
+        tentativas_maximas=2, tamanho_lote_gravacao=max(tamanho_lote, 100),
+    )
+    paginas = list(range(1, (total + tam_pagina - 1) // tam_pagina + 1))
+
+    async def licitacoes(session, limitador, armazenamento):
+        fluxo = raspagem.fetch_licitacoes(session, limitador, ['edital'], ['-data'], paginas, config)
+        await raspagem.gravar_licitacoes(fluxo, armazenamento, config)
+
+    def detalhes(etapa):
+        async def executar_etapa(session, limitador, armazenamento):
+            tabela_controle, coluna_controle = raspagem.CONTROLE_ETAPAS[etapa]
+            pendentes = raspagem.registros_de_lotes(armazenamento.iterar_pendentes(tabela_controle, coluna_controle, config['tamanho_lote_gravacao']))
+            if etapa == 'resultados':
+                fluxo = raspagem.fetch_resultados(session, limitador, pendentes, config)
+            else:
+                fluxo = raspagem.fetch_detalhes(session, limitador, pendentes, etapa, config)
+            await raspagem.gravar_detalhes(fluxo, armazenamento, etapa, tabela_controle, coluna_controle, config)
+        return executar_etapa
+
+    async def verificacao(session, limitador, armazenamento):
+        await raspagem.verify_compressed_files(session, armazenamento, config)
+
+    etapas = [('licitacoes', licitacoes), ('itens', detalhes('itens')), ('resultados', detalhes('resultados')),
+              ('arquivos', detalhes('arquivos')), ('verificacao', verificacao)]
+    with tempfile.TemporaryDirectory() as diretorio:
+        armazenamento = raspagem.ArmazenamentoSQLite(os.path.join(diretorio, 'raspagem.db'))
+        async with raspagem.criar_sessao(config) as session:
+            for nome, etapa in etapas:
+                raspagem.METRICAS = raspagem.Metricas()
+                limitador = raspagem.criar_limitador(config)
+                servidor.zerar_contadores()
+                inicio = time.perf_counter()
+                with silencioso():
+                    await etapa(session, limitador, armazenamento)
+                duracao = time.perf_counter() - inicio
+                segundos, gravacoes = custo_checkpoint(raspagem.METRICAS.resumo())
+                imprimir_resultado(nome, {
+                    'requisicoes': servidor.requisicoes,
+                    'req_por_s': f"{servidor.requisicoes / duracao:.1f}",
+                    'duracao_s': f"{duracao:.2f}",
+                    'pico_rss_mb': f"{pico_rss_mb():.0f}",
+                    'checkpoints': gravacoes,
+                    'checkpoint_s': f"{segundos:.3f}",
+                    'checkpoint_pct': f"{100 * segundos / duracao:.1f}",
+                })
+        armazenamento.fechar()
+    servidor.arquivos_compactados = False
+    raspagem.METRICAS = raspagem.Metricas()
+
+def _pico_rss_proc(pid):
+    # VmHWM é o pico de RSS do processo atual; o ru_maxrss de um filho herda o do pai no fork
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for linha in f:
+                if linha.startswith('VmHWM:'):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def executar_main(diretorio):
+    """
+    Executa 'raspagem.py' em um processo filho, no diretório dado, e espera o seu término.
+
+    Returns:
+        (codigo, pico_mb): Código de saída e pico de RSS do processo filho, em MB.
+    """
+    processo = subprocess.Popen([sys.executable, os.path.abspath(raspagem.__file__)], cwd=diretorio,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    pico = None
+    while processo.poll() is None:
+        pico = _pico_rss_proc(processo.pid) or pico
+        time.sleep(0.02)
+    if pico is None:
+        pico = pico_rss_mb(resource.getrusage(resource.RUSAGE_CHILDREN))
+    return processo.returncode, pico
+
+async def cenario_completo(servidor, total, tamanho_lote, conexoes):
+    """
+    Executa o pipeline completo de main() ('python raspagem.py', em um processo filho com um
+    config.ini próprio) contra o servidor falso, com arquivos compactados a verificar. Informa
+    requisições por segundo, tempo total, pico de RSS do processo e o custo das gravações em
+    lote, lido do resumo de métricas gravado pelo raspador.
+    """
+    if servidor.diretorio_arquivos is None:
+        servidor.gerar_arquivos_compactados()
+    servidor.arquivos_compactados = True
+    tam_pagina = 100
+    configuracao = configparser.ConfigParser()
+    configuracao['DEFAULT'] = {
+        'url_base_api': f"{servidor.url_base}/api",
+        'pagina_inicial': '1',
+        'pagina_final': str((total + tam_pagina - 1) // tam_pagina + 1),
+        'tam_pagina': str(tam_pagina),
+        'ordenacao': '-data',
+        'tipos_documento': 'edital',
+        'numero_maximo_conexoes': str(conexoes),
+        'conexoes_arquivos': str(conexoes),
+        'tentativas_maximas': '2',
+        'tempo_espera_inicial': '0',
+        'tamanho_lote_gravacao': str(max(tamanho_lote, 100)),
+        'cache_respostas': 'false',
+    }
+    with tempfile.TemporaryDirectory() as diretorio:
+        with open(os.path.join(diretorio, 'config.ini'), 'w') as f:
+            configuracao.write(f)
+        servidor.zerar_contadores()
+        inicio = time.perf_counter()
+        codigo, pico = await asyncio.to_thread(executar_main, diretorio)
+        duracao = time.perf_counter() - inicio
+        with open(os.path.join(diretorio, 'raspagem', 'metricas.json'), encoding='utf-8') as f:
+            resumo = json.load(f)
+        segundos, gravacoes = custo_checkpoint(resumo)
+        gravadas = sum(resumo['contadores'].get('linhas_gravadas_total', {}).values())
+    servidor.arquivos_compactados = False
+    imprimir_resultado('main', {
+        'codigo_saida': codigo,
+        'requisicoes': servidor.requisicoes,
+        'erros_500': servidor.erros,
+        'linhas_gravadas': gravadas,
+        'req_por_s': f"{servidor.requisicoes / duracao:.1f}",
+        'duracao_s': f"{duracao:.2f}",
+        'pico_rss_mb': f"{pico:.0f}",
+        'checkpoints': gravacoes,
+        'checkpoint_s': f"{segundos:.3f}",
+        'checkpoint_pct': f"{100 * segundos / duracao:.1f}",
+    })
+
+async def cenario_planejamento(servidor, total, tamanho_lote, conexoes):
+    """
+    Compara a cobertura da busca, com o servidor limitando a paginação, entre a varredura sem
+    planejamento (três ordenações até o limite) e a busca planejada em fatias disjuntas.
+    """
+    limite_paginas = max(1, total // tamanho_lote // 10)
+    servidor.total_licitacoes, total_original = total, servidor.total_licitacoes
+    servidor.limite_paginas = limite_paginas
+    variantes = (
+        ('ordenacoes', {'ordenacao': ['relevancia', 'data', '-data']}),
+        ('planejada', {'ordenacao': ['data'], 'planejar_busca': True}),
+    )
+    try:
+        for nome, ajustes in variantes:
+            config = criar_config(servidor.url_base, numero_maximo_conexoes=conexoes, tam_pagina=tamanho_lote,
+                                  tipos_documento=['edital'], limite_paginas_busca=limite_paginas, **ajustes)
+            with tempfile.TemporaryDirectory() as diretorio:
+                armazenamento = raspagem.ArmazenamentoSQLite(os.path.join(diretorio, 'raspagem.db'))
+                servidor.zerar_contadores()
+                inicio = time.perf_counter()
+                async with raspagem.criar_sessao(config) as session:
+                    limitador = raspagem.criar_limitador(config)
+                    with silencioso():
+                        chaves = await raspagem.planejar_paginas(session, limitador, config) if config['planejar_busca'] else None
+                        fluxo = raspagem.fetch_licitacoes(session, limitador, config['tipos_documento'], config['ordenacao'],
+                                                          list(range(1, limite_paginas + 1)), config, chaves=chaves)
+                        await raspagem.gravar_licitacoes(fluxo, armazenamento, config)
+                duracao = time.perf_counter() - inicio
+                unicas = armazenamento.contar('licitacoes')
+                armazenamento.fechar()
+            imprimir_resultado(nome, {
+                'requisicoes': servidor.requisicoes,
+                'licitacoes_unicas': unicas,
+                'cobertura_pct': f"{100 * unicas / total:.1f}",
+                'duracao_s': f"{duracao:.2f}",
+            })
+    finally:
+        servidor.total_licitacoes = total_original
+        servidor.limite_paginas = None
+
+async def cenario_resultados(servidor, total, tamanho_lote, conexoes):
+    """
+    Compara as requisições de resultados com e sem o filtro de elegibilidade, com itens em
+    situações variadas (em andamento, homologados, cancelados, desertos e fracassados), e mede
+    a revisita dos itens em andamento quando ela vence.
+    """
+    servidor.situacoes_itens = True
+    registros = registros_sinteticos(max(1, total // servidor.itens_por_licitacao))
+    try:
+        for nome, filtro in (('sem_filtro', False), ('com_filtro', True)):
+            # Revisita imediata: a segunda passagem já encontra as revisitas vencidas
+            config = criar_config(servidor.url_base, numero_maximo_conexoes=conexoes, filtro_resultados=filtro,
+                                  intervalo_revisita_resultados_horas=0)
+            with tempfile.TemporaryDirectory() as diretorio:
+                armazenamento = raspagem.ArmazenamentoSQLite(os.path.join(diretorio, 'raspagem.db'))
+                limitador = raspagem.criar_limitador(config)
+                async with raspagem.criar_sessao(config) as session:
+                    with silencioso():
+                        fluxo = raspagem.fetch_detalhes(session, limitador, registros, 'itens', config)
+                        await raspagem.gravar_detalhes(fluxo, armazenamento, 'itens', 'licitacoes', 'detalhes_baixados', config)
+                    for passagem in ((nome,) if not filtro else (nome, 'revisita')):
+                        servidor.zerar_contadores()
+                        pendentes = raspagem.registros_de_lotes(armazenamento.iterar_pendentes('itens', 'Resultados verificados', tamanho_lote))
+                        agenda = raspagem.AgendaResultados(armazenamento, config) if filtro else None
+                        if agenda is not None:
+                            pendentes = agenda.selecionar(pendentes)
+                        with silencioso():
+                            fluxo = raspagem.fetch_resultados(session, limitador, pendentes, config)
+                            if agenda is not None:
+                                fluxo = agenda.filtrar(fluxo)
+                            await raspagem.gravar_detalhes(fluxo, armazenamento, 'resultados', 'itens', 'Resultados verificados', config)
+                        imprimir_resultado(passagem, {
+                            'requisicoes': servidor.requisicoes,
+                            'resultados': armazenamento.contar('resultados'),
+                            'itens_pendentes': armazenamento.contar_pendentes('itens', 'Resultados verificados'),
+                        })
+                armazenamento.fechar()
+    finally:
+        servidor.situacoes_itens = False
+
+async def cenario_alteracoes(servidor, total, tamanho_lote, conexoes):
+    """
+    Altera 5% das licitações de uma base já coletada (nova data de atualização e um item a mais) e
+    compara a atualização com detecção de alterações, que só reenfileira os detalhes das
+    licitações alteradas, com a recoleta completa em uma base vazia.
+    """
+    servidor.total_licitacoes, total_original = total, servidor.total_licitacoes
+    config = criar_config(servidor.url_base, numero_maximo_conexoes=conexoes, tam_pagina=tamanho_lote, filtro_resultados=False)
+    paginas = list(range(1, (total + tamanho_lote - 1) // tamanho_lote + 1))
+
+    async def coletar(armazenamento):
+        async with raspagem.criar_sessao(config) as session:
+            limitador = raspagem.criar_limitador(config)
+            with silencioso():
+                fluxo = raspagem.fetch_licitacoes(session, limitador, ['edital'], ['-data'], paginas, config)
+                await raspagem.gravar_licitacoes(fluxo, armazenamento, config)
+                for etapa in ('itens', 'arquivos', 'resultados'):
+                    tabela_controle, coluna_controle = raspagem.CONTROLE_ETAPAS[etapa]
+                    pendentes = raspagem.registros_de_lotes(armazenamento.iterar_pendentes(tabela_controle, coluna_controle, config['tamanho_lote_gravacao']))
+                    if etapa == 'resultados':
+                        fluxo = raspagem.fetch_resultados(session, limitador, pendentes, config)
+                    else:
+                        fluxo = raspagem.fetch_detalhes(session, limitador, pendentes, etapa, config)
+                    await raspagem.gravar_detalhes(fluxo, armazenamento, etapa, tabela_controle, coluna_controle, config)
+
+    try:
+        with tempfile.TemporaryDirectory() as diretorio:
+            armazenamento = raspagem.ArmazenamentoSQLite(os.path.join(diretorio, 'raspagem.db'))
+            await coletar(armazenamento)
+            servidor.revisoes = {identificador: 1 for identificador in range(1, total + 1, 20)}
+            for nome, destino in (('atualizacao', armazenamento), ('recoleta', None)):
+                if destino is None:
+                    destino = raspagem.ArmazenamentoSQLite(os.path.join(diretorio, 'recoleta.db'))
+                servidor.zerar_contadores()
+                inicio = time.perf_counter()
+                await coletar(destino)
+                duracao = time.perf_counter() - inicio
+                imprimir_resultado(nome, {
+                    'requisicoes': servidor.requisicoes,
+                    'duracao_s': f"{duracao:.2f}",
+                    'itens': destino.contar('itens'),
+                    'versoes_historico': destino.contar('historico_licitacoes'),
+                })
+                destino.fechar()
+    finally:
+        servidor.total_licitacoes = total_original
+        servidor.revisoes = {}
+
+async def cenario_tsv(servidor, total, tamanho_lote, conexoes):
+    """
+    Grava 20 lotes de itens novos sobre um TSV com 'total * 100' itens e compara a carga completa
+    do TSV com concatenação, deduplicação e regravação a cada lote (o backend TSV anterior) com o
+    backend TSV atual, que mantém só o índice das chaves e acrescenta as linhas ao fim do arquivo.
+    Informa o tempo e o pico de memória alocada (tracemalloc).
+    """
+    existentes = total * 100
+    lotes = [raspagem.processar_detalhes_registros(itens_sinteticos(tamanho_lote, inicio=existentes + n * tamanho_lote), pd.DataFrame(), 'itens')
+             for n in range(20)]
+    chaves = raspagem.CHAVES_TABELAS['itens']
+
+    def carga_completa(paths):
+        df = pd.read_csv(paths['itens_csv'], dtype=str, sep='\t')
+        for lote in lotes:
+            df = pd.concat([df, raspagem.normalizar_para_texto(lote, 'itens')]).drop_duplicates(subset=chaves, keep='last')
+            df.to_csv(paths['itens_csv'], index=False, sep='\t')
+        return len(df)
+
+    def indice_chaves(paths):
+        armazenamento = raspagem.ArmazenamentoTSV(paths)
+        for lote in lotes:
+            armazenamento.upsert('itens', lote)
+            armazenamento.salvar()
+        linhas = armazenamento.contar('itens')
+        armazenamento.fechar()
+        return linhas
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        paths = {chave: os.path.join(diretorio, f"{tabela}.csv") for tabela, chave in raspagem.ARQUIVOS_TABELAS.items()}
+        paths['estado_json'] = os.path.join(diretorio, 'estado.json')
+        paths['indices_directory'] = os.path.join(diretorio, 'indices')
+        base = os.path.join(diretorio, 'base.csv')
+        df = raspagem.processar_detalhes_registros(itens_sinteticos(existentes), pd.DataFrame(), 'itens')
+        raspagem.normalizar_para_texto(df, 'itens').to_csv(base, index=False, sep='\t')
+        del df
+        for nome, gravar in (('carga_completa', carga_completa), ('indice_chaves', indice_chaves)):
+            shutil.copy(base, paths['itens_csv'])
+            tracemalloc.start()
+            inicio = time.perf_counter()
+            with silencioso():
+                linhas = gravar(paths)
+            duracao = time.perf_counter() - inicio
+            pico = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            imprimir_resultado(nome, {
+                'linhas': linhas,
+                'duracao_s': f"{duracao:.2f}",
+                'pico_alocado_mb': f"{pico / 1024 ** 2:.0f}",
+            })
+
+async def cenario_indice(servidor, total, tamanho_lote, conexoes):
+    """
+    Testa a existência de um lote de 'total * 50' chaves de itens (metade já gravada) contra um TSV
+    com 'total * 500' itens, comparando o conjunto de chaves em memória montado a cada abertura (o
+    índice anterior do backend TSV) com o IndiceChaves reconstruído a partir do TSV e com o
+    IndiceChaves já persistido, aberto por mapeamento de memória. Informa o tempo de abertura, o
+    tempo da consulta e o pico de memória alocada (tracemalloc).
+    """
+    existentes = total * 500
+    consultadas = total * 50
+    df = raspagem.processar_detalhes_registros(
+        itens_sinteticos(consultadas, inicio=existentes - consultadas // 2), pd.DataFrame(), 'itens')
+    lote = raspagem._chaves_texto(raspagem.normalizar_para_texto(df, 'itens'), 'itens')
+
+    def conjunto_em_memoria(paths):
+        armazenamento = raspagem.ArmazenamentoTSV(paths)
+        colunas = raspagem.CHAVES_TABELAS['itens']
+        indice = set()
+        for parte in pd.read_csv(paths['itens_csv'], dtype=str, sep='\t', usecols=colunas, chunksize=armazenamento.tamanho_lote):
+            indice.update(raspagem._chaves_texto(parte, 'itens'))
+        yield
+        yield sum(chave in indice for chave in lote)
+
+    def indice_persistente(paths):
+        armazenamento = raspagem.ArmazenamentoTSV(paths)
+        armazenamento.contar('itens')
+        yield
+        yield int(armazenamento._existentes('itens', lote).sum())
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        paths = {chave: os.path.join(diretorio, f"{tabela}.csv") for tabela, chave in raspagem.ARQUIVOS_TABELAS.items()}
+        paths['estado_json'] = os.path.join(diretorio, 'estado.json')
+        paths['indices_directory'] = os.path.join(diretorio, 'indices')
+        for inicio in range(0, existentes, 100000):
+            df = raspagem.processar_detalhes_registros(itens_sinteticos(min(100000, existentes - inicio), inicio=inicio), pd.DataFrame(), 'itens')
+            raspagem.normalizar_para_texto(df, 'itens').to_csv(paths['itens_csv'], index=False, sep='\t', mode='a', header=inicio == 0)
+        del df
+        variantes = (('conjunto_em_memoria', conjunto_em_memoria),
+                     ('indice_reconstruido', indice_persistente),
+                     ('indice_persistido', indice_persistente))
+        for nome, consultar in variantes:
+            tracemalloc.start()
+            with silencioso():
+                inicio = time.perf_counter()
+                etapas = consultar(paths)
+                next(etapas)
+                abertura = time.perf_counter() - inicio
+                inicio = time.perf_counter()
+                encontradas = next(etapas)
+                consulta = time.perf_counter() - inicio
+            pico = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            imprimir_resultado(nome, {
+                'chaves_encontradas': encontradas,
+                'abertura_ms': f"{abertura * 1000:.1f}",
+                'consulta_ms': f"{consulta * 1000:.1f}",
+                'pico_alocado_mb': f"{pico / 1024 ** 2:.0f}",
+            })
+
+CENARIOS = {
+    'sessao': cenario_sessao,
+    'limitacao': cenario_limitacao,
+    'incremental': cenario_incremental,
+    'cache': cenario_cache,
+    'processamento': cenario_processamento,
+    'arquivos': cenario_arquivos,
+    'documentos': cenario_documentos,
+    'laco': cenario_laco,
+    'distribuido': cenario_distribuido,
+    'etapas': cenario_etapas,
+    'completo': cenario_completo,
+    'planejamento': cenario_planejamento,
+    'resultados': cenario_resultados,
+    'alteracoes': cenario_alteracoes,
+    'tsv': cenario_tsv,
+    'indice': cenario_indice,
+}
+
+# ---------------------------- Execução ---------------------------- #
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Benchmarks do raspador do PNCP contra um servidor local.')
+    parser.add_argument('cenarios', nargs='*', default=list(CENARIOS), help=f"Cenários a executar ({', '.join(CENARIOS)}).")
+    parser.add_argument('--total', type=int, default=2000, help='Número de licitações sintéticas.')
+    parser.add_argument('--tamanho-lote', type=int, default=100, help='Tamanho do lote no cenário de sessão.')
+    parser.add_argument('--conexoes', type=int, default=10, help='Número máximo de conexões simultâneas.')
+    parser.add_argument('--latencia', type=float, default=0.005, help='Latência simulada do servidor, em segundos.')
+    parser.add_argument('--capacidade', type=int, help='Requisições simultâneas suportadas pelo servidor no cenário de limitação.')
+    parser.add_argument('--taxa-erro', type=float, default=0.0, help='Fração das respostas da API devolvidas com status 500.')
+    parser.add_argument('--tamanho-descricao', type=int, default=0, help='Caracteres extras nas descrições, para simular respostas maiores.')
+    parser.add_argument('--semente', type=int, default=0, help='Semente do sorteio dos erros do servidor.')
+    parser.add_argument('--salvar', type=str, help='Grava os resultados em um arquivo JSON (ex.: para servir de referência).')
+    parser.add_argument('--comparar', type=str, help='Compara os resultados com um arquivo JSON de referência gravado com --salvar.')
+    parser.add_argument('--tolerancia', type=float, default=0.2, help='Piora relativa tolerada na comparação antes de acusar regressão.')
+    return parser.parse_args()
+
+# Métricas comparadas com a referência: True quando um valor maior é melhor
+SENTIDO_METRICAS = {
+    'req_por_s': True,
+    'duracao_s': False,
+    'pico_rss_mb': False,
+    'checkpoint_s': False,
+    'requisicoes': False,
+    'mb_recebidos': False,
+    'atraso_p95_ms': False,
+    'pico_alocado_mb': False,
+    'abertura_ms': False,
+    'consulta_ms': False,
+}
+
+def comparar_resultados(atuais, referencia, tolerancia):
+    """
+    Compara os resultados com a referência e lista as métricas que pioraram além da tolerância.
+
+    Args:
+        atuais: Dicionário {cenário: {variante: métricas}} desta execução.
+        referencia: Dicionário no mesmo formato, lido de --comparar.
+        tolerancia: Piora relativa tolerada (ex.: 0.2 para 20%).
+
+    Returns:
+        regressoes: Lista de descrições das regressões encontradas.
+    """
+    regressoes = []
+    for cenario, variantes in atuais.items():
+        for variante, metricas in variantes.items():
+            anteriores = referencia.get(cenario, {}).get(variante, {})
+            for chave, maior_melhor in SENTIDO_METRICAS.items():
+                try:
+                    atual, anterior = float(metricas[chave]), float(anteriores[chave])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                if not anterior:
+                    continue
+                variacao = (atual - anterior) / anterior
+                if (-variacao if maior_melhor else variacao) > tolerancia:
+                    regressoes.append(f"{cenario}/{variante}: {chave} {anterior:g} -> {atual:g} ({variacao:+.0%})")
+    return regressoes
+
+async def executar(args):
+    # As falhas esperadas (ex.: respostas 429) não devem poluir a saída do benchmark
+    logging.basicConfig(level=logging.ERROR)
+    servidor = await ServidorPNCPFalso(
+        latencia=args.latencia, capacidade=args.capacidade, taxa_erro=args.taxa_erro,
+        tamanho_descricao=args.tamanho_descricao, semente=args.semente,
+    ).iniciar()
+    resultados = {}
+    try:
+        for nome in args.cenarios:
+            print(f"# Cenário '{nome}'")
+            inicio = len(RESULTADOS)
+            await CENARIOS[nome](servidor, args.total, args.tamanho_lote, args.conexoes)
+            resultados[nome] = dict(RESULTADOS[inicio:])
+    finally:
+        await servidor.parar()
+
+    if args.salvar:
+        with open(args.salvar, 'w', encoding='utf-8') as f:
+            json.dump({'parametros': vars(args), 'resultados': resultados}, f, ensure_ascii=False, indent=2)
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            referencia = json.load(f)['resultados']
+        regressoes = comparar_resultados(resultados, referencia, args.tolerancia)
+        for regressao in regressoes:
+            print(f"REGRESSÃO: {regressao}")
+        if regressoes:
+            return 1
+        print(f"Nenhuma regressão acima de {args.tolerancia:.0%} em relação a '{args.comparar}'.")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(executar(parse_arguments())))
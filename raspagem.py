@@ -9,21 +9,57 @@ Script para raspagem de dados de licitações do PNCP (Portal Nacional de Contra
 import asyncio
 import aiohttp
 import argparse
+import atexit
+import bisect
+import collections
+import concurrent.futures
 import configparser
+import contextlib
+import email.utils
+import hashlib
+import io
+import json
 import logging
+import logging.handlers
+import math
+import mimetypes
+import multiprocessing
+import numpy as np
 import os
 import pandas as pd
 import random
+import socket
+import sqlite3
 import sys
 import time
 import zipfile
 import rarfile
 import py7zr
+import queue
 import tempfile
+import threading
+import urllib.parse
+import xml.etree.ElementTree as ElementTree
+import zlib
+from aiohttp import web
 
 #%%
 # ---------------------------- Módulo de Configuração ---------------------------- #
 
+def _booleano(secao, chave, padrao):
+    """
+    Lê uma opção booleana do config.ini, aceitando '1', 'true', 'sim' e 'yes' como verdadeiro.
+
+    Args:
+        secao: Seção do arquivo de configuração.
+        chave: Nome da opção.
+        padrao: Valor usado quando a opção não está definida.
+
+    Returns:
+        valor: Valor booleano da opção.
+    """
+    return str(secao.get(chave, padrao)).strip().lower() in ('1', 'true', 'sim', 'yes')
+
 def load_config(args):
     """
     Carrega as configurações do arquivo config.ini e aplica os parâmetros da CLI.
@@ -32,7 +68,8 @@ def load_config(args):
         args: Argumentos da linha de comando.
 
     Returns:
-        config: Dicionário com as configurações atualizadas.
+        config: Dicionário com as configurações atualizadas. Os avisos sobre valores inválidos
+            ficam em 'avisos_configuracao', para serem registrados depois que o log for configurado.
     """
     # Carrega o arquivo de configuração
     config = configparser.ConfigParser()
@@ -50,20 +87,108 @@ def load_config(args):
         'tipos_documento': (args.tipos_documento or default_config.get('tipos_documento', 'edital,ata')).split(','),
         'tamanho_pagina_itens': int(default_config.get('tamanho_pagina_itens', 20)),
         'tamanho_pagina_arquivos': int(default_config.get('tamanho_pagina_arquivos', 20)),
+        'tamanho_pagina_resultados': int(default_config.get('tamanho_pagina_resultados', 20)),
+        'tamanho_pagina_maximo_api': int(default_config.get('tamanho_pagina_maximo_api', 500)),
         'numero_maximo_conexoes': int(args.max_conexoes or default_config.get('numero_maximo_conexoes', 10)),
         'tempo_espera_inicial': int(default_config.get('tempo_espera_inicial', 1)),
         'tentativas_maximas': int(args.tentativas_maximas or default_config.get('tentativas_maximas', 5)),
+        'armazenamento': args.armazenamento or default_config.get('armazenamento', 'sqlite'),
+        'tamanho_lote_gravacao': int(default_config.get('tamanho_lote_gravacao', 1000)),
+        'modo_incremental': args.incremental or _booleano(default_config, 'modo_incremental', False),
+        'url_base_api': default_config.get('url_base_api', 'https://pncp.gov.br/api').rstrip('/'),
+        'limite_conexoes_total': int(default_config.get('limite_conexoes_total', 100)),
+        'ttl_cache_dns': int(default_config.get('ttl_cache_dns', 300)),
+        'keepalive_timeout': float(default_config.get('keepalive_timeout', 30)),
+        'compressao_http': _booleano(default_config, 'compressao_http', True),
+        'controle_adaptativo': _booleano(default_config, 'controle_adaptativo', True),
+        'concorrencia_minima': int(default_config.get('concorrencia_minima', 1)),
+        'concorrencia_maxima': int(default_config.get('concorrencia_maxima', 40)),
+        'latencia_alvo_p95': float(default_config.get('latencia_alvo_p95', 2.0)),
+        'taxa_erro_maxima': float(default_config.get('taxa_erro_maxima', 0.05)),
+        'conexoes_arquivos': int(default_config.get('conexoes_arquivos', 0)),
+        'trabalhadores_compactados': int(default_config.get('trabalhadores_compactados', os.cpu_count() or 2)),
+        'executor_compactados': default_config.get('executor_compactados', 'thread').strip().lower(),
+        'baixar_documentos': args.baixar_documentos or _booleano(default_config, 'baixar_documentos', False),
+        'diretorio_documentos': default_config.get('diretorio_documentos', '').strip(),
+        'indice_busca': _booleano(default_config, 'indice_busca', True),
+        'indexar_documentos': _booleano(default_config, 'indexar_documentos', False),
+        'extrair_texto_documentos': _booleano(default_config, 'extrair_texto_documentos', False),
+        'profundidade_maxima_compactados': int(default_config.get('profundidade_maxima_compactados', 3)),
+        'tamanho_maximo_extraido_mb': float(default_config.get('tamanho_maximo_extraido_mb', 512)),
+        'razao_compressao_maxima': float(default_config.get('razao_compressao_maxima', 200)),
+        'leitura_remota_arquivos': _booleano(default_config, 'leitura_remota_arquivos', True),
+        'cache_respostas': not args.sem_cache and _booleano(default_config, 'cache_respostas', True),
+        'cache_ttl_dias': float(default_config.get('cache_ttl_dias', 30)),
+        'cache_tamanho_maximo_mb': float(default_config.get('cache_tamanho_maximo_mb', 1024)),
+        'modo_replay': args.replay or _booleano(default_config, 'modo_replay', False),
+        'trabalhadores_locais': int(args.trabalhadores_locais if args.trabalhadores_locais is not None else default_config.get('trabalhadores_locais', 0)),
+        'tamanho_trabalho': max(1, int(default_config.get('tamanho_trabalho', 50))),
+        'trabalhos_simultaneos': max(1, int(default_config.get('trabalhos_simultaneos', 4))),
+        'prazo_arrendamento': float(default_config.get('prazo_arrendamento', 60)),
+        'intervalo_fila': float(default_config.get('intervalo_fila', 1)),
+        'tentativas_trabalho': int(default_config.get('tentativas_trabalho', 3)),
+        'banco_em_rede': _booleano(default_config, 'banco_em_rede', False),
+        'porta_metricas': int(args.porta_metricas if args.porta_metricas is not None else default_config.get('porta_metricas', 0)),
+        'endereco_metricas': default_config.get('endereco_metricas', '127.0.0.1').strip(),
+        'resumo_metricas': _booleano(default_config, 'resumo_metricas', True),
+        'formato_log': default_config.get('formato_log', 'json').strip().lower(),
+        'nivel_log': (args.nivel_log or default_config.get('nivel_log', 'INFO')).strip().upper(),
+        'intervalo_progresso': float(default_config.get('intervalo_progresso', 10)),
+        'planejar_busca': args.planejar_busca or _booleano(default_config, 'planejar_busca', False),
+        'limite_paginas_busca': max(1, int(default_config.get('limite_paginas_busca', 20))),
+        'dimensoes_busca': [dimensao.strip() for dimensao in default_config.get('dimensoes_busca', 'status,uf,modalidade').split(',') if dimensao.strip()],
+        'valores_busca_status': default_config.get('valores_busca_status', 'recebendo_proposta,propostas_encerradas,encerradas').split(','),
+        'valores_busca_uf': default_config.get('valores_busca_uf', 'AC,AL,AM,AP,BA,CE,DF,ES,GO,MA,MG,MS,MT,PA,PB,PE,PI,PR,RJ,RN,RO,RR,RS,SC,SE,SP,TO').split(','),
+        'valores_busca_modalidade': default_config.get('valores_busca_modalidade', '1,2,3,4,5,6,7,8,9,10,11,12,13').split(','),
+        'detectar_alteracoes': _booleano(default_config, 'detectar_alteracoes', True),
+        'filtro_resultados': _booleano(default_config, 'filtro_resultados', True),
+        'intervalo_revisita_resultados_horas': float(default_config.get('intervalo_revisita_resultados_horas', 24)),
+        'intervalo_maximo_revisita_resultados_dias': float(default_config.get('intervalo_maximo_revisita_resultados_dias', 30)),
+        'dataset_parquet': args.atualizar_parquet or _booleano(default_config, 'dataset_parquet', False),
+        'linhas_grupo_parquet': max(1, int(default_config.get('linhas_grupo_parquet', 100000))),
+        'partes_maximas_parquet': max(1, int(default_config.get('partes_maximas_parquet', 16))),
+        'linhas_memoria_parquet': max(1, int(default_config.get('linhas_memoria_parquet', 200000))),
         'verbose': args.verbose
     }
 
+    # Os tamanhos de página dos detalhes não podem passar do máximo aceito pela API
+    for chave in ('tamanho_pagina_itens', 'tamanho_pagina_arquivos', 'tamanho_pagina_resultados'):
+        config_dict[chave] = max(1, min(config_dict[chave], config_dict['tamanho_pagina_maximo_api']))
+
+    # Sem valor próprio, a etapa de arquivos compactados usa o número máximo de conexões
+    if config_dict['conexoes_arquivos'] <= 0:
+        config_dict['conexoes_arquivos'] = config_dict['numero_maximo_conexoes']
+
+    # O log ainda não foi configurado aqui: os avisos são guardados e registrados por main()
+    avisos = []
+    if config_dict['executor_compactados'] not in ('thread', 'process'):
+        avisos.append(f"executor_compactados inválido: '{config_dict['executor_compactados']}'. Usando 'thread'.")
+        config_dict['executor_compactados'] = 'thread'
+    invalidas = [dimensao for dimensao in config_dict['dimensoes_busca'] if dimensao not in DIMENSOES_BUSCA]
+    if invalidas:
+        avisos.append(f"dimensoes_busca inválidas ignoradas: {', '.join(invalidas)}.")
+        config_dict['dimensoes_busca'] = [dimensao for dimensao in config_dict['dimensoes_busca'] if dimensao in DIMENSOES_BUSCA]
+    if config_dict['formato_log'] not in ('json', 'texto'):
+        avisos.append(f"formato_log inválido: '{config_dict['formato_log']}'. Usando 'json'.")
+        config_dict['formato_log'] = 'json'
+    config_dict['avisos_configuracao'] = avisos
+
+    # Sem controle adaptativo a concorrência fica fixa em 'numero_maximo_conexoes'
+    if not config_dict['controle_adaptativo']:
+        config_dict['concorrencia_maxima'] = config_dict['numero_maximo_conexoes']
+    config_dict['concorrencia_maxima'] = max(config_dict['concorrencia_maxima'], config_dict['numero_maximo_conexoes'])
+
     return config_dict
 
 # ---------------------------- Interface de Linha de Comando (CLI) ---------------------------- #
 
-def parse_arguments():
+def parse_arguments(argv=None):
     """
     Define e analisa os argumentos da linha de comando.
 
+    Args:
+        argv: Lista de argumentos (padrão: sys.argv).
+
     Returns:
         args: Argumentos analisados.
     """
@@ -75,31 +200,409 @@ def parse_arguments():
     parser.add_argument('--tipos-documento', type=str, help='Tipos de documento a serem buscados (edital, ata ou ambos).')
     parser.add_argument('--max-conexoes', type=int, help='Número máximo de requisições simultâneas.')
     parser.add_argument('--tentativas-maximas', type=int, help='Número máximo de tentativas em caso de falha.')
+    parser.add_argument('--planejar-busca', action='store_true', help='Divide a busca em fatias disjuntas (status, UF, modalidade) que cabem no limite de paginação, em vez de variar a ordenação.')
+    parser.add_argument('--incremental', action='store_true', help="Modo incremental: busca apenas licitações publicadas desde a última execução (ordenação '-data').")
+    parser.add_argument('--armazenamento', type=str, choices=['sqlite', 'tsv'], help='Backend de armazenamento dos dados (sqlite ou tsv).')
+    parser.add_argument('--importar-tsv', action='store_true', help='Importa os arquivos TSV existentes para o armazenamento configurado e encerra.')
+    parser.add_argument('--exportar', type=str, choices=['tsv', 'parquet'], help='Exporta as tabelas do armazenamento para TSV ou Parquet e encerra.')
+    parser.add_argument('--destino-exportacao', type=str, help='Diretório de destino da exportação (padrão: raspagem/exportacao).')
+    parser.add_argument('--baixar-documentos', action='store_true', help='Baixa os documentos da tabela de arquivos para o repositório local (raspagem/documentos).')
+    parser.add_argument('--atualizar-parquet', action='store_true', help='Atualiza o dataset Parquet particionado por ano e UF (raspagem/parquet) com as linhas novas ou alteradas e encerra.')
+    parser.add_argument('--indexar-busca', action='store_true', help='Atualiza o índice de busca textual com as linhas novas ou alteradas e encerra.')
+    parser.add_argument('--buscar', type=str, help='Pesquisa o índice de busca textual (ex.: "merenda escolar") e encerra.')
+    parser.add_argument('--orgao', type=str, help='Filtro da busca: CNPJ ou parte do nome do órgão.')
+    parser.add_argument('--uf', type=str, help='Filtro da busca: sigla da UF.')
+    parser.add_argument('--data-inicio', type=str, help='Filtro da busca: data mínima de publicação (AAAA-MM-DD).')
+    parser.add_argument('--data-fim', type=str, help='Filtro da busca: data máxima de publicação (AAAA-MM-DD).')
+    parser.add_argument('--valor-minimo', type=float, help='Filtro da busca: valor mínimo.')
+    parser.add_argument('--valor-maximo', type=float, help='Filtro da busca: valor máximo.')
+    parser.add_argument('--tipo-registro', type=str, help='Filtro da busca: tipos de registro separados por vírgula (licitacao, item, arquivo, documento).')
+    parser.add_argument('--limite', type=int, default=20, help='Número máximo de resultados da busca.')
+    parser.add_argument('--sem-cache', action='store_true', help='Desativa o cache de respostas da API.')
+    parser.add_argument('--replay', action='store_true', help='Modo offline: serve todas as respostas da API a partir do cache, sem acessar a rede.')
+    parser.add_argument('--coordenador', action='store_true', help='Modo distribuído: divide a raspagem em trabalhos na fila compartilhada (raspagem/fila.db) e espera os trabalhadores.')
+    parser.add_argument('--trabalhador', action='store_true', help='Modo distribuído: processa trabalhos da fila compartilhada até o coordenador encerrar a rodada.')
+    parser.add_argument('--trabalhadores-locais', type=int, help='Número de processos trabalhadores iniciados pelo coordenador nesta máquina.')
+    parser.add_argument('--porta-metricas', type=int, help='Expõe as métricas da execução em http://127.0.0.1:<porta>/metrics (0 desativa).')
+    parser.add_argument('--nivel-log', type=str.upper, choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], help='Nível mínimo do arquivo de log; DEBUG inclui uma linha por requisição.')
     parser.add_argument('--verbose', action='store_true', help='Ativa o modo verboso.')
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     return args
 
 # ---------------------------- Módulo de Logs ---------------------------- #
 
-def setup_logging(log_file):
+class FormatadorJSON(logging.Formatter):
+    """
+    Formata cada registro de log como uma linha JSON (instante, nível, mensagem,
+    processo e os campos extras passados em extra={'dados': {...}}), para que o
+    arquivo de log possa ser filtrado e agregado por ferramentas externas.
+    """
+
+    def format(self, record):
+        registro = {
+            'instante': self.formatTime(record, '%Y-%m-%dT%H:%M:%S') + f'.{int(record.msecs):03d}',
+            'nivel': record.levelname,
+            'mensagem': record.getMessage(),
+            'processo': record.processName,
+        }
+        dados = getattr(record, 'dados', None)
+        if dados:
+            registro.update(dados)
+        if record.exc_info:
+            registro['excecao'] = self.formatException(record.exc_info)
+        return json.dumps(registro, ensure_ascii=False, default=str)
+
+def setup_logging(log_file, formato='json', nivel='INFO'):
     """
     Configura o sistema de logs.
 
+    Os registros são apenas enfileirados pelo QueueHandler; a escrita no arquivo
+    e no console é feita pela thread do QueueListener, de modo que o loop de
+    eventos nunca espera pelo disco. Processos filhos criados por fork gravam
+    diretamente nos manipuladores, pois a thread do ouvinte não existe neles.
+
     Args:
         log_file: Caminho do arquivo de log.
+        formato: 'json' (uma linha JSON por registro) ou 'texto'.
+        nivel: Nível mínimo registrado (DEBUG, INFO, WARNING, ...).
+
+    Returns:
+        logging.handlers.QueueListener: Ouvinte que grava os registros.
     """
-    logging.basicConfig(
-        filename=log_file,
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
+    arquivo = logging.FileHandler(log_file, encoding='utf-8')
+    if formato == 'json':
+        arquivo.setFormatter(FormatadorJSON())
+    else:
+        arquivo.setFormatter(logging.Formatter(
+            '%(asctime)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S'))
     # Também adiciona um handler para exibir logs no console se necessário
     console = logging.StreamHandler()
     console.setLevel(logging.ERROR)  # Ajuste o nível conforme necessário
-    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-    console.setFormatter(formatter)
-    logging.getLogger('').addHandler(console)
+    console.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+
+    fila = queue.SimpleQueue()
+    manipulador_fila = logging.handlers.QueueHandler(fila)
+    ouvinte = logging.handlers.QueueListener(fila, arquivo, console, respect_handler_level=True)
+    raiz = logging.getLogger('')
+    # Descarta o manipulador padrão criado por registros emitidos antes desta configuração
+    for manipulador in list(raiz.handlers):
+        raiz.removeHandler(manipulador)
+        manipulador.close()
+    raiz.setLevel(getattr(logging, str(nivel).upper(), logging.INFO))
+    raiz.addHandler(manipulador_fila)
+    ouvinte.start()
+    atexit.register(ouvinte.stop)
+
+    def gravar_direto_no_filho():
+        raiz.removeHandler(manipulador_fila)
+        raiz.addHandler(arquivo)
+        raiz.addHandler(console)
+
+    os.register_at_fork(after_in_child=gravar_direto_no_filho)
+    return ouvinte
+
+def formatar_duracao(segundos):
+    """
+    Formata uma duração em segundos como '1h02m03s', '2m05s' ou '12s'.
+
+    Args:
+        segundos: Duração em segundos.
+
+    Returns:
+        str: Duração formatada.
+    """
+    segundos = int(round(segundos))
+    horas, resto = divmod(segundos, 3600)
+    minutos, segundos = divmod(resto, 60)
+    if horas:
+        return f"{horas}h{minutos:02d}m{segundos:02d}s"
+    if minutos:
+        return f"{minutos}m{segundos:02d}s"
+    return f"{segundos}s"
+
+class ProgressoEtapa:
+    """
+    Relatório de progresso de uma etapa limitado por tempo: no máximo uma linha a
+    cada 'intervalo' segundos, com a vazão desde o início e a estimativa de
+    término, em vez de uma linha por requisição.
+    """
+
+    def __init__(self, etapa, total=None, intervalo=10):
+        """
+        Args:
+            etapa: Nome da etapa exibido nas linhas de progresso.
+            total: Quantidade total de itens esperada (None se desconhecida).
+            intervalo: Intervalo mínimo, em segundos, entre duas linhas.
+        """
+        self.etapa = etapa
+        self.total = total
+        self.intervalo = intervalo
+        self.concluidos = 0
+        self.falhas = 0
+        self.inicio = time.monotonic()
+        self.ultimo_relato = self.inicio
+
+    def avancar(self, quantidade=1, falhas=0):
+        """
+        Contabiliza itens concluídos e relata o progresso se o intervalo expirou.
+
+        Args:
+            quantidade: Itens concluídos desde a última chamada.
+            falhas: Quantos desses itens falharam.
+        """
+        self.concluidos += quantidade
+        self.falhas += falhas
+        agora = time.monotonic()
+        if agora - self.ultimo_relato >= self.intervalo:
+            self.ultimo_relato = agora
+            self._relatar(agora)
+
+    def finalizar(self):
+        """Relata a linha final da etapa, com a vazão média."""
+        self._relatar(time.monotonic(), final=True)
+
+    def _relatar(self, agora, final=False):
+        decorrido = agora - self.inicio
+        taxa = self.concluidos / decorrido if decorrido > 0 else 0.0
+        eta = None
+        if not final and self.total and taxa > 0:
+            eta = max(self.total - self.concluidos, 0) / taxa
+        total = self.total if self.total is not None else '?'
+        mensagem = (f"{'Concluído' if final else 'Progresso'} '{self.etapa}': "
+                    f"{self.concluidos}/{total}, {self.falhas} falhas, {taxa:.1f}/s")
+        if final:
+            mensagem += f" em {formatar_duracao(decorrido)}"
+        elif eta is not None:
+            mensagem += f", ETA {formatar_duracao(eta)}"
+        logging.info(mensagem, extra={'dados': {
+            'etapa': self.etapa, 'concluidos': self.concluidos, 'total': self.total,
+            'falhas': self.falhas, 'taxa_por_segundo': round(taxa, 2),
+            'eta_segundos': round(eta, 1) if eta is not None else None,
+            'decorrido_segundos': round(decorrido, 1), 'final': final,
+        }})
+        print(mensagem)
+
+# ---------------------------- Módulo de Métricas ---------------------------- #
+
+# Limites superiores dos baldes dos histogramas de duração, em segundos
+BALDES_DURACAO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Tipo e descrição de cada métrica exposta em /metrics
+DESCRICOES_METRICAS = {
+    'requisicoes_total': ('counter', 'Requisições HTTP à API por tipo de endpoint e status (ou timeout/erro_conexao).'),
+    'latencia_requisicao_segundos': ('histogram', 'Latência de cada tentativa de requisição à API.'),
+    'bytes_recebidos_total': ('counter', 'Bytes de corpo recebidos da API.'),
+    'retentativas_total': ('counter', 'Tentativas repetidas após falha.'),
+    'falhas_requisicao_total': ('counter', 'Requisições que falharam depois de todas as tentativas.'),
+    'respostas_cache_total': ('counter', 'Respostas servidas pelo cache (replay ou revalidação 304).'),
+    'espera_limitador_segundos': ('histogram', 'Tempo de espera por uma vaga no limitador de concorrência.'),
+    'concorrencia_limite': ('gauge', 'Limite atual de requisições simultâneas do limitador adaptativo.'),
+    'requisicoes_em_andamento': ('gauge', 'Requisições em voo no limitador.'),
+    'profundidade_fila': ('gauge', 'Itens nas filas de trabalhos e de resultados de cada pool.'),
+    'linhas_gravadas_total': ('counter', 'Linhas enviadas ao armazenamento por tabela.'),
+    'duracao_processamento_segundos': ('histogram', 'Tempo de conversão das respostas em DataFrames por lote.'),
+    'duracao_gravacao_segundos': ('histogram', 'Tempo de cada gravação em lote (checkpoint) no armazenamento.'),
+    'licitacoes_alteradas_total': ('counter', 'Licitações já coletadas cuja impressão digital mudou e cujos detalhes foram reenfileirados.'),
+}
+
+class Metricas:
+    """
+    Registro de métricas em memória: contadores, medidores e histogramas com rótulos.
+
+    As operações são baratas (um dicionário e uma trava) para que possam ficar no caminho de cada
+    requisição. O registro é exposto no formato de texto do Prometheus/OpenMetrics (/metrics) e
+    resumido em JSON ao fim da execução.
+
+    Args:
+        prefixo: Prefixo aplicado aos nomes das métricas exportadas.
+    """
+
+    def __init__(self, prefixo='pncp'):
+        self.prefixo = prefixo
+        self.inicio = time.time()
+        self.contadores = {}
+        self.medidores = {}
+        self.histogramas = {}
+        self._trava = threading.Lock()
+
+    def incrementar(self, nome, valor=1, **rotulos):
+        chave = (nome, tuple(sorted(rotulos.items())))
+        with self._trava:
+            self.contadores[chave] = self.contadores.get(chave, 0) + valor
+
+    def definir(self, nome, valor, **rotulos):
+        chave = (nome, tuple(sorted(rotulos.items())))
+        with self._trava:
+            self.medidores[chave] = valor
+
+    def observar(self, nome, valor, **rotulos):
+        chave = (nome, tuple(sorted(rotulos.items())))
+        with self._trava:
+            histograma = self.histogramas.get(chave)
+            if histograma is None:
+                # [contagem por balde (o último é +Inf), soma, contagem, máximo]
+                histograma = self.histogramas[chave] = [[0] * (len(BALDES_DURACAO) + 1), 0.0, 0, 0.0]
+            histograma[0][bisect.bisect_left(BALDES_DURACAO, valor)] += 1
+            histograma[1] += valor
+            histograma[2] += 1
+            histograma[3] = max(histograma[3], valor)
+
+    @contextlib.contextmanager
+    def cronometro(self, nome, **rotulos):
+        """
+        Observa no histograma 'nome' a duração do bloco 'with'.
+        """
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(nome, time.perf_counter() - inicio, **rotulos)
+
+    @staticmethod
+    def _quantil(baldes, contagem, maximo, quantil):
+        # Interpolação linear dentro do balde, como o histogram_quantile do Prometheus
+        alvo = quantil * contagem
+        acumulado = 0
+        for indice, quantidade in enumerate(baldes):
+            if quantidade and acumulado + quantidade >= alvo:
+                inferior = BALDES_DURACAO[indice - 1] if indice else 0.0
+                superior = BALDES_DURACAO[indice] if indice < len(BALDES_DURACAO) else maximo
+                return min(inferior + (superior - inferior) * (alvo - acumulado) / quantidade, maximo)
+            acumulado += quantidade
+        return maximo
+
+    @staticmethod
+    def _rotulos(rotulos, extra=()):
+        pares = list(rotulos) + list(extra)
+        if not pares:
+            return ''
+        escapados = (str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, valor in pares)
+        texto = ','.join(f'{chave}="{valor}"' for (chave, _), valor in zip(pares, escapados))
+        return '{' + texto + '}'
+
+    def texto_prometheus(self):
+        """
+        Exporta o registro no formato de texto do Prometheus (compatível com OpenMetrics).
+        """
+        with self._trava:
+            contadores = dict(self.contadores)
+            medidores = dict(self.medidores)
+            histogramas = {chave: (list(h[0]), h[1], h[2], h[3]) for chave, h in self.histogramas.items()}
+        por_nome = collections.defaultdict(list)
+        for registro in (contadores, medidores, histogramas):
+            for (nome, rotulos), valor in registro.items():
+                por_nome[nome].append((rotulos, valor))
+
+        linhas = []
+        for nome in sorted(por_nome):
+            tipo, ajuda = DESCRICOES_METRICAS.get(nome, ('untyped', nome))
+            completo = f"{self.prefixo}_{nome}"
+            linhas.append(f"# HELP {completo} {ajuda}")
+            linhas.append(f"# TYPE {completo} {tipo}")
+            for rotulos, valor in sorted(por_nome[nome]):
+                if tipo != 'histogram':
+                    linhas.append(f"{completo}{self._rotulos(rotulos)} {valor}")
+                    continue
+                baldes, soma, contagem, _ = valor
+                acumulado = 0
+                for limite, quantidade in zip(BALDES_DURACAO + ('+Inf',), baldes):
+                    acumulado += quantidade
+                    linhas.append(f"{completo}_bucket{self._rotulos(rotulos, [('le', limite)])} {acumulado}")
+                linhas.append(f"{completo}_sum{self._rotulos(rotulos)} {soma}")
+                linhas.append(f"{completo}_count{self._rotulos(rotulos)} {contagem}")
+        return '\n'.join(linhas) + '\n'
+
+    def resumo(self):
+        """
+        Resume o registro em um dicionário serializável em JSON, com quantis aproximados dos
+        histogramas e a vazão média de gravação por tabela.
+        """
+        duracao = time.time() - self.inicio
+
+        def rotulo(rotulos):
+            return ','.join(f"{chave}={valor}" for chave, valor in rotulos) or 'total'
+
+        with self._trava:
+            resumo = {
+                'inicio': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.inicio)),
+                'duracao_s': round(duracao, 3),
+                'contadores': collections.defaultdict(dict),
+                'medidores': collections.defaultdict(dict),
+                'histogramas': collections.defaultdict(dict),
+            }
+            for (nome, rotulos), valor in sorted(self.contadores.items()):
+                resumo['contadores'][nome][rotulo(rotulos)] = valor
+            for (nome, rotulos), valor in sorted(self.medidores.items()):
+                resumo['medidores'][nome][rotulo(rotulos)] = valor
+            for (nome, rotulos), (baldes, soma, contagem, maximo) in sorted(self.histogramas.items()):
+                resumo['histogramas'][nome][rotulo(rotulos)] = {
+                    'contagem': contagem,
+                    'soma': round(soma, 6),
+                    'media': round(soma / contagem, 6) if contagem else 0.0,
+                    'p50': round(self._quantil(baldes, contagem, maximo, 0.50), 6),
+                    'p95': round(self._quantil(baldes, contagem, maximo, 0.95), 6),
+                    'p99': round(self._quantil(baldes, contagem, maximo, 0.99), 6),
+                    'maximo': round(maximo, 6),
+                }
+        resumo['linhas_por_segundo'] = {
+            tabela: round(linhas / duracao, 1) if duracao else 0.0
+            for tabela, linhas in resumo['contadores'].get('linhas_gravadas_total', {}).items()
+        }
+        return resumo
+
+    def gravar_resumo(self, caminho):
+        with open(caminho, 'w', encoding='utf-8') as f:
+            json.dump(self.resumo(), f, ensure_ascii=False, indent=2)
+        logging.info(f"Resumo das métricas gravado em {caminho}.")
+
+# Registro único do processo, como o logging: as funções de requisição e gravação o alimentam sem
+# que ele precise ser repassado por todas as chamadas
+METRICAS = Metricas()
+
+def tipo_endpoint(url):
+    """
+    Classifica a URL de uma requisição no tipo de endpoint usado como rótulo das métricas.
+    """
+    caminho = urllib.parse.urlsplit(url).path.rstrip('/')
+    for sufixo, tipo in (('/search', 'busca'), ('/resultados', 'resultados'), ('/quantidade', 'quantidade'),
+                         ('/itens', 'itens'), ('/arquivos', 'arquivos')):
+        if caminho.endswith(sufixo):
+            return tipo
+    return 'outro'
+
+async def executar_com_metricas(config, corrotina):
+    """
+    Executa a corrotina com o endpoint de métricas aberto (se configurado).
+    """
+    async with servidor_metricas(config):
+        return await corrotina
+
+@contextlib.asynccontextmanager
+async def servidor_metricas(config):
+    """
+    Expõe as métricas do processo em http://127.0.0.1:<porta_metricas>/metrics enquanto o bloco
+    'async with' estiver ativo. Com 'porta_metricas' igual a 0, não faz nada.
+    """
+    if not config['porta_metricas']:
+        yield
+        return
+
+    async def metricas(request):
+        return web.Response(text=METRICAS.texto_prometheus(), content_type='text/plain', charset='utf-8')
+
+    aplicacao = web.Application()
+    aplicacao.router.add_get('/metrics', metricas)
+    runner = web.AppRunner(aplicacao)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, config['endereco_metricas'], config['porta_metricas']).start()
+        logging.info(f"Métricas disponíveis em http://{config['endereco_metricas']}:{config['porta_metricas']}/metrics.")
+    except OSError as e:
+        logging.error(f"Não foi possível abrir o endpoint de métricas na porta {config['porta_metricas']}: {str(e)}")
+    try:
+        yield
+    finally:
+        await runner.cleanup()
 
 # ---------------------------- Módulo de Diretórios e Arquivos ---------------------------- #
 
@@ -126,581 +629,4747 @@ def setup_directories():
         'itens_csv': os.path.join(main_directory, 'itens.csv'),
         'resultados_csv': os.path.join(main_directory, 'resultados.csv'),
         'arquivos_csv': os.path.join(main_directory, 'arquivos.csv'),
+        'documentos_csv': os.path.join(main_directory, 'documentos.csv'),
+        'conteudos_csv': os.path.join(main_directory, 'conteudos.csv'),
+        'historico_licitacoes_csv': os.path.join(main_directory, 'historico_licitacoes.csv'),
+        'banco_sqlite': os.path.join(main_directory, 'raspagem.db'),
+        'estado_json': os.path.join(main_directory, 'estado.json'),
+        'diario_db': os.path.join(main_directory, 'diario.db'),
+        'cache_db': os.path.join(main_directory, 'cache.db'),
+        'fila_db': os.path.join(main_directory, 'fila.db'),
+        'busca_db': os.path.join(main_directory, 'busca.db'),
+        'metricas_json': os.path.join(main_directory, 'metricas.json'),
+        'exportacao_directory': os.path.join(main_directory, 'exportacao'),
+        'parquet_directory': os.path.join(main_directory, 'parquet'),
+        'indices_directory': os.path.join(main_directory, 'indices'),
+        'documentos_directory': os.path.join(main_directory, 'documentos'),
         'log_file': os.path.join(main_directory, 'raspagem_pncp.log')
     }
 
     return paths
 
-# ---------------------------- Módulo de Armazenamento ---------------------------- #
-def load_dataframes(paths):
+# ---------------------------- Módulo de Índice de Chaves ---------------------------- #
+
+# Bits do filtro de Bloom por chave e número de funções de hash (cerca de 1% de falsos positivos)
+BITS_POR_CHAVE_BLOOM = 10
+FUNCOES_BLOOM = 7
+
+# Número mínimo de chaves recentes a partir do qual elas são fundidas ao vetor principal do índice
+LIMITE_DELTA_INDICE = 100000
+
+# Número de chaves processadas por vez ao montar o filtro de Bloom
+LOTE_BLOOM = 1000000
+
+# Resumo das chaves gravado no índice; um índice gerado com outro algoritmo é reconstruído
+ALGORITMO_RESUMO = 'blake2b-128'
+TIPO_RESUMO = np.dtype('S16')
+
+def resumos_chaves(chaves):
     """
-    Carrega os dataframes existentes ou cria novos se não existirem.
+    Calcula o resumo BLAKE2b de 128 bits de cada chave textual. O algoritmo é fixo, e os resumos
+    não mudam entre versões do Python ou do pandas; com 128 bits, a chance de duas chaves terem o
+    mesmo resumo é desprezível mesmo com bilhões de chaves.
 
     Args:
-        paths: Dicionário com os caminhos dos arquivos.
+        chaves: Sequência de chaves textuais.
 
     Returns:
-        df_licitacoes: DataFrame principal de licitações.
-        df_itens: DataFrame de itens.
-        df_arquivos: DataFrame de arquivos.
+        np.ndarray: Resumos (bytes de 16 posições), na ordem das chaves.
     """
-    # Inicializa dataframes vazios
-    df_licitacoes = pd.DataFrame()
-    df_itens = pd.DataFrame()
-    df_arquivos = pd.DataFrame()
-    df_resultados = pd.DataFrame()
+    return np.array([hashlib.blake2b(str(chave).encode('utf-8'), digest_size=16).digest() for chave in chaves], dtype=TIPO_RESUMO)
 
-    # Tenta carregar os dataframes existentes
-    try:
-        if os.path.exists(paths['licitacoes_csv']):
-            df_licitacoes = pd.read_csv(paths['licitacoes_csv'], dtype=str,sep='\t')
-            # Verifica se as colunas de controle existem, se não, as cria
-            if 'detalhes_baixados' not in df_licitacoes.columns:
-                df_licitacoes['detalhes_baixados'] = False
-                logging.info("Coluna 'detalhes_baixados' adicionada ao DataFrame de licitações.")
-            if 'documentos_baixados' not in df_licitacoes.columns:
-                df_licitacoes['documentos_baixados'] = False
-                logging.info("Coluna 'documentos_baixados' adicionada ao DataFrame de licitações.")
-            # Remove duplicatas com base em 'numero_controle_pncp'
-            df_licitacoes.drop_duplicates(subset='numero_controle_pncp', keep='last', inplace=True)
-    except Exception as e:
-        logging.error(f"Erro ao carregar {paths['licitacoes_csv']}: {str(e)}")
+class IndiceChaves:
+    """
+    Índice persistente das chaves de uma tabela, para testar a existência de milhões de chaves sem
+    mantê-las em memória.
 
-    try:
-        if os.path.exists(paths['itens_csv']):
-            df_itens = pd.read_csv(paths['itens_csv'], dtype=str,sep='\t')
-            # Verifica se a coluna 'Resultados verificados' existe, se não, a cria
-            if 'Resultados verificados' not in df_itens.columns:
-                df_itens['Resultados verificados'] = False
-                logging.info("Coluna 'Resultados verificados' adicionada ao DataFrame de itens.")
-                # Salva o DataFrame atualizado para garantir que a coluna exista no CSV
-                df_itens.to_csv(paths['itens_csv'], index=False,sep='\t')
-    except Exception as e:
-        logging.error(f"Erro ao carregar {paths['itens_csv']}: {str(e)}")
+    As chaves são guardadas como resumos de 128 bits em um vetor ordenado ('<caminho>.npy'), aberto por
+    mapeamento de memória, com um filtro de Bloom ('<caminho>.bloom') à frente: só as chaves que
+    passam pelo filtro são procuradas no vetor, por busca binária. As chaves acrescentadas depois da
+    última fusão ficam em um vetor ordenado menor ('<caminho>.delta', gravado só por acréscimo), que é
+    fundido ao principal quando passa de 1/8 dele. Em '<caminho>.json' ficam o algoritmo de resumo,
+    o número de chaves do vetor principal e a marca, definida por quem usa o índice, do estado dos
+    dados que ele cobre.
+    Abrir o índice não lê os vetores, apenas mapeia os arquivos.
+    """
 
-    try:
-        if os.path.exists(paths['resultados_csv']):
-            df_resultados = pd.read_csv(paths['resultados_csv'],dtype=str,sep='\t')
-    except Exception as e:
-        logging.error(f"Erro ao carregar {paths['resultados_csv']}: {str(e)}")
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.marca = None
+        self._carregar()
 
+    def _vazio(self):
+        self.principal = np.zeros(0, dtype=TIPO_RESUMO)
+        self.bloom = np.zeros(0, dtype=np.uint8)
+        self.delta = np.zeros(0, dtype=TIPO_RESUMO)
+        # Resumos acrescentados ao delta e ainda não gravados no arquivo
+        self.pendentes = np.zeros(0, dtype=TIPO_RESUMO)
 
-    try:
-        if os.path.exists(paths['arquivos_csv']):
-            df_arquivos = pd.read_csv(paths['arquivos_csv'],dtype=str,sep='\t')
-    except Exception as e:
-        logging.error(f"Erro ao carregar {paths['arquivos_csv']}: {str(e)}")
+    def _carregar(self):
+        self._vazio()
+        try:
+            with open(f"{self.caminho}.json", encoding='utf-8') as f:
+                metadados = json.load(f)
+            if metadados.get('algoritmo') != ALGORITMO_RESUMO:
+                raise ValueError(f"resumos gerados com '{metadados.get('algoritmo')}', esperado '{ALGORITMO_RESUMO}'")
+            if metadados['chaves']:
+                self.principal = np.load(f"{self.caminho}.npy", mmap_mode='r')
+                self.bloom = np.memmap(f"{self.caminho}.bloom", dtype=np.uint8, mode='r')
+            if len(self.principal) != metadados['chaves']:
+                raise ValueError(f"vetor com {len(self.principal)} chaves, esperadas {metadados['chaves']}")
+            if os.path.exists(f"{self.caminho}.delta"):
+                self.delta = np.unique(np.fromfile(f"{self.caminho}.delta", dtype=TIPO_RESUMO))
+            self.marca = metadados['marca']
+        except FileNotFoundError:
+            self._vazio()
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"Índice de chaves {self.caminho} descartado, será reconstruído: {e}")
+            self._vazio()
 
-    return df_licitacoes, df_itens, df_arquivos, df_resultados
+    def __len__(self):
+        return len(self.principal) + len(self.delta)
 
-def save_dataframes(df_licitacoes, df_itens, df_arquivos, paths):
-    """
-    Salva os dataframes em arquivos CSV.
+    @staticmethod
+    def _posicoes(resumos, bits):
+        """
+        Posições das FUNCOES_BLOOM funções de hash de cada resumo no filtro (hash duplo sobre as
+        duas metades de 64 bits do resumo).
+        """
+        bits = np.uint64(bits)
+        metades = np.ascontiguousarray(resumos, dtype=TIPO_RESUMO).view('<u8').reshape(-1, 2)
+        h1 = metades[:, 0] % bits
+        h2 = (metades[:, 1] % bits) | np.uint64(1)
+        return (h1[:, None] + np.arange(FUNCOES_BLOOM, dtype=np.uint64)[None, :] * h2[:, None]) % bits
 
-    Args:
-        df_licitacoes: DataFrame principal de licitações.
-        df_itens: DataFrame de itens.
-        df_arquivos: DataFrame de arquivos.
-        paths: Dicionário com os caminhos dos arquivos.
+    def _no_bloom(self, resumos):
+        if not len(self.bloom):
+            return np.zeros(len(resumos), dtype=bool)
+        posicoes = self._posicoes(resumos, len(self.bloom) * 8)
+        ligados = (self.bloom[posicoes >> np.uint64(3)] >> (posicoes & np.uint64(7)).astype(np.uint8)) & 1
+        return ligados.all(axis=1)
+
+    @staticmethod
+    def _em(ordenados, resumos):
+        if not len(ordenados):
+            return np.zeros(len(resumos), dtype=bool)
+        posicoes = np.minimum(np.searchsorted(ordenados, resumos), len(ordenados) - 1)
+        return ordenados[posicoes] == resumos
+
+    def _contem_resumos(self, resumos):
+        presentes = self._em(self.delta, resumos)
+        candidatos = ~presentes & self._no_bloom(resumos)
+        if candidatos.any():
+            presentes[candidatos] = self._em(self.principal, resumos[candidatos])
+        return presentes
+
+    def contem(self, chaves):
+        """
+        Testa a existência de cada chave no índice.
+
+        Args:
+            chaves: Sequência de chaves textuais.
+
+        Returns:
+            np.ndarray: Vetor booleano, na ordem das chaves.
+        """
+        return self._contem_resumos(resumos_chaves(chaves))
+
+    def adicionar(self, chaves):
+        """
+        Acrescenta chaves ao índice em memória; elas só vão para o disco em 'salvar'.
+
+        Args:
+            chaves: Sequência de chaves textuais.
+        """
+        resumos = np.unique(resumos_chaves(chaves))
+        novos = resumos[~self._contem_resumos(resumos)]
+        if len(novos):
+            self.delta = np.union1d(self.delta, novos)
+            self.pendentes = np.concatenate([self.pendentes, novos])
+
+    def reconstruir(self, lotes, marca):
+        """
+        Reconstrói o índice a partir de todas as chaves dos dados e o grava.
+
+        Args:
+            lotes: Iterável de sequências de chaves textuais.
+            marca: Marca do estado dos dados de onde vieram as chaves.
+        """
+        resumos = [resumos_chaves(chaves) for chaves in lotes]
+        self._vazio()
+        if resumos:
+            self.principal = np.unique(np.concatenate(resumos))
+        self._gravar(marca)
+
+    def salvar(self, marca):
+        """
+        Grava as chaves acrescentadas desde o último salvamento, fundindo o delta ao vetor principal
+        quando ele passa do limite, e registra a marca dos dados cobertos pelo índice.
+
+        Args:
+            marca: Marca do estado atual dos dados.
+        """
+        if len(self.delta) >= max(LIMITE_DELTA_INDICE, len(self.principal) // 8):
+            self.principal = np.union1d(self.principal, self.delta)
+            self.delta = np.zeros(0, dtype=TIPO_RESUMO)
+            self.pendentes = np.zeros(0, dtype=TIPO_RESUMO)
+            self._gravar(marca)
+            return
+        if len(self.pendentes):
+            os.makedirs(os.path.dirname(self.caminho) or '.', exist_ok=True)
+            with open(f"{self.caminho}.delta", 'ab') as f:
+                self.pendentes.tofile(f)
+            self.pendentes = np.zeros(0, dtype=TIPO_RESUMO)
+        self._gravar_metadados(marca)
+
+    def _gravar(self, marca):
+        """
+        Grava o vetor principal e o filtro de Bloom dimensionado para ele, e reabre ambos mapeados.
+        """
+        os.makedirs(os.path.dirname(self.caminho) or '.', exist_ok=True)
+        bits = max(BITS_POR_CHAVE_BLOOM * len(self.principal), 65536) // 8 * 8
+        ligados = np.zeros(bits, dtype=bool)
+        for inicio in range(0, len(self.principal), LOTE_BLOOM):
+            ligados[self._posicoes(np.asarray(self.principal[inicio:inicio + LOTE_BLOOM]), bits).ravel()] = True
+        with open(f"{self.caminho}.npy.tmp", 'wb') as f:
+            np.save(f, np.asarray(self.principal, dtype=TIPO_RESUMO))
+        np.packbits(ligados, bitorder='little').tofile(f"{self.caminho}.bloom.tmp")
+        os.replace(f"{self.caminho}.npy.tmp", f"{self.caminho}.npy")
+        os.replace(f"{self.caminho}.bloom.tmp", f"{self.caminho}.bloom")
+        if os.path.exists(f"{self.caminho}.delta"):
+            os.remove(f"{self.caminho}.delta")
+        if len(self.delta):
+            self.delta.tofile(f"{self.caminho}.delta")
+        self.pendentes = np.zeros(0, dtype=TIPO_RESUMO)
+        self._gravar_metadados(marca)
+        if len(self.principal):
+            self.principal = np.load(f"{self.caminho}.npy", mmap_mode='r')
+            self.bloom = np.memmap(f"{self.caminho}.bloom", dtype=np.uint8, mode='r')
+
+    def _gravar_metadados(self, marca):
+        os.makedirs(os.path.dirname(self.caminho) or '.', exist_ok=True)
+        with open(f"{self.caminho}.json.tmp", 'w', encoding='utf-8') as f:
+            json.dump({'algoritmo': ALGORITMO_RESUMO, 'chaves': len(self.principal), 'marca': marca}, f)
+        os.replace(f"{self.caminho}.json.tmp", f"{self.caminho}.json")
+        self.marca = marca
+
+# ---------------------------- Módulo de Armazenamento ---------------------------- #
+
+# Chaves naturais de cada tabela, usadas na deduplicação e nos upserts
+CHAVES_TABELAS = {
+    'licitacoes': ['numero_controle_pncp'],
+    'itens': ['numero_controle_pncp', 'numeroItem'],
+    'arquivos': ['numero_controle_pncp', 'sequencialDocumento'],
+    'resultados': ['numero_controle_pncp', 'numeroItem', 'sequencialResultado'],
+    'documentos': ['numero_controle_pncp', 'sequencialDocumento', 'caminho'],
+    'conteudos': ['sha256'],
+    'historico_licitacoes': ['numero_controle_pncp', 'impressao_digital'],
+}
+
+# Arquivos TSV legados correspondentes a cada tabela
+ARQUIVOS_TABELAS = {
+    'licitacoes': 'licitacoes_csv',
+    'itens': 'itens_csv',
+    'arquivos': 'arquivos_csv',
+    'resultados': 'resultados_csv',
+    'documentos': 'documentos_csv',
+    'conteudos': 'conteudos_csv',
+    'historico_licitacoes': 'historico_licitacoes_csv',
+}
+
+# Colunas de controle do processo: um upsert nunca sobrescreve o valor já gravado
+COLUNAS_CONTROLE = ('detalhes_baixados', 'documentos_baixados', 'Resultados verificados', 'verificacao_arquivos', 'documento_armazenado',
+                    'proxima_verificacao_resultados', 'verificacoes_resultados')
+
+# Marca de alteração gravada em cada linha inserida ou modificada, usada pelas etapas incrementais
+# (ex.: o índice de busca) para encontrar as linhas novas ou alteradas desde a última execução
+COLUNA_ALTERACAO = 'alterado_em'
+
+# Tempo máximo, em segundos, que uma conexão SQLite espera pela trava de escrita de outro processo
+TEMPO_ESPERA_TRAVA = 60
+
+def marca_alteracao():
+    # Inteiro de largura fixa: a ordem textual, usada no armazenamento, coincide com a numérica
+    return f"{time.time_ns():020d}"
+
+def _com_marca_alteracao(df, tabela):
     """
-    try:
-        df_licitacoes.to_csv(paths['licitacoes_csv'], index=False,sep='\t')
-        logging.info(f"DataFrame de licitações salvo em {paths['licitacoes_csv']}.")
-    except Exception as e:
-        logging.error(f"Erro ao salvar {paths['licitacoes_csv']}: {str(e)}")
+    Acrescenta a marca de alteração a um lote, a menos que ele altere apenas chaves e colunas de controle.
+    """
+    ignoradas = set(CHAVES_TABELAS[tabela]) | set(COLUNAS_CONTROLE)
+    if all(coluna in ignoradas for coluna in df.columns):
+        return df
+    return df.assign(**{COLUNA_ALTERACAO: marca_alteracao()})
 
-    try:
-        df_itens.to_csv(paths['itens_csv'], index=False,sep='\t')
-        logging.info(f"DataFrame de itens salvo em {paths['itens_csv']}.")
-    except Exception as e:
-        logging.error(f"Erro ao salvar {paths['itens_csv']}: {str(e)}")
+# Esquemas tipados de cada entidade; colunas ausentes do esquema permanecem como texto.
+# As chaves naturais não aparecem aqui: continuam textuais para casar com o armazenamento.
+ESQUEMAS_TABELAS = {
+    'licitacoes': {
+        'orgao_cnpj': 'categoria', 'orgao_nome': 'categoria', 'unidade_codigo': 'categoria', 'unidade_nome': 'categoria',
+        'esfera_nome': 'categoria', 'poder_nome': 'categoria', 'municipio_nome': 'categoria', 'uf': 'categoria',
+        'modalidade_licitacao_id': 'categoria', 'modalidade_licitacao_nome': 'categoria',
+        'situacao_id': 'categoria', 'situacao_nome': 'categoria', 'tipo_id': 'categoria', 'tipo_nome': 'categoria',
+        'document_type': 'categoria', 'doc_type': 'categoria', 'ano': 'categoria',
+        'valor_global': 'numero', 'cancelado': 'booleano', 'tem_resultado': 'booleano',
+        'data_publicacao_pncp': 'data', 'data_atualizacao_pncp': 'data', 'data_assinatura': 'data',
+        'data_inicio_vigencia': 'data', 'data_fim_vigencia': 'data', 'createdAt': 'data',
+        'detalhes_baixados': 'booleano', 'documentos_baixados': 'booleano',
+    },
+    'itens': {
+        'orgao_cnpj': 'categoria', 'ano': 'categoria', 'materialOuServico': 'categoria', 'materialOuServicoNome': 'categoria',
+        'unidadeMedida': 'categoria', 'itemCategoriaId': 'categoria', 'itemCategoriaNome': 'categoria',
+        'criterioJulgamentoId': 'categoria', 'criterioJulgamentoNome': 'categoria',
+        'situacaoCompraItem': 'categoria', 'situacaoCompraItemNome': 'categoria',
+        'tipoBeneficio': 'categoria', 'tipoBeneficioNome': 'categoria', 'ncmNbsCodigo': 'categoria',
+        'quantidade': 'numero', 'valorUnitarioEstimado': 'numero', 'valorTotal': 'numero',
+        'orcamentoSigiloso': 'booleano', 'temResultado': 'booleano', 'incentivoProdutivoBasico': 'booleano',
+        'dataInclusao': 'data', 'dataAtualizacao': 'data',
+        'Resultados verificados': 'booleano',
+    },
+    'arquivos': {
+        'cnpj': 'categoria', 'anoCompra': 'categoria', 'tipoDocumentoId': 'categoria', 'tipoDocumentoNome': 'categoria',
+        'tipoDocumentoDescricao': 'categoria', 'statusAtivo': 'booleano', 'dataPublicacaoPncp': 'data',
+        'verificacao_arquivos': 'booleano', 'tamanho_bytes': 'numero', 'documento_armazenado': 'booleano',
+    },
+    'resultados': {
+        'niFornecedor': 'categoria', 'nomeRazaoSocialFornecedor': 'categoria', 'tipoPessoa': 'categoria', 'codigoPais': 'categoria',
+        'porteFornecedorId': 'categoria', 'porteFornecedorNome': 'categoria',
+        'naturezaJuridicaId': 'categoria', 'naturezaJuridicaNome': 'categoria',
+        'situacaoCompraItemResultadoId': 'categoria', 'situacaoCompraItemResultadoNome': 'categoria',
+        'quantidadeHomologada': 'numero', 'valorUnitarioHomologado': 'numero', 'valorTotalHomologado': 'numero',
+        'percentualDesconto': 'numero', 'ordemClassificacaoSrp': 'numero',
+        'aplicacaoMargemPreferencia': 'booleano', 'aplicacaoBeneficioMeEpp': 'booleano', 'aplicacaoCriterioDesempate': 'booleano',
+        'dataResultado': 'data', 'dataInclusao': 'data', 'dataAtualizacao': 'data', 'dataCancelamento': 'data',
+    },
+    'documentos': {
+        'arquivo_pai': 'categoria', 'tipo_mime': 'categoria', 'situacao': 'categoria',
+        'profundidade': 'numero', 'tamanho': 'numero', 'tamanho_compactado': 'numero',
+    },
+    'conteudos': {
+        'tipo_mime': 'categoria', 'tamanho': 'numero',
+    },
+    'historico_licitacoes': {
+        'data_atualizacao_pncp': 'data', 'coletada_em': 'data',
+    },
+}
 
-    try:
-        df_arquivos.to_csv(paths['arquivos_csv'], index=False,sep='\t')
-        logging.info(f"DataFrame de arquivos salvo em {paths['arquivos_csv']}.")
-    except Exception as e:
-        logging.error(f"Erro ao salvar {paths['arquivos_csv']}: {str(e)}")
+VALORES_BOOLEANOS = {True: True, False: False, 'True': True, 'False': False, 'true': True, 'false': False, '1': True, '0': False}
 
-# ---------------------------- Módulo de Requisições ---------------------------- #
+def _converter_datas(serie):
+    try:
+        datas = pd.to_datetime(serie, errors='coerce', format='ISO8601')
+    except (ValueError, TypeError):
+        # Fusos horários misturados: normaliza para UTC e descarta o fuso
+        datas = pd.to_datetime(serie, errors='coerce', format='ISO8601', utc=True).dt.tz_localize(None)
+    # Resolução fixa, para que lotes diferentes produzam o mesmo tipo
+    return datas.astype('datetime64[us]')
 
-async def fetch_with_retry(session, url, params, config, tentativa=1):
+def achatar_registros(registros):
     """
-    Realiza uma requisição HTTP com retentativas e backoff exponencial.
+    Cria um DataFrame a partir dos registros da API, achatando os objetos aninhados em colunas
+    próprias ('objeto_campo'), recursivamente. Apenas as colunas que de fato contêm objetos são expandidas.
 
     Args:
-        session: Sessão HTTP.
-        url: URL da requisição.
-        params: Parâmetros da requisição.
-        config: Configurações do sistema.
-        tentativa: Número da tentativa atual.
+        registros: Lista de registros (dicionários).
 
     Returns:
-        response_data: Dados da resposta em formato JSON, ou None em caso de falha.
+        df: DataFrame com uma coluna por campo.
     """
-    try:
-        async with session.get(url, params=params, timeout=10) as response:
-            response.raise_for_status()
-            json_response = await response.json()
-            return json_response
-    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
-        if tentativa <= config['tentativas_maximas']:
-            tempo_espera = config['tempo_espera_inicial'] * (2 ** (tentativa - 1)) + random.uniform(0, 1)
-            await asyncio.sleep(tempo_espera)
-            if config['verbose']:
-                print(f"Tentativa {tentativa} falhou para {url}. Retentando em {tempo_espera:.2f} segundos...")
-            logging.warning(f"Tentativa {tentativa} falhou para {url}: {str(e)}")
-            return await fetch_with_retry(session, url, params, config, tentativa + 1)
-        else:
-            logging.error(f"Falha na requisição após {config['tentativas_maximas']} tentativas: {str(e)}")
-            return None
+    df = pd.DataFrame(registros)
+    for coluna in df.columns[df.dtypes == object]:
+        if pd.api.types.infer_dtype(df[coluna], skipna=True) != 'mixed':
+            continue
+        objetos = df[coluna].map(lambda valor: isinstance(valor, dict))
+        if not objetos.any():
+            continue
+        expandidas = achatar_registros([valor if isinstance(valor, dict) else {} for valor in df[coluna]])
+        expandidas.index = df.index
+        df = pd.concat([df.drop(columns=coluna), expandidas.add_prefix(f"{coluna}_")], axis=1)
+    return df
 
-async def limited_fetch(semaphore, session, url, params, config):
+def aplicar_esquema(df, tabela):
     """
-    Controla o número máximo de conexões simultâneas.
+    Converte, de forma vetorizada, as colunas conhecidas de um DataFrame para os tipos do esquema da tabela:
+    categorias para campos repetitivos, números para valores, datas e booleanos.
 
     Args:
-        semaphore: Semáforo para limitar conexões.
-        session: Sessão HTTP.
-        url: URL da requisição.
-        params: Parâmetros da requisição.
-        config: Configurações do sistema.
+        df: DataFrame com os registros (valores brutos da API ou texto do armazenamento).
+        tabela: Nome da tabela cujo esquema será aplicado.
 
     Returns:
-        response_data: Dados da resposta em formato JSON, ou None em caso de falha.
+        df_tipado: DataFrame com as colunas convertidas.
     """
-    async with semaphore:
-        return await fetch_with_retry(session, url, params, config)
+    conversoes = {}
+    for coluna, tipo in ESQUEMAS_TABELAS.get(tabela, {}).items():
+        if coluna not in df.columns:
+            continue
+        serie = df[coluna]
+        if tipo == 'categoria':
+            conversoes[coluna] = serie.astype('category')
+        elif tipo == 'numero':
+            conversoes[coluna] = pd.to_numeric(serie, errors='coerce').astype('float64')
+        elif tipo == 'data':
+            conversoes[coluna] = _converter_datas(serie)
+        elif tipo == 'booleano':
+            conversoes[coluna] = serie.map(VALORES_BOOLEANOS).astype('boolean')
+    if not conversoes:
+        return df
+    return df.assign(**conversoes)
 
-async def fetch_licitacoes(tipos_documento, ordenacao, pages, config):
+def _valor_texto(valor):
     """
-    Realiza as requisições das licitações de forma assíncrona para cada tipo de documento.
+    Converte um valor vindo da API para o formato textual usado no armazenamento.
 
     Args:
-        tipos_documento: Lista de tipos de documento ('edital', 'ata', etc.).
-        pages: Lista de números de páginas a serem requisitadas.
-        config: Configurações do sistema.
+        valor: Valor a ser convertido.
 
     Returns:
-        responses: Lista de respostas das requisições.
+        valor_texto: Valor como string, ou None para valores ausentes.
     """
-    base_url = "https://pncp.gov.br/api/search/"
-    semaphore = asyncio.Semaphore(config['numero_maximo_conexoes'])
-    tasks = []
-    responses = []
+    if isinstance(valor, (dict, list)):
+        return str(valor)
+    if valor is None or pd.isna(valor):
+        return None
+    if isinstance(valor, pd.Timestamp):
+        # Mantém o formato ISO da API ('2024-01-01T10:00:00')
+        return valor.isoformat()
+    if isinstance(valor, float) and valor.is_integer():
+        # Evita que chaves numéricas como 'numeroItem' virem '1.0'
+        return str(int(valor))
+    return str(valor)
 
-    async with aiohttp.ClientSession() as session:
-        for ordem in ordenacao:
-            for tipo in tipos_documento:
-                for page in pages:
-                    params = {
-                        "pagina": page,
-                        "tam_pagina": config['tam_pagina'],
-                        "ordenacao": ordem,
-                        "q": "",
-                        "tipos_documento": tipo,
-                        "status": "todos"
-                    }
-                    task = asyncio.create_task(limited_fetch(semaphore, session, base_url, params, config))
-                    tasks.append((tipo, page, ordem, task))
-
-        total_tasks = len(tasks)
-        completed_tasks = 0
-        for tipo, page, ordem, task in tasks:
-            response = await task
-            responses.append(response)
-            completed_tasks += 1
-            print(f"Requisição concluída: Tipo Documento='{tipo}', Ordenação='{ordem}', Página={page} ({completed_tasks}/{total_tasks})")
-            logging.info(f"Requisição concluída: Tipo Documento='{tipo}', Ordenação='{ordem}', Página={page} ({completed_tasks}/{total_tasks})")
+def _serie_texto(serie):
+    """
+    Converte uma coluna para o formato textual do armazenamento (mesmo resultado de _valor_texto),
+    usando operações vetorizadas sempre que o tipo da coluna permite.
+    """
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        # Converte apenas as categorias distintas
+        return serie.cat.rename_categories(serie.cat.categories.map(_valor_texto)).astype(object).where(serie.notna(), None)
 
-    return responses
+    tipo = pd.api.types.infer_dtype(serie, skipna=True)
+    ausentes = serie.isna()
+    if tipo in ('string', 'empty'):
+        texto = serie.astype(object)
+    elif tipo == 'integer':
+        texto = serie.astype(object).where(ausentes, serie.astype('Int64').astype(str))
+    elif tipo in ('floating', 'mixed-integer-float'):
+        numeros = pd.to_numeric(serie, errors='coerce').astype('float64')
+        inteiros = numeros.notna() & (numeros % 1 == 0) & (numeros.abs() < 2 ** 53)
+        fracionarios = numeros.notna() & ~inteiros
+        texto = pd.Series(None, index=serie.index, dtype=object)
+        texto[inteiros] = numeros[inteiros].astype('int64').astype(str)
+        texto[fracionarios] = numeros[fracionarios].astype(str)
+    elif tipo == 'boolean':
+        texto = serie.map({True: 'True', False: 'False'}).astype(object)
+    elif tipo in ('datetime64', 'datetime'):
+        texto = pd.Series(pd.to_datetime(serie).to_numpy().astype('datetime64[s]').astype(str), index=serie.index, dtype=object)
+    else:
+        return serie.map(_valor_texto).astype(object)
+    return texto.where(~ausentes, None)
 
-async def fetch_detalhes(registros, data_type, config):
+def normalizar_para_texto(df, tabela):
     """
-    Realiza as requisições dos detalhes (itens ou arquivos) de forma assíncrona.
+    Normaliza um DataFrame para o formato textual do armazenamento, garantindo as colunas de chave.
 
     Args:
-        registros: Lista de registros para os quais os detalhes serão buscados.
-        data_type: Tipo de detalhe ('itens' ou 'arquivos').
-        config: Configurações do sistema.
+        df: DataFrame a ser normalizado.
+        tabela: Nome da tabela de destino.
 
     Returns:
-        detalhes_list: Lista de detalhes obtidos.
+        df_normalizado: DataFrame com valores textuais e sem chaves duplicadas.
     """
-    base_url = "https://pncp.gov.br/api/pncp/v1/orgaos/"
-    semaphore = asyncio.Semaphore(config['numero_maximo_conexoes'])
-    tasks = []
-    detalhes_list = []
+    df_normalizado = pd.DataFrame({coluna: _serie_texto(df[coluna]) for coluna in df.columns}, dtype=object)
+    chaves = CHAVES_TABELAS[tabela]
+    for chave in chaves:
+        if chave not in df_normalizado.columns:
+            df_normalizado[chave] = ''
+        # Chaves nulas não participam de índices únicos; usa string vazia no lugar
+        df_normalizado[chave] = df_normalizado[chave].fillna('')
+    return df_normalizado.drop_duplicates(subset=chaves, keep='last')
 
-    async with aiohttp.ClientSession() as session:
-        for registro in registros:
-            orgao_cnpj = registro.get('orgao_cnpj')
-            ano = registro.get('ano')
-            numero_sequencial = registro.get('numero_sequencial')
-            numero_controle_pncp = registro.get('numero_controle_pncp')
+# Separador das colunas da chave natural na chave textual usada pelo índice do backend TSV
+SEPARADOR_CHAVE = '\x1f'
 
-            if not all([orgao_cnpj, ano, numero_sequencial, numero_controle_pncp]):
-                logging.warning(f"Dados incompletos para a licitação '{numero_controle_pncp}'. Pulando...")
-                if config['verbose']:
-                    print(f"Aviso: Dados incompletos para a licitação '{numero_controle_pncp}'. Pulando...")
-                continue
+# Número de atualizações pendentes no registro de um TSV acima do qual o arquivo é regravado
+LIMITE_ATUALIZACOES_TSV = 100000
 
-            url = f"{base_url}{orgao_cnpj}/compras/{ano}/{numero_sequencial}/{data_type}"
-            params = {
-                "pagina": 1,
-                "tamanhoPagina": 20
-            }
-            task = asyncio.create_task(limited_fetch(semaphore, session, url, params, config))
-            tasks.append((numero_controle_pncp, orgao_cnpj, ano, numero_sequencial, task))
-
-        total_tasks = len(tasks)
-        completed_tasks = 0
-        for numero_controle_pncp, orgao_cnpj, ano, numero_sequencial, task in tasks:
-            detalhe = await task
-            if detalhe:
-                if isinstance(detalhe, dict):
-                    itens = detalhe.get('items', [])
-                elif isinstance(detalhe, list):
-                    itens = detalhe
-                else:
-                    itens = []
-                    logging.warning(f"Formato inesperado da resposta para '{numero_controle_pncp}'.")
-                    if config['verbose']:
-                        print(f"Aviso: Formato inesperado da resposta para '{numero_controle_pncp}'.")
-                
-                # Adiciona o numero_controle_pncp a cada item
-                for item in itens:
-                    item['numero_controle_pncp'] = numero_controle_pncp
-                    item['orgao_cnpj'] = orgao_cnpj
-                    item['ano'] = ano
-                    item['numero_sequencial'] = numero_sequencial
-                    item['Resultados verificados'] = False  # Adiciona a nova coluna com valor False
-                
-                detalhes_list.extend(itens)
-                logging.info(f"Requisição de {data_type} para '{numero_controle_pncp}' bem-sucedida.")
-                if config['verbose']:
-                    print(f"Requisição de {data_type} para '{numero_controle_pncp}' bem-sucedida.")
-            else:
-                logging.error(f"Requisição de {data_type} para '{numero_controle_pncp}' falhou.")
-                if config['verbose']:
-                    print(f"Erro: Requisição de {data_type} para '{numero_controle_pncp}' falhou.")
-            completed_tasks += 1
-            print(f"Requisição de {data_type} concluída para '{numero_controle_pncp}' ({completed_tasks}/{total_tasks})")
+def _chaves_texto(df, tabela):
+    """
+    Monta, de forma vetorizada, a chave natural de cada linha como um único texto.
+    """
+    colunas = [df[chave].fillna('').astype(str) if chave in df.columns else pd.Series('', index=df.index)
+               for chave in CHAVES_TABELAS[tabela]]
+    chaves = colunas[0].astype(object)
+    for coluna in colunas[1:]:
+        chaves = chaves + SEPARADOR_CHAVE + coluna
+    return chaves
 
-    return detalhes_list
+class ArmazenamentoTSV:
+    """
+    Backend de armazenamento legado em TSV, com memória limitada.
 
+    A existência das chaves naturais é testada em um IndiceChaves persistente por tabela, aberto
+    por mapeamento de memória; ele só é reconstruído, a partir das colunas de chave lidas em lotes,
+    quando não cobre o estado atual do TSV (tamanho e data de modificação). As linhas inéditas são
+    acrescentadas ao fim do TSV; as alterações de linhas existentes (inclusive das colunas de
+    controle) vão para um registro de atualizações ('<arquivo>.atualizacoes', em JSON Lines) e são
+    aplicadas sobre cada lote lido. Quando o registro passa de 'limite_atualizacoes' linhas, e ao
+    fechar o armazenamento, o TSV é regravado em lotes com as atualizações aplicadas. As leituras
+    percorrem o TSV em lotes de 'tamanho_lote' linhas.
+    """
 
+    def __init__(self, paths, tamanho_lote=100000, limite_atualizacoes=LIMITE_ATUALIZACOES_TSV):
+        self.paths = paths
+        self.tamanho_lote = tamanho_lote
+        self.limite_atualizacoes = limite_atualizacoes
+        self.caminhos = {tabela: paths[chave] for tabela, chave in ARQUIVOS_TABELAS.items()}
+        self._indices = {}
+        self._cabecalhos = {}
+        # Atualizações ainda não regravadas no TSV: {tabela: {chave: {coluna: valor}}}
+        self._atualizacoes = {tabela: {} for tabela in self.caminhos}
+        self._registro_pendente = {tabela: [] for tabela in self.caminhos}
+        self._linhas_registro = collections.Counter()
+        # Geração de cada arquivo: muda a cada regravação, para que as leituras em andamento reabram o TSV
+        self._geracoes = collections.Counter()
+        for tabela in self.caminhos:
+            self._carregar_registro(tabela)
 
-async def fetch_resultados(registros, config):
-    """
-    Realiza as requisições dos resultados de forma assíncrona.
+    def _caminho_registro(self, tabela):
+        return f"{self.caminhos[tabela]}.atualizacoes"
 
-    Args:
-        df_itens: DataFrame de itens para os quais os resultados serão buscados.
-        config: Configurações do sistema.
+    def _carregar_registro(self, tabela):
+        """
+        Recupera as atualizações gravadas no registro e ainda não aplicadas ao TSV (execução interrompida).
+        """
+        caminho = self._caminho_registro(tabela)
+        if not os.path.exists(caminho):
+            return
+        with open(caminho, encoding='utf-8') as f:
+            for linha in f:
+                try:
+                    entrada = json.loads(linha)
+                except json.JSONDecodeError:
+                    # Última linha truncada por uma interrupção no meio da gravação
+                    continue
+                self._atualizacoes[tabela].setdefault(entrada['chave'], {}).update(entrada['valores'])
+                self._linhas_registro[tabela] += 1
+        logging.info(f"{self._linhas_registro[tabela]} atualizações pendentes recuperadas de {caminho}.")
 
-    Returns:
-        resultados_list: Lista de resultados obtidos.
-    """
-    base_url = "https://pncp.gov.br/api/pncp/v1/orgaos/"
-    semaphore = asyncio.Semaphore(config['numero_maximo_conexoes'])
-    tasks = []
-    resultados_list = []
+    def _cabecalho(self, tabela):
+        if tabela not in self._cabecalhos:
+            caminho = self.caminhos[tabela]
+            colunas = []
+            if os.path.exists(caminho) and os.path.getsize(caminho):
+                colunas = list(pd.read_csv(caminho, dtype=str, sep='\t', nrows=0).columns)
+            self._cabecalhos[tabela] = colunas
+        return self._cabecalhos[tabela]
 
-    # Extrai as colunas necessárias do DataFrame
-    orgao_cnpj = registros['orgao_cnpj']
-    ano = registros['ano']
-    numero_sequencial = registros['numero_sequencial']
-    numero_controle_pncp = registros['numero_controle_pncp']
+    def _marca(self, tabela):
+        """
+        Marca do estado do TSV coberto pelo índice de chaves: tamanho e data de modificação do arquivo.
+        """
+        caminho = self.caminhos[tabela]
+        if not os.path.exists(caminho):
+            return None
+        estado = os.stat(caminho)
+        return f"{estado.st_size}:{estado.st_mtime_ns}"
 
-    # Verifica se todas as colunas necessárias estão presentes
-    if not all(col in registros.columns for col in ['orgao_cnpj', 'ano', 'numero_sequencial', 'numero_controle_pncp']):
-        logging.warning("Dados incompletos para os itens. Pulando...")
-        if config['verbose']:
-            print("Aviso: Dados incompletos para os itens. Pulando...")
-        return []
+    def _indice(self, tabela):
+        """
+        Devolve o índice de chaves da tabela, reconstruindo-o a partir das colunas de chave do TSV
+        quando ele não corresponde ao arquivo (índice ausente, execução interrompida ou TSV alterado).
+        """
+        if tabela not in self._indices:
+            indice = IndiceChaves(os.path.join(self.paths['indices_directory'], tabela))
+            marca = self._marca(tabela)
+            if indice.marca != marca or (marca is None and len(indice)):
+                cabecalho = self._cabecalho(tabela)
+                lotes = []
+                if cabecalho:
+                    colunas = [chave for chave in CHAVES_TABELAS[tabela] if chave in cabecalho] or cabecalho[:1]
+                    lotes = (_chaves_texto(lote, tabela) for lote in pd.read_csv(self.caminhos[tabela], dtype=str, sep='\t', usecols=colunas, chunksize=self.tamanho_lote))
+                indice.reconstruir(lotes, marca)
+                logging.info(f"Índice de chaves da tabela '{tabela}' reconstruído ({len(indice)} chaves).")
+            self._indices[tabela] = indice
+        return self._indices[tabela]
 
-    async with aiohttp.ClientSession() as session:
-        for idx, row in registros.iterrows():
-            orgao_cnpj = row['orgao_cnpj']
-            ano = row['ano']
-            numero_sequencial = row['numero_sequencial']
-            numero_controle_pncp = row['numero_controle_pncp']
-            numeroItem = row['numeroItem']
+    def _salvar_indice(self, tabela):
+        indice = self._indices.get(tabela)
+        marca = self._marca(tabela)
+        if indice is not None and (len(indice.pendentes) or indice.marca != marca):
+            indice.salvar(marca)
 
-            if not all([orgao_cnpj, ano, numero_sequencial, numero_controle_pncp]):
-                logging.warning(f"Dados incompletos para o item '{numero_controle_pncp}'. Pulando...")
-                if config['verbose']:
-                    print(f"Aviso: Dados incompletos para o item '{numero_controle_pncp}'. Pulando...")
-                continue
+    def _existentes(self, tabela, chaves):
+        return pd.Series(self._indice(tabela).contem(chaves.to_numpy()), index=chaves.index, dtype=bool)
 
-            url = f"{base_url}{orgao_cnpj}/compras/{ano}/{numero_sequencial}/itens/{numeroItem}/resultados"
-            params = {
-                "pagina": 1,
-                "tamanhoPagina": 20
-            }
-            task = asyncio.create_task(limited_fetch(semaphore, session, url, params, config))
-            tasks.append((numero_controle_pncp, task))
-
-        total_tasks = len(tasks)
-        completed_tasks = 0
-        for numero_controle_pncp, task in tasks:
-            subitem = await task
-            if subitem:
-                if isinstance(subitem, dict):
-                    resultados = subitem.get('items', [])
-                elif isinstance(subitem, list):
-                    resultados = subitem
+    def _aplicar(self, tabela, lote):
+        """
+        Aplica a um lote lido do TSV as atualizações ainda não regravadas.
+        """
+        atualizacoes = self._atualizacoes[tabela]
+        if not atualizacoes or lote.empty:
+            return lote
+        # Agrupa as linhas atualizadas pelo conjunto de colunas alteradas, para atribuir cada grupo de uma vez
+        grupos = collections.defaultdict(list)
+        for rotulo, chave in _chaves_texto(lote, tabela).items():
+            valores = atualizacoes.get(chave)
+            if valores is not None:
+                grupos[tuple(valores)].append((rotulo, list(valores.values())))
+        for colunas, linhas in grupos.items():
+            colunas = list(colunas)
+            for coluna in colunas:
+                if coluna not in lote.columns:
+                    lote[coluna] = None
+                elif lote[coluna].dtype != object:
+                    lote[coluna] = lote[coluna].astype(object)
+            rotulos = [rotulo for rotulo, _ in linhas]
+            lote.loc[rotulos, colunas] = pd.DataFrame([valores for _, valores in linhas], index=rotulos, columns=colunas, dtype=object)
+        return lote
+
+    def _ler(self, tabela, tamanho_lote):
+        """
+        Percorre o TSV em lotes, com as atualizações aplicadas. Se o arquivo for regravado durante a
+        leitura, ela continua no arquivo novo a partir da mesma linha: a regravação preserva a ordem.
+        """
+        lidas = 0
+        while self._cabecalho(tabela):
+            geracao = self._geracoes[tabela]
+            with pd.read_csv(self.caminhos[tabela], dtype=str, sep='\t', chunksize=tamanho_lote, skiprows=range(1, lidas + 1)) as leitor:
+                for lote in leitor:
+                    lidas += len(lote)
+                    yield self._aplicar(tabela, lote)
+                    if self._geracoes[tabela] != geracao:
+                        break
                 else:
-                    resultados = []
-                    logging.warning(f"Formato inesperado da resposta para o item '{numero_controle_pncp}'.")
-                    if config['verbose']:
-                        print(f"Aviso: Formato inesperado da resposta para o item '{numero_controle_pncp}'.")
-                
-                # Adiciona o numero_controle_pncp a cada subitem
-                for sub in resultados:
-                    sub['numero_controle_pncp'] = numero_controle_pncp
-                
-                resultados_list.extend(resultados)
-                logging.info(f"Requisição de resultados para o item '{numero_controle_pncp}' bem-sucedida.")
-                if config['verbose']:
-                    print(f"Requisição de resultados para o item '{numero_controle_pncp}' bem-sucedida.")
-            else:
-                logging.error(f"Requisição de resultados para o item '{numero_controle_pncp}' falhou.")
-                if config['verbose']:
-                    print(f"Erro: Requisição de resultados para o item '{numero_controle_pncp}' falhou.")
-            completed_tasks += 1
-            print(f"Requisição de resultados concluída para o item '{numero_controle_pncp}' ({completed_tasks}/{total_tasks})")
+                    return
 
-    return resultados_list
-# ---------------------------- Módulo de Processamento de Dados ---------------------------- #
+    def _acrescentar(self, tabela, df):
+        """
+        Acrescenta linhas inéditas ao fim do TSV; colunas novas exigem regravar o arquivo com o cabeçalho ampliado.
+        """
+        caminho = self.caminhos[tabela]
+        cabecalho = self._cabecalho(tabela)
+        if not cabecalho:
+            df.to_csv(caminho, index=False, sep='\t')
+            self._cabecalhos[tabela] = list(df.columns)
+            self._geracoes[tabela] += 1
+            return
+        novas = [coluna for coluna in df.columns if coluna not in cabecalho]
+        if novas:
+            self._regravar(tabela, novas)
+        df.reindex(columns=self._cabecalhos[tabela]).to_csv(caminho, index=False, sep='\t', mode='a', header=False)
 
-def process_licitacoes(respostas, df_licitacoes):
-    """
-    Processa as respostas das licitações e atualiza o dataframe principal.
+    def _registrar_atualizacoes(self, tabela, chaves, df):
+        atualizacoes = self._atualizacoes[tabela]
+        for chave, valores in zip(chaves, df.to_dict('records')):
+            atualizacoes.setdefault(chave, {}).update(valores)
+            self._registro_pendente[tabela].append(json.dumps({'chave': chave, 'valores': valores}, ensure_ascii=False))
 
-    Args:
-        respostas: Lista de respostas das requisições.
-        df_licitacoes: DataFrame principal de licitações.
+    def _regravar(self, tabela, novas=()):
+        """
+        Regrava o TSV em lotes, aplicando as atualizações pendentes e acrescentando ao cabeçalho as
+        colunas 'novas' e as que só existem nas atualizações.
+        """
+        caminho = self.caminhos[tabela]
+        novas = dict.fromkeys(novas)
+        novas.update(dict.fromkeys(coluna for valores in self._atualizacoes[tabela].values() for coluna in valores))
+        colunas = self._cabecalho(tabela) + [coluna for coluna in novas if coluna not in self._cabecalho(tabela)]
+        temporario = f"{caminho}.tmp"
+        gravadas = 0
+        for lote in self._ler(tabela, self.tamanho_lote):
+            lote.reindex(columns=colunas).to_csv(temporario, index=False, sep='\t', mode='w' if gravadas == 0 else 'a', header=gravadas == 0)
+            gravadas += len(lote)
+        if gravadas == 0:
+            pd.DataFrame(columns=colunas).to_csv(temporario, index=False, sep='\t')
+        os.replace(temporario, caminho)
+        # O registro só é apagado depois que o TSV regravado substituiu o anterior
+        if os.path.exists(self._caminho_registro(tabela)):
+            os.remove(self._caminho_registro(tabela))
+        self._cabecalhos[tabela] = colunas
+        self._atualizacoes[tabela] = {}
+        self._registro_pendente[tabela] = []
+        self._linhas_registro[tabela] = 0
+        self._geracoes[tabela] += 1
+        # A regravação muda o arquivo, mas não as chaves: o índice passa a cobrir o TSV novo
+        self._salvar_indice(tabela)
+        logging.info(f"Tabela '{tabela}' regravada em {caminho} ({gravadas} linhas).")
 
-    Returns:
-        df_licitacoes: DataFrame atualizado.
-    """
-    registros = []
-    for response in respostas:
-        if response and isinstance(response, dict) and 'items' in response:
-            registros.extend(response["items"])
-        else:
-            logging.warning("Resposta vazia ou sem a chave 'items'.")
+    def iterar(self, tabela, tamanho_lote):
+        yield from self._ler(tabela, tamanho_lote)
 
-    if not registros:
-        logging.info("Nenhum registro novo de licitações foi encontrado.")
-        return df_licitacoes
+    @staticmethod
+    def _pendentes(lote, coluna):
+        if coluna not in lote.columns:
+            return lote
+        return lote[~lote[coluna].astype(str).isin(['True', '1'])]
 
-    # df_novo = pd.DataFrame(registros)
-    # Convertendo o JSON para DataFrame e formatando a coluna 'numero_sequencial' como inteiro em uma única linha
-    df_novo = pd.DataFrame(registros)
+    def iterar_pendentes(self, tabela, coluna, tamanho_lote):
+        for lote in self._ler(tabela, tamanho_lote):
+            pendentes = self._pendentes(lote, coluna)
+            if not pendentes.empty:
+                yield pendentes
 
+    def contar_pendentes(self, tabela, coluna):
+        return sum(len(self._pendentes(lote, coluna)) for lote in self._ler(tabela, self.tamanho_lote))
 
-    if df_novo.empty:
-        logging.info("DataFrame novo de licitações está vazio.")
-        return df_licitacoes
+    def contar(self, tabela):
+        return len(self._indice(tabela))
 
-    # Adiciona colunas de controle, se não existirem
-    if 'detalhes_baixados' not in df_novo.columns:
-        df_novo['detalhes_baixados'] = False
-    if 'documentos_baixados' not in df_novo.columns:
-        df_novo['documentos_baixados'] = False
+    def iterar_alterados(self, tabela, desde, tamanho_lote):
+        for lote in self._ler(tabela, tamanho_lote):
+            if desde is not None:
+                if COLUNA_ALTERACAO not in lote.columns:
+                    continue
+                lote = lote[lote[COLUNA_ALTERACAO].fillna('') > desde]
+            if not lote.empty:
+                yield lote
 
-    # Concatena e remove duplicatas
-    df_licitacoes = pd.concat([df_licitacoes, df_novo], ignore_index=True)
-    df_licitacoes.drop_duplicates(subset='numero_controle_pncp', keep='first', inplace=True)
+    def carregar_por_chaves(self, tabela, df_chaves):
+        colunas = list(df_chaves.columns)
+        if df_chaves.empty or not set(colunas) <= set(self._cabecalho(tabela)):
+            return pd.DataFrame()
+        df_chaves = df_chaves.drop_duplicates().astype(str)
+        # Com a chave completa, o índice evita percorrer o TSV quando nenhuma das chaves existe
+        if colunas == CHAVES_TABELAS[tabela] and not self._existentes(tabela, _chaves_texto(df_chaves, tabela)).any():
+            return pd.DataFrame()
+        lotes = [lote.merge(df_chaves, on=colunas) for lote in self._ler(tabela, self.tamanho_lote)]
+        return pd.concat(lotes, ignore_index=True) if lotes else pd.DataFrame()
 
-    logging.info(f"{len(df_novo)} novas licitações adicionadas.")
-    return df_licitacoes
+    def upsert(self, tabela, df):
+        if df.empty:
+            return 0
+        novos = normalizar_para_texto(_com_marca_alteracao(df, tabela), tabela)
+        chaves = _chaves_texto(novos, tabela)
+        existentes = self._existentes(tabela, chaves)
+        if not existentes.all():
+            self._acrescentar(tabela, novos[~existentes])
+            self._indice(tabela).adicionar(chaves[~existentes].to_numpy())
+        if existentes.any():
+            # Atualiza os registros já existentes, preservando as colunas de controle
+            atualizaveis = [coluna for coluna in novos.columns if coluna not in COLUNAS_CONTROLE and coluna not in CHAVES_TABELAS[tabela]]
+            if atualizaveis:
+                self._registrar_atualizacoes(tabela, chaves[existentes], novos.loc[existentes, atualizaveis])
+        return len(novos)
 
-def processar_detalhes_registros(registros, df_existente, tipo_registro):
-    """
-    Processa os registros detalhados, removendo duplicatas e combinando com os dados existentes.
+    def atualizar(self, tabela, df):
+        if df.empty:
+            return 0
+        valores = normalizar_para_texto(_com_marca_alteracao(df, tabela), tabela)
+        colunas = [coluna for coluna in valores.columns if coluna not in CHAVES_TABELAS[tabela]]
+        chaves = _chaves_texto(valores, tabela)
+        existentes = self._existentes(tabela, chaves)
+        if not colunas or not existentes.any():
+            return 0
+        self._registrar_atualizacoes(tabela, chaves[existentes], valores.loc[existentes, colunas])
+        return int(existentes.sum())
 
-    Parâmetros:
-        registros (list): Lista de registros detalhados a serem processados.
-        df_existente (pd.DataFrame): DataFrame existente com dados anteriores.
-        tipo_registro (str): Tipo do registro para fins de logging e contexto.
+    def ler_estado(self, chave):
+        if not os.path.exists(self.paths['estado_json']):
+            return None
+        with open(self.paths['estado_json'], encoding='utf-8') as f:
+            return json.load(f).get(chave)
 
-    Retorna:
-        pd.DataFrame: DataFrame consolidado com os registros processados.
-    """
-    df_registros = pd.DataFrame(registros)
+    def gravar_estado(self, chave, valor):
+        estado = {}
+        if os.path.exists(self.paths['estado_json']):
+            with open(self.paths['estado_json'], encoding='utf-8') as f:
+                estado = json.load(f)
+        estado[chave] = valor
+        with open(self.paths['estado_json'], 'w', encoding='utf-8') as f:
+            json.dump(estado, f, ensure_ascii=False, indent=2)
 
-    # Inspeciona e ajusta colunas que contenham dicionários
-    for coluna in df_registros.columns:
-        if df_registros[coluna].apply(lambda x: isinstance(x, dict)).any():
-            logging.warning(f"Coluna {coluna} contém dicionários. Convertendo para string.")
-            df_registros[coluna] = df_registros[coluna].apply(str)  # Converte dicionários para strings
+    def salvar(self):
+        """
+        Grava no registro de cada tabela as atualizações acumuladas desde o último salvamento,
+        regravando o TSV das tabelas cujo registro passou do limite, e grava as chaves novas no
+        índice de cada tabela.
+        """
+        for tabela in self._indices:
+            self._salvar_indice(tabela)
+        for tabela, linhas in self._registro_pendente.items():
+            if not linhas:
+                continue
+            with open(self._caminho_registro(tabela), 'a', encoding='utf-8') as f:
+                f.write('\n'.join(linhas) + '\n')
+            self._linhas_registro[tabela] += len(linhas)
+            self._registro_pendente[tabela] = []
+            if self._linhas_registro[tabela] >= self.limite_atualizacoes:
+                self._regravar(tabela)
 
-    # Remove duplicatas
-    df_registros.drop_duplicates(inplace=True)
+    def fechar(self):
+        self.salvar()
+        for tabela in self.caminhos:
+            if self._atualizacoes[tabela]:
+                self._regravar(tabela)
 
-    # Combina com o DataFrame existente
-    if not df_existente.empty:
-        df_registros = pd.concat([df_existente, df_registros]).drop_duplicates()
+class ArmazenamentoSQLite:
+    """
+    Backend de armazenamento em SQLite: cada tabela tem um índice único sobre sua chave natural,
+    e cada lote é gravado com um upsert que toca apenas as linhas recebidas.
+    """
 
-    logging.info(f"Processamento de registros do tipo '{tipo_registro}' concluído. Total: {len(df_registros)} registros.")
-    return df_registros
+    def __init__(self, caminho_banco, wal=True):
+        self.caminho_banco = caminho_banco
+        # Vários trabalhadores do modo distribuído podem gravar no mesmo banco: espera a trava em vez de falhar
+        self.conexao = sqlite3.connect(caminho_banco, timeout=TEMPO_ESPERA_TRAVA)
+        # O modo WAL depende de memória compartilhada e não funciona em sistemas de arquivos de rede
+        self.conexao.execute(f"PRAGMA journal_mode={'WAL' if wal else 'DELETE'}")
+        self.conexao.execute('PRAGMA synchronous=NORMAL')
+        self._colunas = {}
 
+    def _existe(self, tabela):
+        cursor = self.conexao.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (tabela,))
+        return cursor.fetchone() is not None
 
+    def _garantir_tabela(self, tabela, colunas):
+        """
+        Cria a tabela e o índice da chave natural, se necessário, e adiciona colunas ainda inexistentes.
+        """
+        chaves = CHAVES_TABELAS[tabela]
+        if tabela not in self._colunas:
+            definicao = ', '.join(f'"{chave}" TEXT' for chave in chaves)
+            self.conexao.execute(f'CREATE TABLE IF NOT EXISTS "{tabela}" ({definicao})')
+            indice = ', '.join(f'"{chave}"' for chave in chaves)
+            self.conexao.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS "ux_{tabela}_chave" ON "{tabela}" ({indice})')
+            self._colunas[tabela] = [linha[1] for linha in self.conexao.execute(f'PRAGMA table_info("{tabela}")')]
 
-## ---------------------------- Módulo de Verificação de Arquivos Compactados ---------------------------- #
+        for coluna in colunas:
+            if coluna in self._colunas[tabela]:
+                continue
+            try:
+                self.conexao.execute(f'ALTER TABLE "{tabela}" ADD COLUMN "{coluna}" TEXT')
+            except sqlite3.OperationalError as e:
+                # Outro processo pode ter criado a coluna depois que a lista local foi lida
+                if 'duplicate column' not in str(e):
+                    raise
+            if coluna in COLUNAS_CONTROLE or coluna == COLUNA_ALTERACAO:
+                self.conexao.execute(f'CREATE INDEX IF NOT EXISTS "ix_{tabela}_{coluna}" ON "{tabela}" ("{coluna}")')
+            self._colunas[tabela].append(coluna)
 
-async def verify_compressed_files(paths, config):
-    """
-    Verifica a existência de arquivos compactados (zip, rar, 7zip) a partir das URLs presentes no DataFrame de arquivos.
-    Atualiza a coluna 'verificacao_arquivos' para evitar verificações duplicadas.
-    Além disso, extrai o conteúdo dos arquivos compactados e adiciona os nomes dos arquivos internos na coluna 'titulo'.
+    def iterar(self, tabela, tamanho_lote):
+        if not self._existe(tabela):
+            return
+        yield from pd.read_sql_query(f'SELECT * FROM "{tabela}"', self.conexao, dtype=str, chunksize=tamanho_lote)
 
-    Args:
-        paths: Dicionário com os caminhos dos arquivos.
-        config: Configurações do sistema.
-    """
-    # Carrega o DataFrame de arquivos
-    try:
-        df_arquivos = pd.read_csv(paths['arquivos_csv'],dtype=str,sep='\t')
-        logging.info(f"DataFrame de arquivos carregado de {paths['arquivos_csv']}.")
-    except Exception as e:
-        logging.error(f"Erro ao carregar {paths['arquivos_csv']}: {str(e)}")
-        return
+    def iterar_pendentes(self, tabela, coluna, tamanho_lote):
+        """
+        Percorre as linhas pendentes em lotes, paginando pelo rowid para não manter cursores
+        abertos enquanto o escritor marca as linhas já processadas.
+        """
+        if not self._existe(tabela):
+            return
+        self._garantir_tabela(tabela, [coluna])
+        consulta = (f'SELECT rowid AS "_rowid", * FROM "{tabela}" '
+                    f'WHERE COALESCE("{coluna}", \'False\') NOT IN (\'True\', \'1\') AND rowid > ? '
+                    f'ORDER BY rowid LIMIT ?')
+        ultimo_rowid = 0
+        while True:
+            lote = pd.read_sql_query(consulta, self.conexao, params=(ultimo_rowid, tamanho_lote), dtype=str)
+            if lote.empty:
+                return
+            ultimo_rowid = int(lote['_rowid'].iloc[-1])
+            yield lote.drop(columns='_rowid')
 
-    # Verifica se a coluna 'verificacao_arquivos' existe, se não, cria com False
-    if 'verificacao_arquivos' not in df_arquivos.columns:
-        df_arquivos['verificacao_arquivos'] = False
-        logging.info("Coluna 'verificacao_arquivos' adicionada ao DataFrame de arquivos.")
+    def contar_pendentes(self, tabela, coluna):
+        if not self._existe(tabela):
+            return 0
+        self._garantir_tabela(tabela, [coluna])
+        consulta = f'SELECT COUNT(*) FROM "{tabela}" WHERE COALESCE("{coluna}", \'False\') NOT IN (\'True\', \'1\')'
+        return self.conexao.execute(consulta).fetchone()[0]
+
+    def contar(self, tabela):
+        if not self._existe(tabela):
+            return 0
+        return self.conexao.execute(f'SELECT COUNT(*) FROM "{tabela}"').fetchone()[0]
+
+    def iterar_alterados(self, tabela, desde, tamanho_lote):
+        """
+        Percorre, em lotes paginados pelo rowid, as linhas inseridas ou alteradas depois da marca
+        'desde' (todas as linhas se 'desde' for None).
+        """
+        if not self._existe(tabela):
+            return
+        self._garantir_tabela(tabela, [COLUNA_ALTERACAO])
+        condicao = f'"{COLUNA_ALTERACAO}" > ? AND ' if desde is not None else ''
+        consulta = f'SELECT rowid AS "_rowid", * FROM "{tabela}" WHERE {condicao}rowid > ? ORDER BY rowid LIMIT ?'
+        ultimo_rowid = 0
+        while True:
+            parametros = ((desde,) if desde is not None else ()) + (ultimo_rowid, tamanho_lote)
+            lote = pd.read_sql_query(consulta, self.conexao, params=parametros, dtype=str)
+            if lote.empty:
+                return
+            ultimo_rowid = int(lote['_rowid'].iloc[-1])
+            yield lote.drop(columns='_rowid')
+
+    def carregar_por_chaves(self, tabela, df_chaves):
+        """
+        Carrega as linhas cujas colunas de 'df_chaves' (a chave natural ou um prefixo dela) casam
+        com alguma das linhas de 'df_chaves', por meio de uma tabela temporária e do índice da chave.
+        """
+        if df_chaves.empty or not self._existe(tabela):
+            return pd.DataFrame()
+        colunas = list(df_chaves.columns)
+        self._garantir_tabela(tabela, colunas)
+        definicao = ', '.join(f'"{coluna}" TEXT' for coluna in colunas)
+        marcadores = ', '.join('?' for _ in colunas)
+        condicao = ' AND '.join(f't."{coluna}" = c."{coluna}"' for coluna in colunas)
+        with self.conexao:
+            self.conexao.execute('DROP TABLE IF EXISTS temp."chaves_consulta"')
+            self.conexao.execute(f'CREATE TEMP TABLE "chaves_consulta" ({definicao})')
+            self.conexao.executemany(f'INSERT INTO temp."chaves_consulta" VALUES ({marcadores})',
+                                     df_chaves.drop_duplicates().astype(str).itertuples(index=False, name=None))
+        try:
+            return pd.read_sql_query(f'SELECT t.* FROM "{tabela}" t JOIN temp."chaves_consulta" c ON {condicao}', self.conexao, dtype=str)
+        finally:
+            self.conexao.execute('DROP TABLE temp."chaves_consulta"')
+
+    def upsert(self, tabela, df):
+        if df.empty:
+            return 0
+        chaves = CHAVES_TABELAS[tabela]
+        df = normalizar_para_texto(_com_marca_alteracao(df, tabela), tabela)
+        colunas = list(df.columns)
+        self._garantir_tabela(tabela, colunas)
+
+        nomes = ', '.join(f'"{coluna}"' for coluna in colunas)
+        marcadores = ', '.join('?' for _ in colunas)
+        alvo = ', '.join(f'"{chave}"' for chave in chaves)
+        atualizaveis = [coluna for coluna in colunas if coluna not in chaves and coluna not in COLUNAS_CONTROLE]
+        if atualizaveis:
+            acao = 'DO UPDATE SET ' + ', '.join(f'"{coluna}" = excluded."{coluna}"' for coluna in atualizaveis)
+        else:
+            acao = 'DO NOTHING'
+        sql = f'INSERT INTO "{tabela}" ({nomes}) VALUES ({marcadores}) ON CONFLICT ({alvo}) {acao}'
+
+        with self.conexao:
+            self.conexao.executemany(sql, df.itertuples(index=False, name=None))
+        return len(df)
+
+    def atualizar(self, tabela, df):
+        if df.empty or not self._existe(tabela):
+            return 0
+        chaves = CHAVES_TABELAS[tabela]
+        df = normalizar_para_texto(_com_marca_alteracao(df, tabela), tabela)
+        colunas = [coluna for coluna in df.columns if coluna not in chaves]
+        if not colunas:
+            return 0
+        self._garantir_tabela(tabela, colunas)
+
+        atribuicoes = ', '.join(f'"{coluna}" = ?' for coluna in colunas)
+        condicao = ' AND '.join(f'"{chave}" = ?' for chave in chaves)
+        sql = f'UPDATE "{tabela}" SET {atribuicoes} WHERE {condicao}'
+        with self.conexao:
+            self.conexao.executemany(sql, df[colunas + chaves].itertuples(index=False, name=None))
+        return len(df)
+
+    def ler_estado(self, chave):
+        self.conexao.execute('CREATE TABLE IF NOT EXISTS "estado" ("chave" TEXT PRIMARY KEY, "valor" TEXT)')
+        linha = self.conexao.execute('SELECT "valor" FROM "estado" WHERE "chave" = ?', (chave,)).fetchone()
+        return linha[0] if linha else None
+
+    def gravar_estado(self, chave, valor):
+        with self.conexao:
+            self.conexao.execute('CREATE TABLE IF NOT EXISTS "estado" ("chave" TEXT PRIMARY KEY, "valor" TEXT)')
+            self.conexao.execute('INSERT INTO "estado" ("chave", "valor") VALUES (?, ?) '
+                                 'ON CONFLICT ("chave") DO UPDATE SET "valor" = excluded."valor"', (chave, valor))
+
+    def salvar(self):
+        self.conexao.commit()
+
+    def fechar(self):
+        self.conexao.commit()
+        self.conexao.close()
+
+def registros_de_lotes(lotes):
+    """
+    Converte um iterável de lotes (DataFrames) em um iterável de registros (dicionários).
+
+    Args:
+        lotes: Iterável de DataFrames.
+
+    Yields:
+        registro: Cada linha como dicionário.
+    """
+    for lote in lotes:
+        yield from lote.to_dict('records')
+
+def criar_armazenamento(config, paths):
+    """
+    Cria o backend de armazenamento configurado.
+
+    Args:
+        config: Configurações do sistema.
+        paths: Dicionário com os caminhos dos arquivos.
+
+    Returns:
+        armazenamento: Instância de ArmazenamentoSQLite ou ArmazenamentoTSV.
+    """
+    if config['armazenamento'] == 'tsv':
+        logging.info("Usando armazenamento TSV.")
+        return ArmazenamentoTSV(paths)
+
+    banco_novo = not os.path.exists(paths['banco_sqlite'])
+    armazenamento = ArmazenamentoSQLite(paths['banco_sqlite'], wal=not config['banco_em_rede'])
+    logging.info(f"Usando armazenamento SQLite em {paths['banco_sqlite']}.")
+    if banco_novo and any(os.path.exists(paths[chave]) for chave in ARQUIVOS_TABELAS.values()):
+        aviso = "Banco SQLite novo, mas existem TSVs em 'raspagem/'. Execute com --importar-tsv para importá-los."
+        logging.warning(aviso)
+        print(aviso)
+    return armazenamento
+
+def importar_tsv(paths, armazenamento, tamanho_lote=100000):
+    """
+    Importa os arquivos TSV legados para o armazenamento, em lotes, por meio de upserts.
+
+    Args:
+        paths: Dicionário com os caminhos dos arquivos.
+        armazenamento: Backend de armazenamento de destino.
+        tamanho_lote: Número de linhas lidas por lote.
+
+    Returns:
+        totais: Dicionário com o número de linhas importadas por tabela.
+    """
+    totais = {}
+    for tabela, chave_caminho in ARQUIVOS_TABELAS.items():
+        caminho = paths[chave_caminho]
+        totais[tabela] = 0
+        if not os.path.exists(caminho):
+            continue
+        try:
+            for lote in pd.read_csv(caminho, dtype=str, sep='\t', chunksize=tamanho_lote):
+                totais[tabela] += armazenamento.upsert(tabela, lote)
+            logging.info(f"{totais[tabela]} linhas importadas de {caminho} para a tabela '{tabela}'.")
+        except Exception as e:
+            logging.error(f"Erro ao importar {caminho}: {str(e)}")
+    armazenamento.salvar()
+    return totais
+
+def _lote_parquet(lote, tabela):
+    """
+    Tipa um lote para o Parquet: números, datas e booleanos do esquema mantêm seus tipos e as demais
+    colunas (inclusive as categóricas, já compactadas por dicionário no Parquet) viram texto,
+    para que todos os lotes tenham o mesmo schema.
+    """
+    esquema = ESQUEMAS_TABELAS.get(tabela, {})
+    lote = aplicar_esquema(lote, tabela)
+    textuais = {coluna: lote[coluna].astype('string') for coluna in lote.columns if esquema.get(coluna, 'categoria') == 'categoria'}
+    return lote.assign(**textuais)
+
+def exportar_tabelas(armazenamento, destino, formato, tamanho_lote=100000):
+    """
+    Exporta as tabelas do armazenamento para arquivos TSV ou Parquet, lendo em lotes.
+
+    Args:
+        armazenamento: Backend de armazenamento de origem.
+        destino: Diretório de destino dos arquivos exportados.
+        formato: 'tsv' ou 'parquet'.
+        tamanho_lote: Número de linhas lidas por lote.
+
+    Returns:
+        caminhos: Lista com os caminhos dos arquivos gerados.
+    """
+    if formato == 'parquet':
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            logging.error("A exportação para Parquet requer o pacote 'pyarrow'.")
+            print("Erro: a exportação para Parquet requer o pacote 'pyarrow'.")
+            return []
+
+    os.makedirs(destino, exist_ok=True)
+    caminhos = []
+    for tabela in CHAVES_TABELAS:
+        caminho = os.path.join(destino, f"{tabela}.{'csv' if formato == 'tsv' else 'parquet'}")
+        escritor = None
+        linhas = 0
+        try:
+            for lote in armazenamento.iterar(tabela, tamanho_lote):
+                if formato == 'tsv':
+                    lote.to_csv(caminho, index=False, sep='\t', mode='w' if linhas == 0 else 'a', header=linhas == 0)
+                else:
+                    tabela_arrow = pa.Table.from_pandas(_lote_parquet(lote, tabela), preserve_index=False)
+                    if escritor is None:
+                        escritor = pq.ParquetWriter(caminho, tabela_arrow.schema, compression='zstd')
+                    escritor.write_table(tabela_arrow)
+                linhas += len(lote)
+        except Exception as e:
+            logging.error(f"Erro ao exportar a tabela '{tabela}' para {caminho}: {str(e)}")
+        finally:
+            if escritor is not None:
+                escritor.close()
+        if linhas:
+            caminhos.append(caminho)
+            logging.info(f"Tabela '{tabela}' exportada para {caminho} ({linhas} linhas).")
+    return caminhos
+
+# ---------------------------- Módulo de Dataset Parquet ---------------------------- #
+
+# Tabelas levadas ao dataset particionado
+TABELAS_DATASET = ('licitacoes', 'itens', 'resultados', 'arquivos')
+
+# Nome da partição de valores ausentes, a mesma convenção do Hive adotada pelo pyarrow
+PARTICAO_AUSENTE = '__HIVE_DEFAULT_PARTITION__'
+
+def particoes_lote(lote, ufs):
+    """
+    Calcula a partição (ano, UF) de cada linha de um lote. O ano vem do número de controle PNCP
+    ('.../AAAA'); a UF vem da própria linha (licitações) ou da licitação a que ela pertence.
+
+    Args:
+        lote: DataFrame com a coluna 'numero_controle_pncp'.
+        ufs: Dicionário numero_controle_pncp -> UF, usado nas tabelas sem a coluna 'uf'.
+
+    Returns:
+        (anos, ufs_lote): Séries com o ano e a UF de cada linha.
+    """
+    numeros = lote['numero_controle_pncp'].fillna('').astype(str)
+    anos = numeros.str.rpartition('/')[2]
+    anos = anos.where(anos.str.fullmatch(r'\d{4}'), PARTICAO_AUSENTE)
+    ufs_lote = lote['uf'] if 'uf' in lote.columns else numeros.map(ufs)
+    ufs_lote = ufs_lote.fillna('').astype(str).str.strip().str.upper()
+    return anos, ufs_lote.where(ufs_lote != '', PARTICAO_AUSENTE)
+
+class DatasetParquet:
+    """
+    Dataset Parquet particionado por ano e UF, no layout Hive (<tabela>/ano=2024/uf=MG/parte-*.parquet),
+    com colunas tipadas e compressão zstd: quem consome os dados lê só as partições e colunas de que
+    precisa (ex.: pd.read_parquet('raspagem/parquet/itens', filters=[('uf', '=', 'MG')], columns=[...])).
+
+    Cada atualização acrescenta às partições afetadas arquivos novos, com grupos de linhas de até
+    'linhas_grupo' linhas. Os buffers de todas as partições somam no máximo 'linhas_memoria' linhas:
+    ao passar disso, os maiores são gravados. As versões antigas de linhas alteradas são retiradas
+    dos arquivos anteriores ao fim da atualização, em uma única passada por partição, e uma
+    partição com mais de 'partes_maximas' arquivos é compactada em um só.
+    """
+
+    def __init__(self, diretorio, linhas_grupo=100000, partes_maximas=16, linhas_memoria=200000):
+        self.diretorio = diretorio
+        self.linhas_grupo = linhas_grupo
+        self.partes_maximas = partes_maximas
+        self.linhas_memoria = linhas_memoria
+        self.caminho_estado = os.path.join(diretorio, '_estado.json')
+        self.buffers = {}
+        self.linhas_buffers = {}
+        self.sequencia = 0
+        # Chaves gravadas nesta atualização, por partição: as versões antigas saem em finalizar()
+        self.chaves_novas = collections.defaultdict(list)
+        self.afetadas = set()
+        os.makedirs(diretorio, exist_ok=True)
+
+    def ler_marca(self):
+        if not os.path.exists(self.caminho_estado):
+            return None
+        with open(self.caminho_estado, encoding='utf-8') as f:
+            return json.load(f).get('marca_alteracao')
+
+    def gravar_marca(self, marca):
+        temporario = f"{self.caminho_estado}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump({'marca_alteracao': marca}, f)
+        os.replace(temporario, self.caminho_estado)
+
+    def diretorio_particao(self, tabela, ano, uf):
+        return os.path.join(self.diretorio, tabela, f"ano={ano}", f"uf={uf}")
+
+    @staticmethod
+    def partes(diretorio):
+        if not os.path.isdir(diretorio):
+            return []
+        return sorted(os.path.join(diretorio, nome) for nome in os.listdir(diretorio) if nome.endswith('.parquet'))
+
+    def acrescentar(self, tabela, lote, anos, ufs, marca):
+        """
+        Distribui um lote entre as partições, gravando as que acumularam 'linhas_grupo' linhas e,
+        enquanto os buffers somarem mais de 'linhas_memoria' linhas, a maior delas.
+
+        Args:
+            tabela: Nome da tabela.
+            lote: DataFrame com as linhas novas ou alteradas.
+            anos: Série com o ano de cada linha.
+            ufs: Série com a UF de cada linha.
+            marca: Marca da atualização, usada no nome dos arquivos.
+        """
+        # Colunas de controle e a marca de alteração são estado do processo, não dados
+        internas = [coluna for coluna in (*COLUNAS_CONTROLE, COLUNA_ALTERACAO, 'ano', 'uf') if coluna in lote.columns]
+        lote = lote.drop(columns=internas)
+        for (ano, uf), parte in lote.groupby([anos, ufs], sort=False):
+            particao = (tabela, ano, uf)
+            self.buffers.setdefault(particao, []).append(parte)
+            self.linhas_buffers[particao] = self.linhas_buffers.get(particao, 0) + len(parte)
+            if self.linhas_buffers[particao] >= self.linhas_grupo:
+                self._descarregar(particao, marca)
+        while self.linhas_buffers and sum(self.linhas_buffers.values()) > self.linhas_memoria:
+            self._descarregar(max(self.linhas_buffers, key=self.linhas_buffers.get), marca)
+
+    def _descarregar(self, particao, marca):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        tabela, ano, uf = particao
+        df = pd.concat(self.buffers.pop(particao), ignore_index=True)
+        del self.linhas_buffers[particao]
+        diretorio = self.diretorio_particao(tabela, ano, uf)
+        os.makedirs(diretorio, exist_ok=True)
+        self.chaves_novas[(tabela, diretorio)].append(df[CHAVES_TABELAS[tabela]].astype(str))
+
+        self.sequencia += 1
+        caminho = os.path.join(diretorio, f"parte-{marca}-{self.sequencia:05d}.parquet")
+        tabela_arrow = pa.Table.from_pandas(_lote_parquet(df, tabela), preserve_index=False)
+        pq.write_table(tabela_arrow, f"{caminho}.tmp", compression='zstd', row_group_size=self.linhas_grupo)
+        os.replace(f"{caminho}.tmp", caminho)
+        self.afetadas.add(diretorio)
+        METRICAS.incrementar('linhas_gravadas_total', len(df), tabela=f"parquet_{tabela}")
+
+    def finalizar(self, marca):
+        """
+        Grava os buffers restantes, retira as versões antigas das linhas alteradas e compacta as
+        partições com arquivos demais.
+
+        Returns:
+            quantidade: Número de partições afetadas.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        for particao in list(self.buffers):
+            self._descarregar(particao, marca)
+
+        # Retira, dos arquivos de execuções anteriores, as versões antigas das linhas gravadas agora
+        for (tabela, diretorio), lotes in self.chaves_novas.items():
+            chaves = CHAVES_TABELAS[tabela]
+            novas = pd.MultiIndex.from_frame(pd.concat(lotes, ignore_index=True))
+            for parte in self.partes(diretorio):
+                if os.path.basename(parte).startswith(f"parte-{marca}-"):
+                    continue
+                existentes = pd.MultiIndex.from_frame(pq.read_table(parte, columns=chaves).to_pandas().astype(str))
+                substituidas = existentes.isin(novas)
+                if not substituidas.any():
+                    continue
+                mantidas = pq.read_table(parte).filter(pa.array(~substituidas))
+                if mantidas.num_rows:
+                    pq.write_table(mantidas, f"{parte}.tmp", compression='zstd', row_group_size=self.linhas_grupo)
+                    os.replace(f"{parte}.tmp", parte)
+                else:
+                    os.remove(parte)
+
+        for diretorio in self.afetadas:
+            partes = self.partes(diretorio)
+            if len(partes) <= self.partes_maximas:
+                continue
+            compactada = pa.concat_tables((pq.read_table(parte) for parte in partes), promote_options='default')
+            caminho = os.path.join(diretorio, f"parte-{marca}-compactada.parquet")
+            pq.write_table(compactada, f"{caminho}.tmp", compression='zstd', row_group_size=self.linhas_grupo)
+            os.replace(f"{caminho}.tmp", caminho)
+            for parte in partes:
+                os.remove(parte)
+        return len(self.afetadas)
+
+def mapa_ufs(armazenamento, tamanho_lote):
+    """
+    Monta o dicionário numero_controle_pncp -> UF das licitações, usado para particionar as
+    tabelas filhas (itens, resultados e arquivos), que não têm a coluna 'uf'.
+    """
+    ufs = {}
+    for lote in armazenamento.iterar('licitacoes', tamanho_lote):
+        if 'uf' in lote.columns:
+            ufs.update(zip(lote['numero_controle_pncp'], lote['uf']))
+    return ufs
+
+def atualizar_dataset_parquet(armazenamento, diretorio, config):
+    """
+    Leva ao dataset Parquet particionado as linhas inseridas ou alteradas desde a última
+    atualização. Na primeira execução (ou se o diretório for apagado), todas as linhas são gravadas.
+
+    Args:
+        armazenamento: Backend de armazenamento dos dados.
+        diretorio: Diretório raiz do dataset.
+        config: Configurações do sistema.
+
+    Returns:
+        totais: Dicionário com o número de linhas gravadas por tabela.
+    """
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        logging.error("O dataset Parquet requer o pacote 'pyarrow'.")
+        print("Erro: o dataset Parquet requer o pacote 'pyarrow'.")
+        return {}
+
+    dataset = DatasetParquet(diretorio, config['linhas_grupo_parquet'], config['partes_maximas_parquet'], config['linhas_memoria_parquet'])
+    desde = dataset.ler_marca()
+    # A marca é tirada antes da leitura: o que mudar durante a gravação entra na próxima
+    nova_marca = marca_alteracao()
+    totais = {}
+    ufs = None
+    try:
+        for tabela in TABELAS_DATASET:
+            totais[tabela] = 0
+            for lote in armazenamento.iterar_alterados(tabela, desde, config['tamanho_lote_gravacao']):
+                if 'numero_controle_pncp' not in lote.columns:
+                    break
+                if 'uf' not in lote.columns and ufs is None:
+                    ufs = mapa_ufs(armazenamento, config['tamanho_lote_gravacao'])
+                anos, ufs_lote = particoes_lote(lote, ufs)
+                dataset.acrescentar(tabela, lote, anos, ufs_lote, nova_marca)
+                totais[tabela] += len(lote)
+        particoes = dataset.finalizar(nova_marca)
+        dataset.gravar_marca(nova_marca)
+        logging.info(f"Dataset Parquet em {diretorio}: {particoes} partições atualizadas, "
+                     + ', '.join(f"{total} linhas de '{tabela}'" for tabela, total in totais.items()) + '.')
+    except Exception as e:
+        logging.error(f"Erro ao atualizar o dataset Parquet: {str(e)}")
+    return totais
+
+# ---------------------------- Módulo de Diário de Execução ---------------------------- #
+
+ESTADOS_DIARIO = ('pendente', 'ok', 'falha', 'retry_after')
+
+def chave_diario(chave):
+    """
+    Converte a chave de um trabalho (valor simples ou tupla) na string gravada no diário.
+    """
+    if isinstance(chave, tuple):
+        return '|'.join(str(parte) for parte in chave)
+    return str(chave)
+
+class DiarioExecucao:
+    """
+    Diário de trabalhos em SQLite (modo WAL), apenas com inserções: cada mudança de estado de uma
+    requisição ('pendente', 'ok', 'falha' ou 'retry_after') é uma nova linha, e o estado atual de um
+    trabalho é a sua linha mais recente.
+
+    Um trabalho só é marcado como 'ok' depois que seus dados foram persistidos no armazenamento.
+    Se a execução anterior foi interrompida antes de terminar, o diário a retoma: os trabalhos
+    já concluídos são pulados e os demais (pendentes ou com falha) são refeitos.
+    """
+
+    def __init__(self, caminho_banco, tamanho_buffer=1000):
+        self.conexao = sqlite3.connect(caminho_banco)
+        self.conexao.execute('PRAGMA journal_mode=WAL')
+        self.conexao.execute('PRAGMA synchronous=NORMAL')
+        self.conexao.execute('CREATE TABLE IF NOT EXISTS "execucoes" ("id" INTEGER PRIMARY KEY AUTOINCREMENT, "inicio" TEXT, "fim" TEXT)')
+        self.conexao.execute('CREATE TABLE IF NOT EXISTS "diario" ("id" INTEGER PRIMARY KEY AUTOINCREMENT, "execucao" INTEGER, '
+                             '"etapa" TEXT, "chave" TEXT, "url" TEXT, "estado" TEXT, "detalhe" TEXT, "instante" TEXT)')
+        self.conexao.execute('CREATE INDEX IF NOT EXISTS "ix_diario_trabalho" ON "diario" ("execucao", "etapa", "chave")')
+        self.tamanho_buffer = tamanho_buffer
+        self.buffer = []
+        self.concluidos = set()
+
+        linha = self.conexao.execute('SELECT "id" FROM "execucoes" WHERE "fim" IS NULL ORDER BY "id" DESC LIMIT 1').fetchone()
+        self.retomada = linha is not None
+        if self.retomada:
+            self.execucao = linha[0]
+            for etapa, chave, estado in self._estados_atuais():
+                if estado == 'ok':
+                    self.concluidos.add((etapa, chave))
+            logging.info(f"Retomando a execução {self.execucao} do diário: {len(self.concluidos)} trabalhos já concluídos.")
+        else:
+            cursor = self.conexao.execute('INSERT INTO "execucoes" ("inicio") VALUES (?)', (time.strftime('%Y-%m-%dT%H:%M:%S'),))
+            self.execucao = cursor.lastrowid
+        self.conexao.commit()
+
+    def _estados_atuais(self):
+        """
+        Devolve (etapa, chave, estado) com o estado mais recente de cada trabalho da execução atual.
+        """
+        return self.conexao.execute(
+            'SELECT "etapa", "chave", "estado" FROM "diario" WHERE "id" IN '
+            '(SELECT MAX("id") FROM "diario" WHERE "execucao" = ? GROUP BY "etapa", "chave")',
+            (self.execucao,),
+        ).fetchall()
+
+    def concluido(self, etapa, chave):
+        return (etapa, chave_diario(chave)) in self.concluidos
+
+    def registrar(self, etapa, chave, estado, url=None, detalhe=None):
+        """
+        Acrescenta uma mudança de estado ao buffer do diário, gravado em lotes.
+        """
+        self.buffer.append((self.execucao, etapa, chave_diario(chave), url, estado,
+                            None if detalhe is None else str(detalhe), time.strftime('%Y-%m-%dT%H:%M:%S')))
+        if len(self.buffer) >= self.tamanho_buffer:
+            self.confirmar()
+
+    def registrador(self, etapa, chave, url):
+        """
+        Cria a função usada pelas requisições para registrar estados intermediários de um trabalho.
+        """
+        def registrar(estado, detalhe=None):
+            self.registrar(etapa, chave, estado, url, detalhe)
+        return registrar
+
+    def concluir(self, etapa, chaves):
+        """
+        Marca os trabalhos como concluídos e grava o diário imediatamente. Deve ser chamada
+        somente depois que os dados desses trabalhos foram salvos no armazenamento.
+        """
+        for chave in chaves:
+            self.registrar(etapa, chave, 'ok')
+            self.concluidos.add((etapa, chave_diario(chave)))
+        self.confirmar()
+
+    def confirmar(self):
+        if self.buffer:
+            self.conexao.executemany(
+                'INSERT INTO "diario" ("execucao", "etapa", "chave", "url", "estado", "detalhe", "instante") VALUES (?, ?, ?, ?, ?, ?, ?)',
+                self.buffer,
+            )
+            self.buffer = []
+        self.conexao.commit()
+
+    def resumo(self):
+        """
+        Conta os trabalhos da execução atual por etapa e estado.
+
+        Returns:
+            resumo: Dicionário {(etapa, estado): quantidade}.
+        """
+        self.confirmar()
+        return dict(collections.Counter((etapa, estado) for etapa, _, estado in self._estados_atuais()))
+
+    def finalizar(self):
+        """
+        Encerra a execução atual; a próxima execução começará um novo diário.
+        """
+        self.confirmar()
+        self.conexao.execute('UPDATE "execucoes" SET "fim" = ? WHERE "id" = ?', (time.strftime('%Y-%m-%dT%H:%M:%S'), self.execucao))
+        self.conexao.commit()
+
+    def fechar(self):
+        self.confirmar()
+        self.conexao.close()
+
+# ---------------------------- Módulo de Agendamento ---------------------------- #
+
+async def executar_em_pool(trabalhos, trabalhador, num_trabalhadores, tamanho_fila=None, nome='pool'):
+    """
+    Executa trabalhos com um pool fixo de trabalhadores que consomem uma fila limitada.
+
+    Os trabalhos são retirados de forma preguiçosa do iterável de origem: o produtor só
+    enfileira um novo trabalho quando há espaço na fila, e os trabalhadores só seguem
+    adiante quando o consumidor retira os resultados. Assim, o número de corrotinas e de
+    respostas vivas em memória é limitado pelo tamanho do pool, e não pelo total de trabalhos.
+
+    Args:
+        trabalhos: Iterável (síncrono ou assíncrono) de trabalhos.
+        trabalhador: Função assíncrona que recebe um trabalho e devolve seu resultado.
+        num_trabalhadores: Número de trabalhadores simultâneos.
+        tamanho_fila: Capacidade das filas de trabalhos e de resultados (padrão: 2 × trabalhadores).
+        nome: Nome do pool, usado como rótulo da métrica de profundidade das filas.
+
+    Yields:
+        (trabalho, resultado): Resultado de cada trabalho, em ordem de conclusão.
+            'resultado' é None se o trabalhador lançou uma exceção.
+    """
+    tamanho_fila = tamanho_fila or 2 * num_trabalhadores
+    fila_trabalhos = asyncio.Queue(maxsize=tamanho_fila)
+    fila_resultados = asyncio.Queue(maxsize=tamanho_fila)
+    fim = object()
+    erro_produtor = None
+
+    async def produtor():
+        nonlocal erro_produtor
+        try:
+            if hasattr(trabalhos, '__aiter__'):
+                async for trabalho in trabalhos:
+                    await fila_trabalhos.put(trabalho)
+            else:
+                for trabalho in trabalhos:
+                    await fila_trabalhos.put(trabalho)
+        except Exception as e:
+            erro_produtor = e
+            logging.error(f"Erro ao gerar trabalhos para o pool: {str(e)}")
+        for _ in range(num_trabalhadores):
+            await fila_trabalhos.put(fim)
+
+    async def consumidor():
+        while True:
+            trabalho = await fila_trabalhos.get()
+            if trabalho is fim:
+                await fila_resultados.put(fim)
+                return
+            try:
+                resultado = await trabalhador(trabalho)
+            except Exception as e:
+                logging.error(f"Erro ao executar trabalho {trabalho!r}: {str(e)}")
+                resultado = None
+            await fila_resultados.put((trabalho, resultado))
+
+    tarefas = [asyncio.create_task(produtor())]
+    tarefas += [asyncio.create_task(consumidor()) for _ in range(num_trabalhadores)]
+    ativos = num_trabalhadores
+    try:
+        while ativos:
+            item = await fila_resultados.get()
+            if item is fim:
+                ativos -= 1
+                continue
+            METRICAS.definir('profundidade_fila', fila_trabalhos.qsize(), pool=nome, fila='trabalhos')
+            METRICAS.definir('profundidade_fila', fila_resultados.qsize(), pool=nome, fila='resultados')
+            yield item
+    finally:
+        # Se o consumidor interromper a iteração, cancela produtor e trabalhadores e espera que
+        # terminem, para que nenhuma requisição fique órfã; a origem assíncrona é fechada em seguida
+        for tarefa in tarefas:
+            tarefa.cancel()
+        await asyncio.gather(*tarefas, return_exceptions=True)
+        if hasattr(trabalhos, 'aclose'):
+            await trabalhos.aclose()
+    if erro_produtor is not None:
+        raise erro_produtor
+
+# ---------------------------- Módulo de Cache de Respostas ---------------------------- #
+
+class CacheRespostas:
+    """
+    Cache em disco (SQLite) das respostas JSON da API, indexado pela URL e pelos parâmetros.
+
+    O corpo é guardado compactado com zlib junto com os validadores 'ETag' e 'Last-Modified'.
+    Nas novas execuções, as requisições são revalidadas com 'If-None-Match'/'If-Modified-Since'
+    e as respostas 304 são servidas do disco. Entradas não revalidadas há mais de 'ttl' segundos
+    são descartadas e, acima de 'tamanho_maximo' bytes, as menos usadas recentemente (LRU) saem primeiro.
+    """
+
+    def __init__(self, caminho_banco, ttl, tamanho_maximo, intervalo_gravacao=200):
+        self.conexao = sqlite3.connect(caminho_banco)
+        self.conexao.execute('PRAGMA journal_mode=WAL')
+        self.conexao.execute('PRAGMA synchronous=NORMAL')
+        self.conexao.execute('CREATE TABLE IF NOT EXISTS "respostas" ("chave" TEXT PRIMARY KEY, "corpo" BLOB, "etag" TEXT, '
+                             '"last_modified" TEXT, "tamanho" INTEGER, "armazenado_em" REAL, "acessado_em" REAL)')
+        self.conexao.execute('CREATE INDEX IF NOT EXISTS "ix_respostas_acessado_em" ON "respostas" ("acessado_em")')
+        self.ttl = ttl
+        self.tamanho_maximo = tamanho_maximo
+        self.intervalo_gravacao = intervalo_gravacao
+        self.operacoes = 0
+        self.acertos = 0
+        self.ausencias = 0
+        self.revalidacoes = 0
+        self.podar()
+
+    @staticmethod
+    def chave(url, params):
+        if not params:
+            return url
+        return f"{url}?{urllib.parse.urlencode(sorted((str(k), str(v)) for k, v in params.items()))}"
+
+    def obter(self, url, params):
+        """
+        Devolve a entrada em cache (dicionário com 'corpo', 'etag' e 'last_modified') ou None.
+        """
+        chave = self.chave(url, params)
+        linha = self.conexao.execute('SELECT "corpo", "etag", "last_modified" FROM "respostas" WHERE "chave" = ?', (chave,)).fetchone()
+        if linha is None:
+            self.ausencias += 1
+            return None
+        self.acertos += 1
+        self.conexao.execute('UPDATE "respostas" SET "acessado_em" = ? WHERE "chave" = ?', (time.time(), chave))
+        self._contar_operacao()
+        return {'corpo': zlib.decompress(linha[0]), 'etag': linha[1], 'last_modified': linha[2]}
+
+    @staticmethod
+    def cabecalhos_condicionais(entrada):
+        cabecalhos = {}
+        if entrada is None:
+            return cabecalhos
+        if entrada['etag']:
+            cabecalhos['If-None-Match'] = entrada['etag']
+        if entrada['last_modified']:
+            cabecalhos['If-Modified-Since'] = entrada['last_modified']
+        return cabecalhos
+
+    def guardar(self, url, params, corpo, cabecalhos):
+        corpo_compactado = zlib.compress(corpo)
+        agora = time.time()
+        self.conexao.execute(
+            'INSERT INTO "respostas" ("chave", "corpo", "etag", "last_modified", "tamanho", "armazenado_em", "acessado_em") '
+            'VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT ("chave") DO UPDATE SET "corpo" = excluded."corpo", "etag" = excluded."etag", '
+            '"last_modified" = excluded."last_modified", "tamanho" = excluded."tamanho", '
+            '"armazenado_em" = excluded."armazenado_em", "acessado_em" = excluded."acessado_em"',
+            (self.chave(url, params), corpo_compactado, cabecalhos.get('ETag'), cabecalhos.get('Last-Modified'),
+             len(corpo_compactado), agora, agora),
+        )
+        self._contar_operacao()
+
+    def revalidar(self, url, params):
+        """
+        Registra que o servidor confirmou (304) que a entrada continua válida.
+        """
+        self.revalidacoes += 1
+        self.conexao.execute('UPDATE "respostas" SET "armazenado_em" = ? WHERE "chave" = ?', (time.time(), self.chave(url, params)))
+        self._contar_operacao()
+
+    def _contar_operacao(self):
+        self.operacoes += 1
+        if self.operacoes % self.intervalo_gravacao == 0:
+            self.conexao.commit()
+        if self.operacoes % (self.intervalo_gravacao * 50) == 0:
+            self.podar()
+
+    def podar(self):
+        """
+        Remove as entradas vencidas pelo TTL e, se o cache passar do tamanho máximo, as menos usadas recentemente.
+        """
+        self.conexao.execute('DELETE FROM "respostas" WHERE "armazenado_em" < ?', (time.time() - self.ttl,))
+        self.conexao.execute(
+            'DELETE FROM "respostas" WHERE "chave" IN (SELECT "chave" FROM (SELECT "chave", '
+            'SUM("tamanho") OVER (ORDER BY "acessado_em" DESC, "chave") AS "acumulado" FROM "respostas") WHERE "acumulado" > ?)',
+            (self.tamanho_maximo,),
+        )
+        self.conexao.commit()
+
+    def fechar(self):
+        self.podar()
+        self.conexao.close()
+
+def criar_cache(config, paths):
+    """
+    Cria o cache de respostas configurado.
+
+    Args:
+        config: Configurações do sistema.
+        paths: Dicionário com os caminhos dos arquivos.
+
+    Returns:
+        cache: Instância de CacheRespostas, ou None se o cache estiver desativado.
+    """
+    if not (config['cache_respostas'] or config['modo_replay']):
+        return None
+    if config['modo_replay'] and not os.path.exists(paths['cache_db']):
+        logging.warning(f"Modo replay ativado, mas o cache '{paths['cache_db']}' não existe: nenhuma resposta será servida.")
+    return CacheRespostas(paths['cache_db'], config['cache_ttl_dias'] * 86400, config['cache_tamanho_maximo_mb'] * 1024 * 1024)
+
+# ---------------------------- Módulo de Requisições ---------------------------- #
+
+def criar_sessao(config):
+    """
+    Cria a sessão HTTP compartilhada por toda a execução, com um pool de conexões ajustado.
+
+    O conector mantém as conexões abertas (keep-alive) entre as etapas, limita as conexões
+    por host à concorrência máxima do limitador e guarda as resoluções de DNS por 'ttl_cache_dns' segundos,
+    evitando novos handshakes TLS com o pncp.gov.br a cada requisição.
+
+    Args:
+        config: Configurações do sistema.
+
+    Returns:
+        session: Instância de aiohttp.ClientSession.
+    """
+    conector = aiohttp.TCPConnector(
+        limit=config['limite_conexoes_total'],
+        limit_per_host=config['concorrencia_maxima'],
+        use_dns_cache=True,
+        ttl_dns_cache=config['ttl_cache_dns'],
+        keepalive_timeout=config['keepalive_timeout'],
+    )
+    # Com a compressão habilitada o servidor pode responder com gzip/deflate, descompactado pelo aiohttp
+    cabecalhos = {'Accept-Encoding': 'gzip, deflate' if config['compressao_http'] else 'identity'}
+    return aiohttp.ClientSession(connector=conector, headers=cabecalhos, auto_decompress=True)
+
+# Status HTTP que indicam limitação de taxa por parte do servidor
+STATUS_LIMITACAO = (429, 503)
+
+def interpretar_retry_after(valor):
+    """
+    Converte o cabeçalho Retry-After (segundos ou data HTTP) em segundos de espera.
+
+    Args:
+        valor: Conteúdo do cabeçalho, ou None.
+
+    Returns:
+        segundos: Tempo de espera em segundos, ou None se o cabeçalho estiver ausente ou inválido.
+    """
+    if not valor:
+        return None
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        data = email.utils.parsedate_to_datetime(valor)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, data.timestamp() - time.time())
+
+class LimitadorAdaptativo:
+    """
+    Limitador de concorrência compartilhado com controle AIMD (aumento aditivo, redução multiplicativa).
+
+    O limite cresce de forma aditiva (cerca de +1 a cada 'limite' respostas saudáveis) enquanto a
+    latência p95 e a taxa de erros da janela recente ficam dentro dos alvos, e é multiplicado por
+    'fator_reducao' quando o servidor responde 429/503, quando ocorre timeout ou quando a taxa de
+    erros passa do máximo. O cabeçalho Retry-After suspende novas requisições até o prazo indicado.
+
+    Args:
+        inicial: Limite inicial de requisições simultâneas.
+        minimo: Limite mínimo.
+        maximo: Limite máximo.
+        latencia_alvo: Latência p95 máxima, em segundos, para que o limite possa crescer.
+        taxa_erro_maxima: Fração máxima de erros na janela para que o limite possa crescer.
+        janela: Número de respostas consideradas nas estatísticas.
+        fator_reducao: Fator multiplicativo aplicado nas reduções.
+    """
+
+    def __init__(self, inicial, minimo, maximo, latencia_alvo, taxa_erro_maxima, janela=100, fator_reducao=0.5):
+        self.minimo = max(1, minimo)
+        self.maximo = max(self.minimo, maximo)
+        self.limite = float(min(max(inicial, self.minimo), self.maximo))
+        self.latencia_alvo = latencia_alvo
+        self.taxa_erro_maxima = taxa_erro_maxima
+        self.fator_reducao = fator_reducao
+        self.em_uso = 0
+        self.pausa_ate = 0.0
+        self.ultima_reducao = 0.0
+        self.latencias = collections.deque(maxlen=janela)
+        self.erros = collections.deque(maxlen=janela)
+        self._condicao = asyncio.Condition()
+
+    def p95(self):
+        if not self.latencias:
+            return 0.0
+        ordenadas = sorted(self.latencias)
+        return ordenadas[int(0.95 * (len(ordenadas) - 1))]
+
+    def taxa_erro(self):
+        return sum(self.erros) / len(self.erros) if self.erros else 0.0
+
+    async def adquirir(self):
+        async with self._condicao:
+            while True:
+                espera = self.pausa_ate - time.monotonic()
+                if espera > 0:
+                    try:
+                        await asyncio.wait_for(self._condicao.wait(), espera)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                if self.em_uso < int(self.limite):
+                    break
+                await self._condicao.wait()
+            self.em_uso += 1
+
+    async def liberar(self):
+        async with self._condicao:
+            self.em_uso -= 1
+            self._condicao.notify_all()
+
+    def _reduzir(self, motivo):
+        # Uma única redução por intervalo de ida e volta: respostas em voo enviadas com o limite
+        # antigo não devem derrubá-lo várias vezes seguidas
+        agora = time.monotonic()
+        if agora - self.ultima_reducao < max(self.p95(), 1.0):
+            return
+        anterior = self.limite
+        self.limite = max(float(self.minimo), self.limite * self.fator_reducao)
+        self.ultima_reducao = agora
+        logging.info(f"Limite de concorrência reduzido de {anterior:.1f} para {self.limite:.1f} ({motivo}).")
+
+    def registrar_sucesso(self, latencia):
+        self.latencias.append(latencia)
+        self.erros.append(False)
+        if len(self.latencias) >= 10 and self.p95() <= self.latencia_alvo and self.taxa_erro() <= self.taxa_erro_maxima:
+            self.limite = min(float(self.maximo), self.limite + 1.0 / self.limite)
+
+    def registrar_falha(self, latencia, status=None, retry_after=None, timeout=False):
+        self.erros.append(True)
+        if retry_after:
+            self.pausa_ate = max(self.pausa_ate, time.monotonic() + retry_after)
+        if status in STATUS_LIMITACAO:
+            self._reduzir(f"HTTP {status}")
+        elif timeout:
+            self._reduzir("timeout")
+        else:
+            self.latencias.append(latencia)
+            if self.taxa_erro() > self.taxa_erro_maxima:
+                self._reduzir(f"taxa de erros {self.taxa_erro():.0%}")
+
+def criar_limitador(config):
+    """
+    Cria o limitador de concorrência compartilhado pela execução.
+
+    Args:
+        config: Configurações do sistema.
+
+    Returns:
+        limitador: Instância de LimitadorAdaptativo. Com o controle adaptativo desligado,
+            o limite fica fixo em 'numero_maximo_conexoes'.
+    """
+    if not config['controle_adaptativo']:
+        fixo = config['numero_maximo_conexoes']
+        return LimitadorAdaptativo(fixo, fixo, fixo, float('inf'), 1.0)
+    return LimitadorAdaptativo(
+        config['numero_maximo_conexoes'],
+        config['concorrencia_minima'],
+        config['concorrencia_maxima'],
+        config['latencia_alvo_p95'],
+        config['taxa_erro_maxima'],
+    )
+
+async def fetch_with_retry(session, url, params, config, tentativa=1, limitador=None, registro=None, cache=None):
+    """
+    Realiza uma requisição HTTP com retentativas e backoff exponencial. Respostas 4xx, exceto
+    429, não são retentadas.
+
+    Cada tentativa ocupa uma vaga do limitador apenas enquanto a requisição está em voo;
+    a espera entre tentativas acontece fora dele, para não reduzir a vazão das demais.
+    Com cache, a requisição é condicional e uma resposta 304 é servida do disco; no modo
+    replay, a resposta vem exclusivamente do cache.
+
+    Args:
+        session: Sessão HTTP.
+        url: URL da requisição.
+        params: Parâmetros da requisição.
+        config: Configurações do sistema.
+        tentativa: Número da tentativa atual.
+        limitador: Limitador de concorrência compartilhado (opcional).
+        registro: Função que registra no diário de execução os pedidos de espera do servidor (opcional).
+        cache: Cache de respostas em disco (opcional).
+
+    Returns:
+        response_data: Dados da resposta em formato JSON, ou None em caso de falha.
+    """
+    endpoint = tipo_endpoint(url)
+    entrada = cache.obter(url, params) if cache is not None else None
+    if config['modo_replay']:
+        if entrada is None:
+            logging.warning(f"Resposta ausente do cache no modo replay: {CacheRespostas.chave(url, params)}")
+            return None
+        METRICAS.incrementar('respostas_cache_total', endpoint=endpoint, origem='replay')
+        return json.loads(entrada['corpo'])
+
+    erro = None
+    status = None
+    retry_after = None
+    json_response = None
+    concluida = False
+    if limitador is not None:
+        inicio_espera = time.monotonic()
+        await limitador.adquirir()
+        METRICAS.observar('espera_limitador_segundos', time.monotonic() - inicio_espera, endpoint=endpoint)
+        METRICAS.definir('concorrencia_limite', int(limitador.limite))
+        METRICAS.definir('requisicoes_em_andamento', limitador.em_uso)
+    inicio = time.monotonic()
+    try:
+        async with session.get(url, params=params, timeout=10, headers=CacheRespostas.cabecalhos_condicionais(entrada)) as response:
+            status = response.status
+            if status in STATUS_LIMITACAO:
+                retry_after = interpretar_retry_after(response.headers.get('Retry-After'))
+            if status == 304 and entrada is not None:
+                json_response = json.loads(entrada['corpo'])
+                cache.revalidar(url, params)
+                METRICAS.incrementar('respostas_cache_total', endpoint=endpoint, origem='revalidada')
+            else:
+                response.raise_for_status()
+                corpo = await response.read()
+                METRICAS.incrementar('bytes_recebidos_total', len(corpo), endpoint=endpoint)
+                json_response = await response.json()
+                if cache is not None:
+                    cache.guardar(url, params, corpo, response.headers)
+            concluida = True
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        erro = e
+    finally:
+        latencia = time.monotonic() - inicio
+        if status is not None or erro is not None:
+            if status is None:
+                status_metrica = 'timeout' if isinstance(erro, asyncio.TimeoutError) else 'erro_conexao'
+            else:
+                status_metrica = status
+            METRICAS.incrementar('requisicoes_total', endpoint=endpoint, status=status_metrica)
+            METRICAS.observar('latencia_requisicao_segundos', latencia, endpoint=endpoint)
+        if limitador is not None:
+            if concluida:
+                limitador.registrar_sucesso(latencia)
+            elif erro is None:
+                # Requisição cancelada: não entra nas estatísticas
+                pass
+            elif status is not None and status < 500 and status not in STATUS_LIMITACAO:
+                # Erros do cliente (ex.: 404) não indicam sobrecarga do servidor
+                limitador.registrar_sucesso(latencia)
+            else:
+                limitador.registrar_falha(latencia, status, retry_after, isinstance(erro, asyncio.TimeoutError))
+            await limitador.liberar()
+
+    if concluida:
+        return json_response
+
+    if status is not None and 400 <= status < 500 and status not in STATUS_LIMITACAO:
+        # Erros do cliente (ex.: 404) não mudam com uma nova tentativa
+        METRICAS.incrementar('falhas_requisicao_total', endpoint=endpoint)
+        logging.warning(f"Requisição recusada com HTTP {status}, sem nova tentativa: {url}")
+        return None
+
+    if registro is not None and retry_after is not None:
+        registro('retry_after', retry_after)
+
+    if tentativa <= config['tentativas_maximas']:
+        METRICAS.incrementar('retentativas_total', endpoint=endpoint)
+        tempo_espera = config['tempo_espera_inicial'] * (2 ** (tentativa - 1)) + random.uniform(0, 1)
+        tempo_espera = max(tempo_espera, retry_after or 0)
+        await asyncio.sleep(tempo_espera)
+        if config['verbose']:
+            print(f"Tentativa {tentativa} falhou para {url}. Retentando em {tempo_espera:.2f} segundos...")
+        logging.warning(f"Tentativa {tentativa} falhou para {url}: {str(erro)}")
+        return await fetch_with_retry(session, url, params, config, tentativa + 1, limitador, registro, cache)
+    else:
+        METRICAS.incrementar('falhas_requisicao_total', endpoint=endpoint)
+        logging.error(f"Falha na requisição após {config['tentativas_maximas']} tentativas: {str(erro)}")
+        return None
+
+async def limited_fetch(limitador, session, url, params, config, registro=None, cache=None):
+    """
+    Controla o número de requisições simultâneas por meio do limitador adaptativo compartilhado.
+
+    Args:
+        limitador: Limitador de concorrência compartilhado (LimitadorAdaptativo).
+        session: Sessão HTTP.
+        url: URL da requisição.
+        params: Parâmetros da requisição.
+        config: Configurações do sistema.
+        registro: Função que registra no diário de execução os pedidos de espera do servidor (opcional).
+        cache: Cache de respostas em disco (opcional).
+
+    Returns:
+        response_data: Dados da resposta em formato JSON, ou None em caso de falha.
+    """
+    return await fetch_with_retry(session, url, params, config, limitador=limitador, registro=registro, cache=cache)
+
+def _total_paginas(resposta, tamanho_pagina):
+    """
+    Obtém o número total de páginas informado por uma resposta paginada da API.
+
+    Args:
+        resposta: Resposta da primeira página.
+        tamanho_pagina: Tamanho de página usado na requisição.
+
+    Returns:
+        total_paginas: Número total de páginas, ou None se a resposta não o informar.
+    """
+    if not isinstance(resposta, dict):
+        return None
+    if resposta.get('totalPaginas') is not None:
+        return int(resposta['totalPaginas'])
+    if resposta.get('totalRegistros') is not None:
+        return math.ceil(int(resposta['totalRegistros']) / tamanho_pagina)
+    return None
+
+async def fetch_paginado(limitador, session, url, params, config, registro=None, cache=None):
+    """
+    Busca todas as páginas de um endpoint de detalhes (itens, arquivos ou resultados).
+
+    A primeira página é requisitada normalmente. Se ela vier cheia, o total é obtido da própria
+    resposta ('totalPaginas'/'totalRegistros') ou, apenas para os itens, do endpoint
+    '/itens/quantidade' (o único publicado pela API), e as páginas restantes são requisitadas
+    de forma concorrente. Se o total não puder ser determinado, as
+    páginas seguintes são buscadas em sequência até que uma venha incompleta.
+
+    Args:
+        limitador: Limitador de concorrência compartilhado.
+        session: Sessão HTTP.
+        url: URL do endpoint.
+        params: Parâmetros da primeira página ('pagina' e 'tamanhoPagina').
+        config: Configurações do sistema.
+        registro: Função que registra no diário de execução os pedidos de espera do servidor (opcional).
+        cache: Cache de respostas em disco (opcional).
+
+    Returns:
+        registros: Lista com os registros de todas as páginas, ou None se alguma página falhar.
+    """
+    tamanho_pagina = params['tamanhoPagina']
+    primeira = await limited_fetch(limitador, session, url, params, config, registro, cache)
+    if primeira is None:
+        return None
+    registros = list(primeira.get('items', []) if isinstance(primeira, dict) else primeira or [])
+    if len(registros) < tamanho_pagina:
+        return registros
+
+    total_paginas = _total_paginas(primeira, tamanho_pagina)
+    if total_paginas is None and tipo_endpoint(url) == 'itens':
+        quantidade = await limited_fetch(limitador, session, f"{url}/quantidade", None, config, registro, cache)
+        if isinstance(quantidade, int):
+            total_paginas = math.ceil(quantidade / tamanho_pagina)
+
+    def extrair(resposta):
+        return resposta.get('items', []) if isinstance(resposta, dict) else resposta or []
+
+    if total_paginas is not None:
+        paginas = range(params['pagina'] + 1, total_paginas + 1)
+        respostas = await asyncio.gather(*(
+            limited_fetch(limitador, session, url, {**params, 'pagina': pagina}, config, registro, cache) for pagina in paginas
+        ))
+        if any(resposta is None for resposta in respostas):
+            logging.error(f"Falha ao obter todas as {total_paginas} páginas de {url}.")
+            return None
+        for resposta in respostas:
+            registros.extend(extrair(resposta))
+        return registros
+
+    # Total desconhecido: segue página a página até encontrar uma página incompleta
+    pagina = params['pagina']
+    ultima = registros
+    while len(ultima) >= tamanho_pagina:
+        pagina += 1
+        resposta = await limited_fetch(limitador, session, url, {**params, 'pagina': pagina}, config, registro, cache)
+        if resposta is None:
+            logging.error(f"Falha ao obter a página {pagina} de {url}.")
+            return None
+        ultima = extrair(resposta)
+        registros.extend(ultima)
+    return registros
+
+async def fetch_licitacoes(session, limitador, tipos_documento, ordenacao, pages, config, diario=None, cache=None, chaves=None):
+    """
+    Realiza as requisições das licitações de forma assíncrona para cada tipo de documento,
+    entregando cada página assim que ela é recebida.
+
+    Args:
+        session: Sessão HTTP compartilhada.
+        limitador: Limitador de concorrência compartilhado.
+        tipos_documento: Lista de tipos de documento ('edital', 'ata', etc.).
+        pages: Lista de números de páginas a serem requisitadas.
+        config: Configurações do sistema.
+        diario: Diário de execução (opcional); páginas já concluídas nele não são requisitadas de novo.
+        cache: Cache de respostas em disco (opcional).
+        chaves: Lista explícita de páginas (tipo, ordenação, página, tamanho[, filtros]) a requisitar
+            (opcional); substitui a combinação de 'tipos_documento', 'ordenacao' e 'pages'. 'filtros'
+            são os parâmetros de uma fatia do plano de busca, codificados como query string.
+
+    Yields:
+        (chave, response): Chave da página e sua resposta, em ordem de conclusão (None em caso de falha).
+    """
+    base_url = f"{config['url_base_api']}/search/"
+    if chaves is None:
+        chaves = [(tipo, ordem, page, config['tam_pagina']) for ordem in ordenacao for tipo in tipos_documento for page in pages]
+    puladas = 0
+    def gerar_trabalhos():
+        nonlocal puladas
+        for chave in chaves:
+            tipo, ordem, page, tam_pagina, *filtros = chave
+            if diario is not None and diario.concluido('licitacoes', chave):
+                puladas += 1
+                continue
+            params = {
+                "pagina": page,
+                "tam_pagina": tam_pagina,
+                "ordenacao": ordem,
+                "q": "",
+                "tipos_documento": tipo,
+                "status": "todos"
+            }
+            # Páginas de uma fatia do plano de busca levam os filtros da fatia
+            if filtros and filtros[0]:
+                params.update(urllib.parse.parse_qsl(filtros[0]))
+            if diario is not None:
+                diario.registrar('licitacoes', chave, 'pendente', base_url)
+            yield chave, params
+
+    async def trabalhador(trabalho):
+        chave, params = trabalho
+        registro = diario.registrador('licitacoes', chave, base_url) if diario is not None else None
+        return await limited_fetch(limitador, session, base_url, params, config, registro, cache)
+
+    progresso = ProgressoEtapa('licitacoes', len(chaves), config['intervalo_progresso'])
+    async for (chave, _), response in executar_em_pool(gerar_trabalhos(), trabalhador, config['concorrencia_maxima'], nome='licitacoes'):
+        tipo, ordem, page = chave[:3]
+        if response is None and diario is not None:
+            diario.registrar('licitacoes', chave, 'falha', base_url)
+        logging.debug("Requisição concluída: Tipo Documento='%s', Ordenação='%s', Página=%s", tipo, ordem, page)
+        progresso.avancar(falhas=int(response is None))
+        yield chave, response
+    progresso.concluidos += puladas
+    progresso.finalizar()
+    if puladas:
+        logging.info(f"{puladas} páginas de licitações já concluídas no diário foram puladas.")
+
+def _data_publicacao(registro):
+    """
+    Devolve a data de publicação de uma licitação da busca, como string ISO comparável.
+    """
+    data = registro.get('data_publicacao_pncp') or registro.get('data_atualizacao_pncp')
+    return str(data)[:19] if data else None
+
+async def fetch_licitacoes_incremental(session, limitador, armazenamento, tipos_documento, pages, config, marcas, cache=None):
+    """
+    Busca apenas as licitações publicadas desde a última execução (modo incremental).
+
+    Para cada tipo de documento, percorre as páginas em ordem '-data' (mais recentes primeiro)
+    e para assim que encontra uma licitação publicada antes da marca d'água gravada no
+    armazenamento. Na primeira execução, sem marca, percorre todas as páginas configuradas.
+    As novas marcas são devolvidas em 'marcas' e só devem ser gravadas depois que os
+    registros tiverem sido persistidos.
+
+    Alterações em licitações antigas não mudam a data de publicação e, portanto, não são
+    detectadas por este modo.
+
+    Args:
+        session: Sessão HTTP compartilhada.
+        limitador: Limitador de concorrência compartilhado.
+        armazenamento: Backend de armazenamento, de onde são lidas as marcas d'água.
+        tipos_documento: Lista de tipos de documento ('edital', 'ata', etc.).
+        pages: Lista de números de páginas que podem ser requisitadas.
+        config: Configurações do sistema.
+        marcas: Dicionário preenchido com a nova marca d'água de cada tipo de documento.
+        cache: Cache de respostas em disco (opcional).
+
+    Yields:
+        (chave, response): Chave da página (tipo, ordenação, página, tamanho) e sua resposta, em ordem.
+    """
+    base_url = f"{config['url_base_api']}/search/"
+    progresso = ProgressoEtapa('licitacoes_incremental', intervalo=config['intervalo_progresso'])
+
+    for tipo in tipos_documento:
+        chave = f"marca_dagua_{tipo}"
+        marca = armazenamento.ler_estado(chave)
+        mais_recente = marca
+        completo = True
+        for page in pages:
+            params = {
+                "pagina": page,
+                "tam_pagina": config['tam_pagina'],
+                "ordenacao": "-data",
+                "q": "",
+                "tipos_documento": tipo,
+                "status": "todos"
+            }
+            response = await limited_fetch(limitador, session, base_url, params, config, cache=cache)
+            if response is None:
+                # Sem esta página não é possível garantir que nada foi perdido: não avança a marca
+                completo = False
+                break
+            items = response.get('items', []) if isinstance(response, dict) else []
+            datas = [data for data in map(_data_publicacao, items) if data]
+            if datas and (mais_recente is None or max(datas) > mais_recente):
+                mais_recente = max(datas)
+            logging.debug("Requisição incremental concluída: Tipo Documento='%s', Página=%s", tipo, page)
+            progresso.avancar()
+            yield (tipo, '-data', page, config['tam_pagina']), response
+
+            if len(items) < config['tam_pagina']:
+                break
+            if marca is not None and datas and min(datas) < marca:
+                logging.info(f"Marca d'água de '{tipo}' ({marca}) alcançada na página {page}.")
+                break
+
+        if completo and mais_recente is not None:
+            marcas[chave] = mais_recente
+    progresso.finalizar()
+
+async def fetch_detalhes(session, limitador, registros, data_type, config, total=None, diario=None, cache=None):
+    """
+    Realiza as requisições dos detalhes (itens ou arquivos) de forma assíncrona,
+    entregando os detalhes de cada licitação assim que a resposta chega.
+
+    Args:
+        session: Sessão HTTP compartilhada.
+        limitador: Limitador de concorrência compartilhado.
+        registros: Iterável de registros (dicionários) para os quais os detalhes serão buscados.
+        data_type: Tipo de detalhe ('itens' ou 'arquivos').
+        config: Configurações do sistema.
+        total: Número total de registros, usado apenas no relatório de progresso.
+        diario: Diário de execução (opcional), onde é registrado o estado de cada requisição.
+        cache: Cache de respostas em disco (opcional).
+
+    Yields:
+        (numero_controle_pncp, itens): Detalhes de cada licitação, em ordem de conclusão.
+            'itens' é None quando a requisição falhou.
+    """
+    base_url = f"{config['url_base_api']}/pncp/v1/orgaos/"
+    def gerar_trabalhos():
+        for registro in registros:
+            orgao_cnpj = registro.get('orgao_cnpj')
+            ano = registro.get('ano')
+            numero_sequencial = registro.get('numero_sequencial')
+            numero_controle_pncp = registro.get('numero_controle_pncp')
+
+            if not all([orgao_cnpj, ano, numero_sequencial, numero_controle_pncp]):
+                logging.warning(f"Dados incompletos para a licitação '{numero_controle_pncp}'. Pulando...")
+                if config['verbose']:
+                    print(f"Aviso: Dados incompletos para a licitação '{numero_controle_pncp}'. Pulando...")
+                continue
+
+            url = f"{base_url}{orgao_cnpj}/compras/{ano}/{numero_sequencial}/{data_type}"
+            params = {
+                "pagina": 1,
+                "tamanhoPagina": config[f'tamanho_pagina_{data_type}']
+            }
+            if diario is not None:
+                diario.registrar(data_type, numero_controle_pncp, 'pendente', url)
+            yield (numero_controle_pncp, orgao_cnpj, ano, numero_sequencial), url, params
+
+    async def trabalhador(trabalho):
+        (numero_controle_pncp, _, _, _), url, params = trabalho
+        registro = diario.registrador(data_type, numero_controle_pncp, url) if diario is not None else None
+        return await fetch_paginado(limitador, session, url, params, config, registro, cache)
+
+    progresso = ProgressoEtapa(data_type, total, config['intervalo_progresso'])
+    async for ((numero_controle_pncp, orgao_cnpj, ano, numero_sequencial), url, _), detalhe in executar_em_pool(gerar_trabalhos(), trabalhador, config['concorrencia_maxima'], nome=data_type):
+        itens = None
+        if detalhe:
+            if isinstance(detalhe, dict):
+                itens = detalhe.get('items', [])
+            elif isinstance(detalhe, list):
+                itens = detalhe
+            else:
+                itens = []
+                logging.warning(f"Formato inesperado da resposta para '{numero_controle_pncp}'.")
+                if config['verbose']:
+                    print(f"Aviso: Formato inesperado da resposta para '{numero_controle_pncp}'.")
+            
+            # Adiciona o numero_controle_pncp a cada item
+            for item in itens:
+                item['numero_controle_pncp'] = numero_controle_pncp
+                item['orgao_cnpj'] = orgao_cnpj
+                item['ano'] = ano
+                item['numero_sequencial'] = numero_sequencial
+                item['Resultados verificados'] = False  # Adiciona a nova coluna com valor False
+            
+            logging.debug("Requisição de %s para '%s' bem-sucedida.", data_type, numero_controle_pncp)
+        elif detalhe is not None:
+            # Resposta vazia: a licitação não possui detalhes desse tipo
+            itens = []
+        else:
+            logging.error(f"Requisição de {data_type} para '{numero_controle_pncp}' falhou.")
+            if config['verbose']:
+                print(f"Erro: Requisição de {data_type} para '{numero_controle_pncp}' falhou.")
+            if diario is not None:
+                diario.registrar(data_type, numero_controle_pncp, 'falha', url)
+        progresso.avancar(falhas=int(itens is None))
+        yield numero_controle_pncp, itens
+    progresso.finalizar()
+
+
+
+async def fetch_resultados(session, limitador, registros, config, total=None, diario=None, cache=None):
+    """
+    Realiza as requisições dos resultados de forma assíncrona,
+    entregando os resultados de cada item assim que a resposta chega.
+
+    Args:
+        session: Sessão HTTP compartilhada.
+        limitador: Limitador de concorrência compartilhado.
+        registros: Iterável de itens (dicionários) para os quais os resultados serão buscados.
+        config: Configurações do sistema.
+        total: Número total de itens, usado apenas no relatório de progresso.
+        diario: Diário de execução (opcional), onde é registrado o estado de cada requisição.
+        cache: Cache de respostas em disco (opcional).
+
+    Yields:
+        ((numero_controle_pncp, numeroItem), resultados): Resultados de cada item, em ordem de conclusão.
+            'resultados' é None quando a requisição falhou.
+    """
+    base_url = f"{config['url_base_api']}/pncp/v1/orgaos/"
+    def gerar_trabalhos():
+        for row in registros:
+            orgao_cnpj = row.get('orgao_cnpj')
+            ano = row.get('ano')
+            numero_sequencial = row.get('numero_sequencial')
+            numero_controle_pncp = row.get('numero_controle_pncp')
+            numeroItem = row.get('numeroItem')
+
+            if not all([orgao_cnpj, ano, numero_sequencial, numero_controle_pncp, numeroItem]):
+                logging.warning(f"Dados incompletos para o item '{numero_controle_pncp}'. Pulando...")
+                if config['verbose']:
+                    print(f"Aviso: Dados incompletos para o item '{numero_controle_pncp}'. Pulando...")
+                continue
+
+            url = f"{base_url}{orgao_cnpj}/compras/{ano}/{numero_sequencial}/itens/{numeroItem}/resultados"
+            params = {
+                "pagina": 1,
+                "tamanhoPagina": config['tamanho_pagina_resultados']
+            }
+            if diario is not None:
+                diario.registrar('resultados', (numero_controle_pncp, numeroItem), 'pendente', url)
+            yield (numero_controle_pncp, numeroItem), url, params
+
+    async def trabalhador(trabalho):
+        chave, url, params = trabalho
+        registro = diario.registrador('resultados', chave, url) if diario is not None else None
+        return await fetch_paginado(limitador, session, url, params, config, registro, cache)
+
+    progresso = ProgressoEtapa('resultados', total, config['intervalo_progresso'])
+    async for ((numero_controle_pncp, numeroItem), url, _), subitem in executar_em_pool(gerar_trabalhos(), trabalhador, config['concorrencia_maxima'], nome='resultados'):
+        resultados = None
+        if subitem:
+            if isinstance(subitem, dict):
+                resultados = subitem.get('items', [])
+            elif isinstance(subitem, list):
+                resultados = subitem
+            else:
+                resultados = []
+                logging.warning(f"Formato inesperado da resposta para o item '{numero_controle_pncp}'.")
+                if config['verbose']:
+                    print(f"Aviso: Formato inesperado da resposta para o item '{numero_controle_pncp}'.")
+            
+            # Adiciona o numero_controle_pncp a cada subitem
+            for sub in resultados:
+                sub['numero_controle_pncp'] = numero_controle_pncp
+                sub.setdefault('numeroItem', numeroItem)
+            
+            logging.debug("Requisição de resultados para o item '%s' bem-sucedida.", numero_controle_pncp)
+        elif subitem is not None:
+            # Resposta vazia: o item ainda não possui resultados
+            resultados = []
+        else:
+            logging.error(f"Requisição de resultados para o item '{numero_controle_pncp}' falhou.")
+            if config['verbose']:
+                print(f"Erro: Requisição de resultados para o item '{numero_controle_pncp}' falhou.")
+            if diario is not None:
+                diario.registrar('resultados', (numero_controle_pncp, numeroItem), 'falha', url)
+        progresso.avancar(falhas=int(resultados is None))
+        yield (numero_controle_pncp, numeroItem), resultados
+    progresso.finalizar()
+
+# ---------------------------- Módulo de Gravação Incremental ---------------------------- #
+
+async def gravar_licitacoes(fluxo, armazenamento, config, diario=None):
+    """
+    Consome o fluxo de páginas de licitações e grava os registros em lotes, à medida que chegam.
+
+    Args:
+        fluxo: Gerador assíncrono de tuplas (chave, resposta) das páginas de licitações.
+        armazenamento: Backend de armazenamento dos dados.
+        config: Configurações do sistema.
+        diario: Diário de execução (opcional); as páginas são marcadas como concluídas após cada gravação.
+
+    Returns:
+        total: Número de licitações gravadas.
+    """
+    respostas = []
+    concluidas = []
+    registros_pendentes = 0
+    total = 0
+
+    def descarregar():
+        nonlocal respostas, concluidas, registros_pendentes, total
+        with METRICAS.cronometro('duracao_processamento_segundos', tabela='licitacoes'):
+            df_novas = process_licitacoes(respostas)
+        with METRICAS.cronometro('duracao_gravacao_segundos', tabela='licitacoes'):
+            if config['detectar_alteracoes']:
+                # Compara com as versões gravadas antes que o upsert as sobrescreva
+                registrar_versoes_licitacoes(armazenamento, df_novas)
+            gravadas = armazenamento.upsert('licitacoes', df_novas)
+            armazenamento.salvar()
+            if diario is not None:
+                diario.concluir('licitacoes', concluidas)
+        METRICAS.incrementar('linhas_gravadas_total', gravadas, tabela='licitacoes')
+        total += gravadas
+        respostas = []
+        concluidas = []
+        registros_pendentes = 0
+
+    async for chave, response in fluxo:
+        respostas.append(response)
+        if response is not None:
+            concluidas.append(chave)
+        if response and isinstance(response, dict):
+            registros_pendentes += len(response.get('items', []))
+        if registros_pendentes >= config['tamanho_lote_gravacao']:
+            descarregar()
+    if respostas:
+        descarregar()
+    return total
+
+async def gravar_detalhes(fluxo, armazenamento, tabela, tabela_controle, coluna_controle, config, diario=None):
+    """
+    Consome um fluxo de detalhes (itens, arquivos ou resultados) e grava os registros em lotes,
+    marcando como concluídas apenas as entidades cuja requisição foi bem-sucedida.
+
+    Args:
+        fluxo: Gerador assíncrono de tuplas (chave, registros).
+        armazenamento: Backend de armazenamento dos dados.
+        tabela: Tabela de destino dos registros ('itens', 'arquivos' ou 'resultados').
+        tabela_controle: Tabela que possui a coluna de controle ('licitacoes' ou 'itens').
+        coluna_controle: Coluna de controle a ser marcada como True.
+        config: Configurações do sistema.
+        diario: Diário de execução (opcional); as entidades são marcadas como concluídas após cada gravação.
+
+    Returns:
+        total: Número de registros gravados.
+    """
+    chaves_controle = CHAVES_TABELAS[tabela_controle]
+    registros = []
+    concluidos = []
+    total = 0
+
+    def descarregar():
+        nonlocal registros, concluidos, total
+        df_registros = None
+        if registros:
+            with METRICAS.cronometro('duracao_processamento_segundos', tabela=tabela):
+                df_registros = processar_detalhes_registros(registros, pd.DataFrame(), tabela)
+        with METRICAS.cronometro('duracao_gravacao_segundos', tabela=tabela):
+            if df_registros is not None:
+                gravados = armazenamento.upsert(tabela, df_registros)
+                METRICAS.incrementar('linhas_gravadas_total', gravados, tabela=tabela)
+                total += gravados
+            if concluidos:
+                df_concluidos = pd.DataFrame(concluidos, columns=chaves_controle).assign(**{coluna_controle: True})
+                armazenamento.atualizar(tabela_controle, df_concluidos)
+            armazenamento.salvar()
+            if diario is not None:
+                diario.concluir(tabela, [chave[0] if len(chave) == 1 else chave for chave in concluidos])
+        registros = []
+        concluidos = []
+
+    async for chave, itens in fluxo:
+        if itens is None:
+            continue
+        registros.extend(itens)
+        concluidos.append(chave if isinstance(chave, tuple) else (chave,))
+        if len(registros) >= config['tamanho_lote_gravacao'] or len(concluidos) >= config['tamanho_lote_gravacao']:
+            descarregar()
+    if registros or concluidos:
+        descarregar()
+    return total
+
+# ---------------------------- Módulo de Detecção de Alterações ---------------------------- #
+
+# Impressão digital do conteúdo de cada licitação, gravada junto com ela
+COLUNA_IMPRESSAO = 'impressao_digital'
+
+def impressao_digital(registro):
+    """
+    Calcula a impressão digital de um registro da busca: o SHA-256 do seu JSON normalizado
+    (chaves ordenadas, sem espaços), que inclui a data de atualização da licitação.
+
+    Args:
+        registro: Registro (dicionário) devolvido pela busca.
+
+    Returns:
+        impressao: Resumo hexadecimal do conteúdo.
+    """
+    conteudo = json.dumps(registro, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+    return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+def registrar_versoes_licitacoes(armazenamento, df_novas):
+    """
+    Compara as impressões digitais de um lote de licitações com as já gravadas, registra as versões
+    inéditas no histórico e reenfileira os detalhes das licitações alteradas: itens e arquivos voltam
+    a ficar pendentes, assim como os resultados dos itens já conhecidos delas.
+
+    Deve ser chamada antes do upsert do lote. Licitações gravadas antes da existência da impressão
+    digital ganham sua primeira versão no histórico, sem reenfileiramento.
+
+    Args:
+        armazenamento: Backend de armazenamento dos dados.
+        df_novas: DataFrame das licitações recebidas, com a coluna de impressão digital.
+
+    Returns:
+        alteradas: Número de licitações já coletadas cujo conteúdo mudou.
+    """
+    if df_novas.empty or COLUNA_IMPRESSAO not in df_novas.columns:
+        return 0
+    df_novas = normalizar_para_texto(df_novas, 'licitacoes')
+    anteriores = armazenamento.carregar_por_chaves('licitacoes', df_novas[['numero_controle_pncp']])
+    if anteriores.empty:
+        anteriores = pd.DataFrame(columns=['numero_controle_pncp', COLUNA_IMPRESSAO])
+    elif COLUNA_IMPRESSAO not in anteriores.columns:
+        anteriores[COLUNA_IMPRESSAO] = None
+    anteriores = anteriores.set_index('numero_controle_pncp')[COLUNA_IMPRESSAO]
+    impressao_anterior = df_novas['numero_controle_pncp'].map(anteriores)
+    conhecidas = df_novas['numero_controle_pncp'].isin(anteriores.index)
+
+    # Toda impressão diferente da gravada é uma nova versão; só as conhecidas com impressão contam como alteração
+    nova_versao = impressao_anterior != df_novas[COLUNA_IMPRESSAO]
+    versoes = df_novas[nova_versao]
+    alteradas = df_novas.loc[nova_versao & conhecidas & impressao_anterior.notna(), 'numero_controle_pncp']
+
+    if not versoes.empty:
+        conteudo = versoes.drop(columns=[coluna for coluna in versoes.columns if coluna in COLUNAS_CONTROLE or coluna in (COLUNA_ALTERACAO, COLUNA_IMPRESSAO)])
+        armazenamento.upsert('historico_licitacoes', pd.DataFrame({
+            'numero_controle_pncp': versoes['numero_controle_pncp'],
+            COLUNA_IMPRESSAO: versoes[COLUNA_IMPRESSAO],
+            'data_atualizacao_pncp': versoes['data_atualizacao_pncp'] if 'data_atualizacao_pncp' in versoes.columns else None,
+            'coletada_em': instante_utc(),
+            'conteudo': [json.dumps({chave: valor for chave, valor in linha.items() if valor is not None}, ensure_ascii=False, sort_keys=True)
+                         for linha in conteudo.to_dict('records')],
+        }))
+
+    if alteradas.empty:
+        return 0
+    armazenamento.atualizar('licitacoes', pd.DataFrame({
+        'numero_controle_pncp': alteradas, 'detalhes_baixados': False, 'documentos_baixados': False,
+    }))
+    itens = armazenamento.carregar_por_chaves('itens', alteradas.to_frame())
+    if not itens.empty:
+        armazenamento.atualizar('itens', itens[CHAVES_TABELAS['itens']].assign(**{'Resultados verificados': False}))
+    METRICAS.incrementar('licitacoes_alteradas_total', len(alteradas))
+    logging.info(f"{len(alteradas)} licitações alteradas desde a última coleta: itens, arquivos e resultados reenfileirados.")
+    return len(alteradas)
+
+# ---------------------------- Módulo de Agenda de Resultados ---------------------------- #
+
+# Situações do item (situacaoCompraItem) que encerram a compra do item sem resultado:
+# 3 - anulado/revogado/cancelado, 4 - deserto, 5 - fracassado
+SITUACOES_SEM_RESULTADO = ('3', '4', '5')
+
+# Colunas de controle da agenda de revisitas dos itens ainda sem resultado
+COLUNA_PROXIMA_VERIFICACAO = 'proxima_verificacao_resultados'
+COLUNA_VERIFICACOES = 'verificacoes_resultados'
+
+def classificar_item_resultados(registro):
+    """
+    Decide, a partir dos campos de situação do item, se vale a pena consultar os seus resultados.
+
+    Args:
+        registro: Item (dicionário) lido do armazenamento.
+
+    Returns:
+        classe: 'buscar' (o item tem resultado, ou não há informação para decidir),
+            'sem_resultado' (o item foi cancelado, deserto ou fracassado e nunca terá resultado)
+            ou 'revisitar' (o item ainda está em andamento e deve ser consultado mais tarde).
+    """
+    tem_resultado = VALORES_BOOLEANOS.get(registro.get('temResultado'))
+    if tem_resultado:
+        return 'buscar'
+    situacao = registro.get('situacaoCompraItem')
+    situacao = str(situacao).strip() if situacao is not None and not pd.isna(situacao) else ''
+    if situacao in SITUACOES_SEM_RESULTADO:
+        return 'sem_resultado'
+    if tem_resultado is None and not situacao:
+        return 'buscar'
+    return 'revisitar'
+
+def instante_utc(segundos=None):
+    """
+    Instante em UTC no formato ISO ('AAAA-MM-DDTHH:MM:SS'), comparável como texto.
+    """
+    return time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(segundos))
+
+class AgendaResultados:
+    """
+    Seleciona os itens cujos resultados devem ser consultados nesta execução e mantém a agenda
+    de revisitas dos que ainda não têm resultado.
+
+    Itens com resultado (temResultado) são consultados; itens cancelados, desertos ou fracassados
+    são marcados como verificados sem nenhuma requisição; itens em andamento recebem uma data de
+    revisita, e cada consulta que volta vazia dobra o intervalo até a próxima (até o máximo
+    configurado), em vez de encerrar o item de vez.
+    """
+
+    def __init__(self, armazenamento, config):
+        self.armazenamento = armazenamento
+        self.intervalo_inicial = config['intervalo_revisita_resultados_horas'] * 3600
+        self.intervalo_maximo = config['intervalo_maximo_revisita_resultados_dias'] * 86400
+        self.tamanho_lote = config['tamanho_lote_gravacao']
+        self.revisitas = {}
+        self.atualizacoes = []
+        self.contagem = collections.Counter()
+
+    def _chave(self, registro):
+        return (registro.get('numero_controle_pncp'), registro.get('numeroItem'))
+
+    def _agendar(self, chave, verificacoes):
+        intervalo = min(self.intervalo_inicial * 2 ** verificacoes, self.intervalo_maximo)
+        self.atualizacoes.append({
+            'numero_controle_pncp': chave[0], 'numeroItem': chave[1],
+            COLUNA_PROXIMA_VERIFICACAO: instante_utc(time.time() + intervalo), COLUNA_VERIFICACOES: verificacoes,
+        })
+        if len(self.atualizacoes) >= self.tamanho_lote:
+            self.descarregar()
+
+    def descarregar(self):
+        if not self.atualizacoes:
+            return
+        self.armazenamento.atualizar('itens', pd.DataFrame(self.atualizacoes))
+        self.armazenamento.salvar()
+        self.atualizacoes = []
+
+    def acompanhar(self, registro):
+        """
+        Registra um item revisitado, para que uma consulta vazia o reagende em vez de encerrá-lo.
+        """
+        if classificar_item_resultados(registro) == 'revisitar':
+            self.revisitas[self._chave(registro)] = int(registro.get(COLUNA_VERIFICACOES) or 0)
+
+    def selecionar(self, registros):
+        """
+        Filtra os itens pendentes, entregando apenas os que devem ser consultados agora.
+
+        Args:
+            registros: Iterável de itens pendentes (dicionários).
+
+        Yields:
+            registro: Itens a consultar.
+        """
+        agora = instante_utc()
+        for registro in registros:
+            classe = classificar_item_resultados(registro)
+            if classe == 'buscar':
+                self.contagem['consultados'] += 1
+                yield registro
+                continue
+            chave = self._chave(registro)
+            if classe == 'sem_resultado':
+                self.contagem['sem_resultado'] += 1
+                self.atualizacoes.append({'numero_controle_pncp': chave[0], 'numeroItem': chave[1], 'Resultados verificados': True})
+                if len(self.atualizacoes) >= self.tamanho_lote:
+                    self.descarregar()
+                continue
+            proxima = registro.get(COLUNA_PROXIMA_VERIFICACAO)
+            if not proxima or pd.isna(proxima):
+                # Primeira vez: o item acabou de ser visto sem resultado, a revisita fica para depois
+                self.contagem['agendados'] += 1
+                self._agendar(chave, 0)
+            elif proxima > agora:
+                self.contagem['adiados'] += 1
+            else:
+                self.contagem['revisitados'] += 1
+                self.acompanhar(registro)
+                yield registro
+        self.descarregar()
+        logging.info(f"Agenda de resultados: {self.contagem['consultados']} itens consultados, "
+                     f"{self.contagem['revisitados']} revisitados, {self.contagem['sem_resultado']} encerrados sem resultado, "
+                     f"{self.contagem['agendados']} agendados e {self.contagem['adiados']} adiados.")
+
+    async def filtrar(self, fluxo):
+        """
+        Intercepta o fluxo de fetch_resultados: as consultas vazias de itens revisitados são
+        reagendadas com o intervalo dobrado e não chegam à gravação, que as daria por verificadas.
+
+        Yields:
+            (chave, resultados): Os demais elementos do fluxo, inalterados.
+        """
+        async for chave, resultados in fluxo:
+            if resultados == [] and chave in self.revisitas:
+                self.contagem['reagendados'] += 1
+                self._agendar(chave, self.revisitas.pop(chave) + 1)
+                continue
+            self.revisitas.pop(chave, None)
+            yield chave, resultados
+        self.descarregar()
+
+# ---------------------------- Módulo de Planejamento da Busca ---------------------------- #
+
+# Dimensões usadas para dividir o espaço de busca e o parâmetro da API correspondente a cada uma
+DIMENSOES_BUSCA = {
+    'status': 'status',
+    'uf': 'ufs',
+    'modalidade': 'modalidades',
+}
+
+class FatiaBusca:
+    """
+    Fatia do espaço de busca: um tipo de documento e um conjunto de filtros da API, com o total
+    de licitações informado pela própria busca.
+    """
+
+    def __init__(self, tipo, filtros, total):
+        self.tipo = tipo
+        self.filtros = filtros
+        self.total = total
+
+    def parametros(self):
+        # Sem filtro de status, a fatia cobre todos os status, como a busca sem planejamento
+        return {'status': 'todos', **dict(self.filtros)}
+
+    def descricao(self):
+        return urllib.parse.urlencode(self.filtros)
+
+async def contar_fatia(session, limitador, config, fatia, cache=None):
+    """
+    Consulta o total de licitações de uma fatia com uma página de um único registro.
+
+    Returns:
+        total: Total informado pela API, ou None se a consulta falhou.
+    """
+    params = {
+        "pagina": 1,
+        "tam_pagina": 1,
+        "ordenacao": config['ordenacao'][0],
+        "q": "",
+        "tipos_documento": fatia.tipo,
+        **fatia.parametros(),
+    }
+    response = await limited_fetch(limitador, session, f"{config['url_base_api']}/search/", params, config, cache=cache)
+    if not isinstance(response, dict) or response.get('total') is None:
+        return None
+    return int(response['total'])
+
+async def planejar_busca(session, limitador, config, cache=None):
+    """
+    Divide o espaço de busca em fatias disjuntas que cabem no limite de paginação da API.
+
+    Cada fatia cujo total passa de 'limite_paginas_busca' páginas é subdividida pelos valores da
+    próxima dimensão de 'dimensoes_busca' (ex.: status, depois UF, depois modalidade); as
+    consultas de um mesmo nível são feitas em paralelo. Uma fatia que continua grande demais
+    depois da última dimensão é mantida e registrada no log, pois só as primeiras páginas dela
+    serão alcançadas.
+
+    Args:
+        session: Sessão HTTP compartilhada.
+        limitador: Limitador de concorrência compartilhado.
+        config: Configurações do sistema.
+        cache: Cache de respostas em disco (opcional).
+
+    Returns:
+        fatias: Lista de FatiaBusca com pelo menos uma licitação cada.
+    """
+    limite = config['limite_paginas_busca'] * config['tam_pagina']
+    dimensoes = config['dimensoes_busca']
+    fatias = []
+    nivel = [(FatiaBusca(tipo, (), None), None) for tipo in config['tipos_documento']]
+    while nivel:
+        totais = await asyncio.gather(*(contar_fatia(session, limitador, config, fatia, cache) for fatia, _ in nivel))
+        proximo = []
+        somas = {}
+        for (fatia, mae), total in zip(nivel, totais):
+            if total is None:
+                # Sem o total, a fatia é percorrida até o limite de páginas
+                logging.error(f"Não foi possível obter o total da fatia '{fatia.tipo}' {fatia.descricao() or '(sem filtros)'}.")
+                total = limite
+            fatia.total = total
+            if mae is not None:
+                somas.setdefault(id(mae), [mae, 0])[1] += total
+            if total == 0:
+                continue
+            profundidade = len(fatia.filtros)
+            if total > limite and profundidade < len(dimensoes):
+                dimensao = dimensoes[profundidade]
+                parametro = DIMENSOES_BUSCA[dimensao]
+                proximo.extend(
+                    (FatiaBusca(fatia.tipo, fatia.filtros + ((parametro, valor),), None), fatia)
+                    for valor in config[f'valores_busca_{dimensao}']
+                )
+                continue
+            if total > limite:
+                logging.warning(f"A fatia '{fatia.tipo}' {fatia.descricao()} tem {total} licitações, acima do limite de "
+                                f"{limite}; apenas as primeiras {config['limite_paginas_busca']} páginas serão obtidas.")
+            fatias.append(fatia)
+        # Valores de uma dimensão que não somam o total da fatia-mãe deixariam licitações fora do plano
+        for mae, soma in somas.values():
+            if soma < mae.total:
+                logging.warning(f"As subdivisões da fatia '{mae.tipo}' {mae.descricao() or '(sem filtros)'} somam "
+                                f"{soma} de {mae.total} licitações.")
+        nivel = proximo
+    return fatias
+
+def chaves_do_plano(fatias, config):
+    """
+    Converte as fatias do plano nas páginas a requisitar (tipo, ordenação, página, tamanho, filtros).
+
+    Returns:
+        chaves: Lista de chaves de páginas, aceitas por fetch_licitacoes.
+    """
+    ordem = config['ordenacao'][0]
+    tam_pagina = config['tam_pagina']
+    chaves = []
+    for fatia in fatias:
+        paginas = min(math.ceil(fatia.total / tam_pagina), config['limite_paginas_busca'])
+        chaves.extend((fatia.tipo, ordem, page, tam_pagina, fatia.descricao()) for page in range(1, paginas + 1))
+    return chaves
+
+async def planejar_paginas(session, limitador, config, cache=None):
+    """
+    Planeja a busca e registra o orçamento de requisições antes de iniciá-la.
+
+    Returns:
+        chaves: Lista de chaves de páginas, aceitas por fetch_licitacoes.
+    """
+    fatias = await planejar_busca(session, limitador, config, cache)
+    chaves = chaves_do_plano(fatias, config)
+    limite = config['limite_paginas_busca'] * config['tam_pagina']
+    total = sum(min(fatia.total, limite) for fatia in fatias)
+    mensagem = f"Plano da busca: {len(fatias)} fatias, {total} licitações em {len(chaves)} páginas."
+    logging.info(mensagem)
+    print(mensagem)
+    return chaves
+
+# ---------------------------- Módulo de Processamento de Dados ---------------------------- #
+
+def process_licitacoes(respostas):
+    """
+    Processa as respostas das licitações em um dataframe com uma linha por licitação. Quando a
+    mesma licitação aparece mais de uma vez no lote (por exemplo, em duas páginas lidas durante
+    uma alteração), fica a versão com a data de atualização mais recente.
+
+    Args:
+        respostas: Lista de respostas das requisições.
+
+    Returns:
+        df_licitacoes: DataFrame das licitações do lote.
+    """
+    registros = []
+    for response in respostas:
+        if response and isinstance(response, dict) and 'items' in response:
+            registros.extend(response["items"])
+        else:
+            logging.warning("Resposta vazia ou sem a chave 'items'.")
+
+    if not registros:
+        logging.info("Nenhum registro novo de licitações foi encontrado.")
+        return pd.DataFrame()
+
+    # Achata objetos aninhados em colunas próprias e aplica o esquema tipado das licitações
+    df_novo = aplicar_esquema(achatar_registros(registros), 'licitacoes')
+    # A impressão digital é calculada sobre o registro bruto da busca, antes de qualquer conversão
+    if not df_novo.empty:
+        df_novo[COLUNA_IMPRESSAO] = [impressao_digital(registro) for registro in registros]
+
+    if df_novo.empty:
+        logging.info("DataFrame novo de licitações está vazio.")
+        return df_novo
+
+    # Adiciona colunas de controle, se não existirem
+    if 'detalhes_baixados' not in df_novo.columns:
+        df_novo['detalhes_baixados'] = False
+    if 'documentos_baixados' not in df_novo.columns:
+        df_novo['documentos_baixados'] = False
+
+    # Remove duplicatas mantendo a versão mais recente; em caso de empate, a última recebida
+    df_licitacoes = df_novo
+    if 'data_atualizacao_pncp' in df_licitacoes.columns:
+        df_licitacoes = df_licitacoes.sort_values('data_atualizacao_pncp', kind='stable', na_position='first')
+    df_licitacoes = df_licitacoes.drop_duplicates(subset='numero_controle_pncp', keep='last').sort_index()
+
+    logging.info(f"{len(df_licitacoes)} novas licitações adicionadas.")
+    return df_licitacoes
+
+def processar_detalhes_registros(registros, df_existente, tipo_registro):
+    """
+    Processa os registros detalhados, removendo duplicatas e combinando com os dados existentes.
+
+    Objetos aninhados são achatados em colunas próprias ('objeto_campo') e as colunas conhecidas
+    recebem os tipos do esquema da entidade. A deduplicação usa a chave natural da tabela.
+
+    Parâmetros:
+        registros (list): Lista de registros detalhados a serem processados.
+        df_existente (pd.DataFrame): DataFrame existente com dados anteriores.
+        tipo_registro (str): Tabela dos registros ('itens', 'arquivos' ou 'resultados').
+
+    Retorna:
+        pd.DataFrame: DataFrame consolidado com os registros processados.
+    """
+    df_registros = aplicar_esquema(achatar_registros(registros), tipo_registro)
+
+    # Combina com o DataFrame existente
+    if not df_existente.empty:
+        df_registros = pd.concat([df_existente, df_registros], ignore_index=True)
+
+    # Remove duplicatas pela chave natural, mantendo a versão mais recente
+    chaves = [chave for chave in CHAVES_TABELAS.get(tipo_registro, []) if chave in df_registros.columns]
+    if chaves:
+        df_registros = df_registros.drop_duplicates(subset=chaves, keep='last')
+    else:
+        logging.warning(f"Registros do tipo '{tipo_registro}' sem as colunas de chave; duplicatas não foram removidas.")
+
+    logging.info(f"Processamento de registros do tipo '{tipo_registro}' concluído. Total: {len(df_registros)} registros.")
+    return df_registros
+
+
+
+## ---------------------------- Módulo de Verificação de Arquivos Compactados ---------------------------- #
+
+# Tamanho dos blocos lidos por requisição Range; a primeira leitura traz a cauda do arquivo,
+# onde ficam o diretório central do ZIP e o cabeçalho final do 7z
+TAMANHO_BLOCO_REMOTO = 64 * 1024
+
+class ArquivoRemoto(io.RawIOBase):
+    """
+    Arquivo somente leitura e posicionável cujo conteúdo é buscado sob demanda com requisições
+    HTTP Range, para que zipfile, rarfile e py7zr listem o conteúdo sem baixar o arquivo inteiro.
+
+    Os leitores de arquivos compactados são síncronos: o objeto deve ser usado em uma thread
+    separada, e cada leitura agenda a requisição na sessão aiohttp do loop de eventos principal.
+    Os blocos lidos ficam em um cache LRU pequeno.
+
+    Args:
+        session: Sessão HTTP compartilhada.
+        url: URL do arquivo.
+        tamanho: Tamanho total do arquivo, em bytes.
+        loop: Loop de eventos onde a sessão é executada.
+        cauda: Bytes finais do arquivo já baixados (opcional).
+        tamanho_bloco: Tamanho de cada bloco requisitado.
+        max_blocos: Número máximo de blocos mantidos em cache.
+    """
+
+    def __init__(self, session, url, tamanho, loop, cauda=b'', tamanho_bloco=TAMANHO_BLOCO_REMOTO, max_blocos=64):
+        super().__init__()
+        self.session = session
+        self.url = url
+        self.tamanho = tamanho
+        self.loop = loop
+        self.cauda = cauda
+        self.inicio_cauda = tamanho - len(cauda)
+        self.tamanho_bloco = tamanho_bloco
+        self.max_blocos = max_blocos
+        self.blocos = collections.OrderedDict()
+        self.posicao = 0
+        self.bytes_baixados = len(cauda)
+        self.requisicoes = 1 if cauda else 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.posicao
+
+    def seek(self, deslocamento, origem=io.SEEK_SET):
+        if origem == io.SEEK_SET:
+            self.posicao = deslocamento
+        elif origem == io.SEEK_CUR:
+            self.posicao += deslocamento
+        elif origem == io.SEEK_END:
+            self.posicao = self.tamanho + deslocamento
+        else:
+            raise ValueError(f"Origem de seek inválida: {origem}")
+        if self.posicao < 0:
+            raise ValueError("Posição negativa")
+        return self.posicao
+
+    def readinto(self, buffer):
+        quantidade = min(len(buffer), self.tamanho - self.posicao)
+        if quantidade <= 0:
+            return 0
+        dados = self._ler(self.posicao, self.posicao + quantidade)
+        buffer[:len(dados)] = dados
+        self.posicao += len(dados)
+        return len(dados)
+
+    def _ler(self, inicio, fim):
+        """
+        Devolve os bytes de [inicio, fim), usando a cauda e os blocos em cache e buscando os demais.
+        """
+        if inicio >= self.inicio_cauda:
+            return self.cauda[inicio - self.inicio_cauda:fim - self.inicio_cauda]
+        partes = []
+        fim_blocos = min(fim, self.inicio_cauda)
+        primeiro, ultimo = inicio // self.tamanho_bloco, (fim_blocos - 1) // self.tamanho_bloco
+        faltantes = [indice for indice in range(primeiro, ultimo + 1) if indice not in self.blocos]
+        if faltantes:
+            # Blocos faltantes contíguos são buscados em uma única requisição
+            inicio_busca = faltantes[0] * self.tamanho_bloco
+            fim_busca = min((faltantes[-1] + 1) * self.tamanho_bloco, self.tamanho)
+            dados = self._buscar(inicio_busca, fim_busca)
+            for indice in faltantes:
+                deslocamento = indice * self.tamanho_bloco - inicio_busca
+                self.blocos[indice] = dados[deslocamento:deslocamento + self.tamanho_bloco]
+        for indice in range(primeiro, ultimo + 1):
+            self.blocos.move_to_end(indice)
+            partes.append(self.blocos[indice])
+        while len(self.blocos) > max(self.max_blocos, ultimo - primeiro + 1):
+            self.blocos.popitem(last=False)
+        deslocamento = inicio - primeiro * self.tamanho_bloco
+        dados = b''.join(partes)[deslocamento:deslocamento + fim_blocos - inicio]
+        if fim > self.inicio_cauda:
+            dados += self.cauda[:fim - self.inicio_cauda]
+        return dados
+
+    def _buscar(self, inicio, fim):
+        futuro = asyncio.run_coroutine_threadsafe(self._buscar_intervalo(inicio, fim), self.loop)
+        return futuro.result(timeout=60)
+
+    async def _buscar_intervalo(self, inicio, fim):
+        async with self.session.get(self.url, headers={'Range': f"bytes={inicio}-{fim - 1}"}, timeout=30) as response:
+            response.raise_for_status()
+            if response.status != 206:
+                raise OSError(f"O servidor não respeitou o cabeçalho Range para {self.url}")
+            dados = await response.read()
+        self.requisicoes += 1
+        self.bytes_baixados += len(dados)
+        return dados
+
+def _tamanho_content_range(valor):
+    """
+    Extrai o tamanho total de um cabeçalho Content-Range ('bytes 100-199/1000'), ou None se desconhecido.
+    """
+    if not valor or '/' not in valor:
+        return None
+    total = valor.rsplit('/', 1)[1].strip()
+    return int(total) if total.isdigit() else None
+
+# Formatos compactados, reconhecidos pela extensão do título ou pela assinatura do conteúdo.
+# Documentos do Office e afins também são ZIPs, mas não são tratados como arquivos compactados.
+EXTENSOES_COMPACTADOS = {'.zip': 'zip', '.rar': 'rar', '.7z': '7z', '.7zip': '7z'}
+EXTENSOES_NAO_COMPACTADAS = ('.docx', '.xlsx', '.pptx', '.odt', '.ods', '.odp', '.epub', '.jar')
+ASSINATURAS_COMPACTADOS = (
+    (b'PK\x03\x04', 'zip'), (b'PK\x05\x06', 'zip'),
+    (b'Rar!\x1a\x07', 'rar'), (b"7z\xbc\xaf'\x1c", '7z'),
+)
+
+# Tipos MIME identificados pela assinatura; na falta dela, o tipo é deduzido da extensão
+ASSINATURAS_MIME = (
+    (b'%PDF', 'application/pdf'),
+    (b'\x89PNG', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF8', 'image/gif'),
+    (b'II*\x00', 'image/tiff'), (b'MM\x00*', 'image/tiff'),
+    (b'Rar!\x1a\x07', 'application/vnd.rar'),
+    (b"7z\xbc\xaf'\x1c", 'application/x-7z-compressed'),
+    (b'PK\x03\x04', 'application/zip'),
+    (b'\xd0\xcf\x11\xe0', 'application/x-ole-storage'),
+)
+# Assinaturas de contêineres genéricos: a extensão, quando conhecida, é mais específica
+MIME_CONTEINERES = ('application/zip', 'application/x-ole-storage')
+MIME_DOCX = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+TIPOS_COM_TEXTO = ('application/pdf', MIME_DOCX)
+TAMANHO_MAXIMO_TEXTO = 1_000_000
+
+# Abaixo deste tamanho a razão de compressão não é verificada (arquivos pequenos comprimem muito)
+TAMANHO_MINIMO_RAZAO = 1024 * 1024
+
+def _lotes_compactados(lotes):
+    """
+    Filtra, lote a lote, as linhas da tabela de arquivos cujo título tem extensão de arquivo compactado.
+
+    Args:
+        lotes: Iterável de DataFrames da tabela de arquivos.
+
+    Yields:
+        lote: Linhas de arquivos compactados de cada lote, com o título preenchido.
+    """
+    for lote in lotes:
+        if 'titulo' not in lote.columns:
+            continue
+        lote = lote.assign(titulo=lote['titulo'].fillna(''))
+        lote = lote[lote['titulo'].str.lower().str.endswith(tuple(EXTENSOES_COMPACTADOS))]
+        if not lote.empty:
+            yield lote
+
+def formato_compactado(nome, caminho=None):
+    """
+    Identifica o formato de um arquivo compactado.
+
+    Args:
+        nome: Nome ou título do arquivo, usado pela extensão.
+        caminho: Caminho local (opcional). Se informado, o formato é identificado pela assinatura
+            dos primeiros bytes, já que os arquivos internos nem sempre têm extensão confiável.
+
+    Returns:
+        formato: 'zip', 'rar', '7z' ou None se não for um arquivo compactado.
+    """
+    extensao = os.path.splitext(nome.lower())[1]
+    if extensao in EXTENSOES_NAO_COMPACTADAS:
+        return None
+    if caminho is None:
+        return EXTENSOES_COMPACTADOS.get(extensao)
+    with open(caminho, 'rb') as f:
+        cabecalho = f.read(8)
+    for assinatura, formato in ASSINATURAS_COMPACTADOS:
+        if cabecalho.startswith(assinatura):
+            return formato
+    return None
+
+def identificar_tipo_mime(nome, caminho):
+    """
+    Identifica o tipo MIME de um arquivo pela assinatura do conteúdo e, na falta dela, pela extensão.
+    """
+    with open(caminho, 'rb') as f:
+        cabecalho = f.read(8)
+    tipo_extensao = mimetypes.guess_type(nome)[0]
+    for assinatura, tipo in ASSINATURAS_MIME:
+        if cabecalho.startswith(assinatura):
+            return tipo_extensao if tipo in MIME_CONTEINERES and tipo_extensao else tipo
+    return tipo_extensao or 'application/octet-stream'
+
+def calcular_sha256(caminho):
+    h = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        while bloco := f.read(TAMANHO_BLOCO_REMOTO):
+            h.update(bloco)
+    return h.hexdigest()
+
+def listar_conteudo_compactado(arquivo, titulo, url, config):
+    """
+    Lista os nomes dos arquivos internos de um arquivo compactado (zip, rar ou 7z/7zip).
+
+    Args:
+        arquivo: Caminho local ou objeto de arquivo posicionável (ex.: ArquivoRemoto).
+        titulo: Título do arquivo, usado para identificar o formato pela extensão.
+        url: URL de origem, usada nas mensagens de log.
+        config: Configurações do sistema.
+
+    Returns:
+        arquivos_internos: Lista com os nomes dos arquivos internos (vazia se o arquivo for inválido).
+    """
+    arquivos_internos = []
+    formato = formato_compactado(titulo)
+    if formato == 'zip':
+        try:
+            with zipfile.ZipFile(arquivo, 'r') as zip_ref:
+                arquivos_internos = zip_ref.namelist()
+        except zipfile.BadZipFile:
+            logging.error(f"Arquivo ZIP inválido: '{titulo}' (URL: {url})")
+            if config['verbose']:
+                print(f"Erro: Arquivo ZIP inválido '{titulo}'.")
+
+    elif formato == 'rar':
+        try:
+            with rarfile.RarFile(arquivo, 'r') as rar_ref:
+                arquivos_internos = rar_ref.namelist()
+        except rarfile.BadRarFile:
+            logging.error(f"Arquivo RAR inválido: '{titulo}' (URL: {url})")
+            if config['verbose']:
+                print(f"Erro: Arquivo RAR inválido '{titulo}'.")
+
+    elif formato == '7z':
+        try:
+            with py7zr.SevenZipFile(arquivo, mode='r') as seven_zip_ref:
+                arquivos_internos = seven_zip_ref.getnames()
+        except py7zr.Bad7zFile:
+            logging.error(f"Arquivo 7ZIP inválido: '{titulo}' (URL: {url})")
+            if config['verbose']:
+                print(f"Erro: Arquivo 7ZIP inválido '{titulo}'.")
+    return arquivos_internos
+
+def _entradas_compactado(referencia, formato):
+    """
+    Lista as entradas de um arquivo compactado aberto em um formato comum: nome, tamanhos, CRC e
+    se é diretório. Em ZIP e RAR a entrada guarda também o objeto de informação, usado na extração.
+    """
+    if formato == '7z':
+        return [
+            {'nome': info.filename, 'tamanho': info.uncompressed, 'tamanho_compactado': info.compressed,
+             'crc': f"{info.crc32:08x}" if info.crc32 is not None else None, 'diretorio': info.is_directory}
+            for info in referencia.list()
+        ]
+    return [
+        {'nome': info.filename, 'tamanho': info.file_size, 'tamanho_compactado': info.compress_size,
+         'crc': f"{info.CRC:08x}" if info.CRC is not None else None, 'diretorio': info.is_dir(), 'info': info}
+        for info in referencia.infolist()
+    ]
+
+def _extrair_entrada(referencia, entrada, destino):
+    """
+    Extrai uma entrada de um ZIP ou RAR para 'destino', sem confiar no tamanho declarado no cabeçalho.
+
+    Returns:
+        sucesso: False se a entrada produzir mais bytes do que o declarado (o arquivo é descartado).
+    """
+    lidos = 0
+    with referencia.open(entrada['info']) as origem, open(destino, 'wb') as f:
+        while bloco := origem.read(TAMANHO_BLOCO_REMOTO):
+            lidos += len(bloco)
+            if lidos > entrada['tamanho']:
+                break
+            f.write(bloco)
+    if lidos > entrada['tamanho']:
+        os.remove(destino)
+        return False
+    return True
+
+def _indexar_compactado(caminho, formato, arquivo_pai, prefixo, profundidade, destino, orcamento, config):
+    """
+    Extrai um arquivo compactado para um subdiretório de 'destino' e descreve cada arquivo interno,
+    descendo recursivamente nos arquivos compactados aninhados até 'profundidade_maxima_compactados'.
+
+    Proteções contra "bombas de descompressão": 'orcamento' limita o total de bytes extraídos do
+    arquivo original (somando todos os níveis), entradas com razão de compressão acima de
+    'razao_compressao_maxima' são ignoradas e nenhuma entrada pode produzir mais bytes do que declara.
+
+    Args:
+        caminho: Caminho local do arquivo compactado.
+        formato: 'zip', 'rar' ou '7z'.
+        arquivo_pai: Título ou caminho lógico do arquivo compactado.
+        prefixo: Prefixo do caminho lógico das entradas (ex.: 'anexos.zip!/').
+        profundidade: Nível de aninhamento das entradas (1 para o arquivo original).
+        destino: Diretório temporário onde as entradas são extraídas.
+        orcamento: Dicionário com os bytes ainda extraíveis ('restante').
+        config: Configurações do sistema.
+
+    Returns:
+        documentos: Lista de dicionários, um por arquivo interno. Os extraídos trazem em
+            'arquivo_local' o caminho da cópia em 'destino'.
+    """
+    diretorio = tempfile.mkdtemp(dir=destino)
+    if formato == '7z':
+        referencia = py7zr.SevenZipFile(caminho, mode='r', max_extract_size=max(orcamento['restante'], 1))
+    elif formato == 'rar':
+        referencia = rarfile.RarFile(caminho, 'r')
+    else:
+        referencia = zipfile.ZipFile(caminho, 'r')
+
+    documentos = []
+    with referencia:
+        selecionadas = []
+        for entrada in _entradas_compactado(referencia, formato):
+            if entrada['diretorio']:
+                continue
+            documento = {
+                'caminho': prefixo + entrada['nome'],
+                'arquivo_pai': arquivo_pai,
+                'nome': os.path.basename(entrada['nome'].rstrip('/')),
+                'profundidade': profundidade,
+                'tamanho': entrada['tamanho'],
+                'tamanho_compactado': entrada['tamanho_compactado'],
+                'crc': entrada['crc'],
+                'sha256': None,
+                'tipo_mime': None,
+                'situacao': 'ok',
+            }
+            documentos.append(documento)
+            razao = entrada['tamanho'] / max(entrada['tamanho_compactado'] or 0, 1)
+            if entrada['tamanho'] > orcamento['restante']:
+                documento['situacao'] = 'limite_tamanho'
+            elif entrada['tamanho_compactado'] and entrada['tamanho'] >= TAMANHO_MINIMO_RAZAO and razao > config['razao_compressao_maxima']:
+                documento['situacao'] = 'limite_razao'
+            else:
+                orcamento['restante'] -= entrada['tamanho']
+                selecionadas.append((entrada, documento))
+
+        if formato == '7z':
+            # O 7z é extraído de uma vez: em arquivos sólidos, extrair entrada por entrada repetiria a descompressão
+            try:
+                if selecionadas:
+                    referencia.extract(path=diretorio, targets=[entrada['nome'] for entrada, _ in selecionadas])
+            except Exception as e:
+                logging.warning(f"Erro ao extrair '{arquivo_pai}': {str(e)}")
+            for entrada, documento in selecionadas:
+                local = os.path.realpath(os.path.join(diretorio, entrada['nome']))
+                if local.startswith(os.path.realpath(diretorio) + os.sep) and os.path.isfile(local):
+                    documento['arquivo_local'] = local
+                else:
+                    documento['situacao'] = 'erro'
+        else:
+            # Nomes gerados evitam que entradas com '../' escrevam fora do diretório temporário
+            for indice, (entrada, documento) in enumerate(selecionadas):
+                local = os.path.join(diretorio, f"{indice:06d}")
+                try:
+                    if _extrair_entrada(referencia, entrada, local):
+                        documento['arquivo_local'] = local
+                    else:
+                        documento['situacao'] = 'limite_tamanho'
+                except Exception as e:
+                    logging.warning(f"Erro ao extrair '{documento['caminho']}' de '{arquivo_pai}': {str(e)}")
+                    documento['situacao'] = 'erro'
+
+    for documento in list(documentos):
+        local = documento.get('arquivo_local')
+        if local is None:
+            continue
+        documento['tamanho'] = os.path.getsize(local)
+        documento['sha256'] = calcular_sha256(local)
+        documento['tipo_mime'] = identificar_tipo_mime(documento['nome'], local)
+        formato_interno = formato_compactado(documento['nome'], local)
+        if formato_interno is None:
+            continue
+        if profundidade >= config['profundidade_maxima_compactados']:
+            documento['situacao'] = 'limite_profundidade'
+            continue
+        try:
+            documentos.extend(_indexar_compactado(
+                local, formato_interno, documento['caminho'], documento['caminho'] + '!/',
+                profundidade + 1, destino, orcamento, config,
+            ))
+        except Exception as e:
+            logging.warning(f"Erro ao indexar '{documento['caminho']}' de '{arquivo_pai}': {str(e)}")
+            documento['situacao'] = 'erro'
+    return documentos
+
+def indexar_conteudo_compactado(caminho, titulo, url, config, destino):
+    """
+    Descreve todos os arquivos internos de um arquivo compactado baixado, inclusive os aninhados,
+    com tamanho, CRC, SHA-256 e tipo MIME. Roda no executor de análise (threads ou processos).
+
+    Args:
+        caminho: Caminho local do arquivo compactado.
+        titulo: Título do arquivo (define o formato pela extensão, ou pela assinatura na falta dela).
+        url: URL de origem, usada nas mensagens de log.
+        config: Configurações do sistema.
+        destino: Diretório temporário onde os arquivos internos são extraídos.
+
+    Returns:
+        documentos: Lista de dicionários, um por arquivo interno (vazia se o arquivo for inválido).
+    """
+    formato = formato_compactado(titulo) or formato_compactado(titulo, caminho)
+    orcamento = {'restante': int(config['tamanho_maximo_extraido_mb'] * 1024 ** 2)}
+    try:
+        return _indexar_compactado(caminho, formato, titulo, '', 1, destino, orcamento, config)
+    except Exception as e:
+        logging.error(f"Erro ao indexar o conteúdo de '{titulo}' (URL: {url}): {str(e)}")
+        return []
+
+def extrair_texto_documento(caminho, tipo_mime):
+    """
+    Extrai o texto de um PDF (requer o pacote opcional 'pypdf') ou de um DOCX, limitado a
+    TAMANHO_MAXIMO_TEXTO caracteres. Roda no executor de análise (threads ou processos).
+
+    Returns:
+        texto: Texto extraído, ou None se o tipo não for suportado ou a extração falhar.
+    """
+    try:
+        if tipo_mime == 'application/pdf':
+            try:
+                import pypdf
+            except ImportError:
+                return None
+            partes = []
+            tamanho = 0
+            for pagina in pypdf.PdfReader(caminho).pages:
+                partes.append(pagina.extract_text() or '')
+                tamanho += len(partes[-1])
+                if tamanho >= TAMANHO_MAXIMO_TEXTO:
+                    break
+            texto = '\n'.join(partes)
+        elif tipo_mime == MIME_DOCX:
+            with zipfile.ZipFile(caminho) as docx:
+                if docx.getinfo('word/document.xml').file_size > 64 * TAMANHO_MAXIMO_TEXTO:
+                    return None
+                raiz = ElementTree.fromstring(docx.read('word/document.xml'))
+            ns = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+            texto = '\n'.join(''.join(t.text or '' for t in paragrafo.iter(ns + 't')) for paragrafo in raiz.iter(ns + 'p'))
+        else:
+            return None
+    except Exception as e:
+        logging.warning(f"Erro ao extrair o texto de '{caminho}': {str(e)}")
+        return None
+    return texto[:TAMANHO_MAXIMO_TEXTO]
+
+async def gravar_resposta(response, caminho):
+    """
+    Grava o corpo de uma resposta em disco, em blocos, sem bloquear o loop de eventos.
+
+    Returns:
+        bytes_gravados: Número de bytes gravados.
+    """
+    loop = asyncio.get_running_loop()
+    bytes_gravados = 0
+    with open(caminho, 'wb') as f:
+        async for chunk in response.content.iter_chunked(TAMANHO_BLOCO_REMOTO):
+            await loop.run_in_executor(None, f.write, chunk)
+            bytes_gravados += len(chunk)
+    return bytes_gravados
+
+async def indexar_arquivo_remoto(session, url, titulo, config, executor_local, conteudos_conhecidos, caminho_local=None):
+    """
+    Baixa um arquivo compactado por inteiro e indexa seus arquivos internos. O texto de cada conteúdo
+    (identificado pelo SHA-256) é extraído uma única vez: o mesmo edital publicado por vários órgãos,
+    ou repetido dentro do arquivo, é processado só na primeira ocorrência.
+
+    Args:
+        session: Sessão HTTP compartilhada.
+        url: URL do arquivo compactado.
+        titulo: Título do arquivo.
+        config: Configurações do sistema.
+        executor_local: Executor de threads ou processos para a extração.
+        conteudos_conhecidos: Conjunto de SHA-256 já processados; é atualizado por esta função.
+        caminho_local: Cópia do arquivo já presente no repositório de documentos (opcional); evita o download.
+
+    Returns:
+        (documentos, conteudos, bytes_baixados): Linhas das tabelas 'documentos' e 'conteudos'
+            (sem as chaves do arquivo de origem) e bytes baixados.
+    """
+    loop = asyncio.get_running_loop()
+    with tempfile.TemporaryDirectory() as diretorio:
+        if caminho_local is None:
+            caminho = os.path.join(diretorio, 'arquivo')
+            async with session.get(url, timeout=30) as response:
+                response.raise_for_status()
+                bytes_baixados = await gravar_resposta(response, caminho)
+        else:
+            caminho, bytes_baixados = caminho_local, 0
+        documentos = await loop.run_in_executor(executor_local, indexar_conteudo_compactado, caminho, titulo, url, config, diretorio)
+
+        # Conteúdos ainda não vistos; o conjunto é atualizado antes da extração para que
+        # verificações simultâneas do mesmo conteúdo não o processem duas vezes
+        novos = {}
+        for documento in documentos:
+            local = documento.pop('arquivo_local', None)
+            if local is None or documento['sha256'] in conteudos_conhecidos:
+                continue
+            conteudos_conhecidos.add(documento['sha256'])
+            novos[documento['sha256']] = (local, {'sha256': documento['sha256'], 'tamanho': documento['tamanho'], 'tipo_mime': documento['tipo_mime']})
+
+        if config['extrair_texto_documentos']:
+            candidatos = [(local, conteudo) for local, conteudo in novos.values() if conteudo['tipo_mime'] in TIPOS_COM_TEXTO]
+            textos = await asyncio.gather(*(
+                loop.run_in_executor(executor_local, extrair_texto_documento, local, conteudo['tipo_mime'])
+                for local, conteudo in candidatos
+            ))
+            for (_, conteudo), texto in zip(candidatos, textos):
+                conteudo['texto'] = texto
+
+    return documentos, [conteudo for _, conteudo in novos.values()], bytes_baixados
+
+def carregar_conteudos_conhecidos(armazenamento, config, tamanho_lote=100000):
+    """
+    Carrega os SHA-256 da tabela 'conteudos' que não precisam ser processados de novo. Com a
+    extração de texto ativa, PDFs e DOCX ainda sem texto (ex.: indexados antes) ficam de fora.
+    """
+    conhecidos = set()
+    for lote in armazenamento.iterar('conteudos', tamanho_lote):
+        pendentes = pd.Series(False, index=lote.index)
+        if config['extrair_texto_documentos'] and 'tipo_mime' in lote.columns:
+            sem_texto = lote['texto'].isna() if 'texto' in lote.columns else True
+            pendentes = lote['tipo_mime'].isin(TIPOS_COM_TEXTO) & sem_texto
+        conhecidos.update(lote.loc[~pendentes, 'sha256'])
+    return conhecidos
+
+async def listar_arquivo_remoto(session, url, titulo, config, executor_remoto=None, executor_local=None):
+    """
+    Lista o conteúdo de um arquivo compactado remoto lendo apenas os trechos necessários.
+
+    A primeira requisição pede os últimos TAMANHO_BLOCO_REMOTO bytes. Se o servidor responder 206
+    com o tamanho total, a listagem é feita sobre um ArquivoRemoto, que busca o restante sob
+    demanda. Se o servidor ignorar o Range (200), a própria resposta é gravada por inteiro em um
+    arquivo temporário, sem bloquear o loop de eventos, e a listagem roda em 'executor_local'. Uma
+    resposta 206 sem o tamanho total ('bytes a-b/*') traz só a cauda: o arquivo é pedido de novo,
+    sem Range, e só uma resposta 200 é aceita como o conteúdo completo.
+
+    A listagem remota roda em 'executor_remoto', que deve ser exclusivo desta etapa: as threads
+    ficam bloqueadas esperando as requisições Range e não podem ocupar o executor padrão do loop,
+    usado pelo aiohttp (ex.: resolução de DNS).
+
+    Args:
+        session: Sessão HTTP compartilhada.
+        url: URL do arquivo compactado.
+        titulo: Título do arquivo (define o formato pela extensão).
+        config: Configurações do sistema.
+        executor_remoto: Executor de threads para a listagem via Range (opcional).
+        executor_local: Executor de threads ou processos para a listagem dos arquivos baixados (opcional).
+
+    Returns:
+        (arquivos_internos, bytes_baixados, tamanho): Nomes internos, bytes efetivamente baixados
+            e tamanho total do arquivo (None se desconhecido).
+    """
+    loop = asyncio.get_running_loop()
+    cabecalhos = {'Range': f"bytes=-{TAMANHO_BLOCO_REMOTO}"} if config['leitura_remota_arquivos'] else {}
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        temp_file_path = None
+        cauda = None
+        async with session.get(url, timeout=30, headers=cabecalhos) as response:
+            response.raise_for_status()
+            tamanho = _tamanho_content_range(response.headers.get('Content-Range'))
+            if response.status == 206 and tamanho is not None:
+                cauda = await response.read()
+            elif response.status == 200:
+                # Servidor sem suporte a Range: baixa o arquivo completo, gravando fora do loop de eventos
+                temp_file_path = os.path.join(tmpdirname, os.path.basename(url) or 'arquivo')
+                bytes_baixados = await gravar_resposta(response, temp_file_path)
+
+        if cauda is None and temp_file_path is None:
+            # Trecho sem o tamanho total ('bytes a-b/*'): só serve o arquivo completo, pedido sem Range
+            async with session.get(url, timeout=30) as response:
+                response.raise_for_status()
+                if response.status != 200:
+                    raise aiohttp.ClientError(f"Resposta {response.status} sem o arquivo completo de {url}")
+                temp_file_path = os.path.join(tmpdirname, os.path.basename(url) or 'arquivo')
+                bytes_baixados = await gravar_resposta(response, temp_file_path)
+
+        if temp_file_path is not None:
+            arquivos_internos = await loop.run_in_executor(executor_local, listar_conteudo_compactado, temp_file_path, titulo, url, config)
+            return arquivos_internos, bytes_baixados, bytes_baixados
+
+    arquivo = ArquivoRemoto(session, url, tamanho, loop, cauda)
+    arquivos_internos = await loop.run_in_executor(executor_remoto, listar_conteudo_compactado, arquivo, titulo, url, config)
+    logging.debug("'%s' listado com %s requisições Range (%s de %s bytes).", titulo, arquivo.requisicoes, arquivo.bytes_baixados, tamanho)
+    return arquivos_internos, arquivo.bytes_baixados, tamanho
+
+async def verify_compressed_files(session, armazenamento, config, diario=None, repositorio=None):
+    """
+    Verifica a existência de arquivos compactados (zip, rar, 7z/7zip) a partir das URLs presentes na tabela de arquivos.
+    Atualiza a coluna 'verificacao_arquivos' para evitar verificações duplicadas.
+    Além disso, extrai o conteúdo dos arquivos compactados e adiciona os nomes dos arquivos internos na coluna 'titulo'.
+    Com 'indexar_documentos', cada arquivo interno (inclusive os aninhados) ganha uma linha na tabela
+    'documentos', e cada conteúdo distinto (por SHA-256) uma linha na tabela 'conteudos'.
+    As verificações são gravadas em lotes de 'tamanho_lote_gravacao' arquivos, à medida que terminam.
+
+    Args:
+        session: Sessão HTTP compartilhada.
+        armazenamento: Backend de armazenamento dos dados.
+        config: Configurações do sistema.
+        diario: Diário de execução (opcional), onde é registrado o estado de cada verificação.
+        repositorio: Repositório de documentos (opcional); arquivos já armazenados são lidos do disco.
+    """
+    # Os arquivos pendentes são lidos em lotes, duas vezes: uma para contar e outra para verificar
+    def pendentes_compactados():
+        lotes = armazenamento.iterar_pendentes('arquivos', 'verificacao_arquivos', config['tamanho_lote_gravacao'])
+        return _lotes_compactados(lotes)
+
+    try:
+        total_arquivos = sum(len(lote) for lote in pendentes_compactados())
+    except Exception as e:
+        logging.error(f"Erro ao ler a tabela de arquivos: {str(e)}")
+        return
+
+    if total_arquivos == 0:
+        logging.info("Nenhum arquivo compactado pendente para verificação.")
         if config['verbose']:
-            print("Coluna 'verificacao_arquivos' adicionada ao DataFrame de arquivos.")
-        # Salva o DataFrame atualizado para garantir que a coluna exista no CSV
+            print("Nenhum arquivo compactado pendente para verificação.")
+        return
+
+    if config['verbose']:
+        print(f"Iniciando verificação de {total_arquivos} arquivos compactados...")
+    logging.info(f"Iniciando verificação de {total_arquivos} arquivos compactados.")
+
+    bytes_baixados = 0
+    bytes_totais = 0
+
+    # A indexação precisa do conteúdo completo: os arquivos são baixados por inteiro
+    if config['indexar_documentos']:
+        conteudos_conhecidos = carregar_conteudos_conhecidos(armazenamento, config)
+        logging.info(f"{len(conteudos_conhecidos)} conteúdos já indexados serão reaproveitados.")
+        if config['extrair_texto_documentos']:
+            try:
+                import pypdf  # noqa: F401
+            except ImportError:
+                logging.warning("A extração de texto de PDFs requer o pacote 'pypdf'. Apenas o texto dos DOCX será extraído.")
+
+    # Função auxiliar para verificar e extrair conteúdo do arquivo; devolve o título atualizado
+    async def verificar_e_extrair(session, row):
+        nonlocal bytes_baixados, bytes_totais
+        url = row['url']
+        titulo = row['titulo']
         try:
-            df_arquivos.to_csv(paths['arquivos_csv'], index=False,sep='\t')
-            logging.info(f"DataFrame de arquivos salvo com a nova coluna em {paths['arquivos_csv']}.")
+            # Arquivos já presentes no repositório de documentos não são baixados de novo
+            caminho_local = None
+            if repositorio is not None:
+                armazenado = repositorio.consultar(url)
+                if armazenado is not None:
+                    caminho_local = repositorio.caminho(armazenado[0])
+
+            if config['indexar_documentos']:
+                documentos_arquivo, conteudos_arquivo, baixados = await indexar_arquivo_remoto(
+                    session, url, titulo, config, executor_local, conteudos_conhecidos, caminho_local
+                )
+                tamanho = baixados
+                arquivos_internos = [documento['caminho'] for documento in documentos_arquivo if documento['profundidade'] == 1]
+                chave_arquivo = {chave: row.get(chave, '') for chave in chaves}
+                documentos.extend({**chave_arquivo, **documento} for documento in documentos_arquivo)
+                conteudos.extend(conteudos_arquivo)
+            elif caminho_local is not None:
+                loop = asyncio.get_running_loop()
+                arquivos_internos = await loop.run_in_executor(executor_local, listar_conteudo_compactado, caminho_local, titulo, url, config)
+                baixados, tamanho = 0, os.path.getsize(caminho_local)
+            else:
+                arquivos_internos, baixados, tamanho = await listar_arquivo_remoto(session, url, titulo, config, executor_remoto, executor_local)
+            bytes_baixados += baixados
+            bytes_totais += tamanho or baixados
+
+            # Adiciona os nomes dos arquivos internos ao título
+            logging.debug("Verificação concluída para '%s'.", titulo)
+            if arquivos_internos:
+                return f"{titulo}, {','.join(arquivos_internos)}", True
+            return titulo, True
+
+        except Exception as e:
+            logging.error(f"Erro ao verificar arquivo '{titulo}' (URL: {url}): {str(e)}")
             if config['verbose']:
-                print(f"DataFrame de arquivos salvo com a nova coluna em '{paths['arquivos_csv']}'.")
+                print(f"Erro ao verificar arquivo '{titulo}'.")
+            # Mesmo em caso de erro, a verificação é marcada como concluída para evitar tentativas futuras
+            return titulo, False
+
+    # Realiza as requisições de verificação assíncronas com um pool limitado de trabalhadores
+    async def trabalhador(row):
+        if diario is not None:
+            diario.registrar('verificacao', tuple(row.get(chave, '') for chave in chaves), 'pendente', row['url'])
+        return await verificar_e_extrair(session, row)
+
+    chaves = CHAVES_TABELAS['arquivos']
+    verificados = []
+    concluidos = []
+    documentos = []
+    conteudos = []
+    total_gravados = 0
+
+    # Grava apenas as linhas verificadas de volta no armazenamento, depois dos documentos indexados
+    def descarregar():
+        nonlocal verificados, concluidos, documentos, conteudos, total_gravados
+        try:
+            with METRICAS.cronometro('duracao_gravacao_segundos', tabela='arquivos'):
+                if documentos:
+                    armazenamento.upsert('documentos', pd.DataFrame(documentos))
+                    METRICAS.incrementar('linhas_gravadas_total', len(documentos), tabela='documentos')
+                if conteudos:
+                    armazenamento.upsert('conteudos', pd.DataFrame(conteudos))
+                    METRICAS.incrementar('linhas_gravadas_total', len(conteudos), tabela='conteudos')
+                armazenamento.atualizar('arquivos', pd.DataFrame(verificados))
+                armazenamento.salvar()
+                if diario is not None:
+                    diario.concluir('verificacao', concluidos)
+            total_gravados += len(verificados)
         except Exception as e:
-            logging.error(f"Erro ao salvar {paths['arquivos_csv']} após adicionar a coluna 'verificacao_arquivos': {str(e)}")
+            logging.error(f"Erro ao salvar a verificação dos arquivos compactados: {str(e)}")
             if config['verbose']:
-                print(f"Erro ao salvar a coluna 'verificacao_arquivos' em '{paths['arquivos_csv']}'.")
-            return
+                print("Erro ao salvar a verificação dos arquivos compactados.")
+        verificados = []
+        concluidos = []
+        documentos = []
+        conteudos = []
+
+    # Etapas com concorrência própria: downloads/leituras Range e análise dos arquivos baixados
+    executor_remoto = concurrent.futures.ThreadPoolExecutor(max_workers=config['conexoes_arquivos'], thread_name_prefix='compactados')
+    if config['executor_compactados'] == 'process':
+        executor_local = concurrent.futures.ProcessPoolExecutor(max_workers=config['trabalhadores_compactados'])
+    else:
+        executor_local = concurrent.futures.ThreadPoolExecutor(max_workers=config['trabalhadores_compactados'], thread_name_prefix='analise')
+    progresso = ProgressoEtapa('verificacao', total_arquivos, config['intervalo_progresso'])
+    try:
+        pendentes = registros_de_lotes(pendentes_compactados())
+        async for row, (titulo, sucesso) in executar_em_pool(pendentes, trabalhador, config['conexoes_arquivos'], nome='verificacao'):
+            chave = tuple(row.get(chave, '') for chave in chaves)
+            verificados.append({**dict(zip(chaves, chave)), 'titulo': titulo, 'verificacao_arquivos': True})
+            progresso.avancar(falhas=int(not sucesso))
+            if sucesso:
+                concluidos.append(chave)
+            elif diario is not None:
+                diario.registrar('verificacao', chave, 'falha', row['url'])
+            if len(verificados) >= config['tamanho_lote_gravacao']:
+                descarregar()
+        if verificados:
+            descarregar()
+    finally:
+        executor_remoto.shutdown(wait=False, cancel_futures=True)
+        executor_local.shutdown(wait=True, cancel_futures=True)
+    progresso.finalizar()
+
+    logging.info(f"{total_gravados} arquivos compactados verificados e salvos no armazenamento.")
+    logging.info(f"Verificação de arquivos compactados: {bytes_baixados} bytes baixados de {bytes_totais} bytes dos arquivos.")
+    if config['verbose']:
+        print("Verificação de arquivos compactados concluída e salva no armazenamento.")
+
+# ---------------------------- Módulo de Repositório de Documentos ---------------------------- #
+
+# Sem limite total: documentos grandes podem levar minutos; só a leitura parada é interrompida
+TEMPO_LIMITE_DOWNLOAD = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=60)
+
+class RepositorioDocumentos:
+    """
+    Repositório local de documentos endereçado pelo conteúdo: cada arquivo é gravado uma única vez
+    em '<diretorio>/ab/cd/<sha256>', não importa quantas licitações ou URLs o publiquem.
+
+    Um índice SQLite ('indice.db') associa cada URL ao SHA-256 do conteúdo baixado, de modo que
+    URLs já obtidas, nesta ou em execuções anteriores (ou por outro consumidor do mesmo diretório),
+    não são baixadas de novo. Downloads interrompidos ficam em 'parciais/', com os validadores
+    da resposta, e são retomados com requisições Range na execução seguinte.
+    """
+
+    def __init__(self, diretorio):
+        self.diretorio = diretorio
+        self.diretorio_parciais = os.path.join(diretorio, 'parciais')
+        os.makedirs(self.diretorio_parciais, exist_ok=True)
+        self.conexao = sqlite3.connect(os.path.join(diretorio, 'indice.db'))
+        self.conexao.execute('PRAGMA journal_mode=WAL')
+        self.conexao.execute('PRAGMA synchronous=NORMAL')
+        self.conexao.execute('CREATE TABLE IF NOT EXISTS "urls" ("url" TEXT PRIMARY KEY, "sha256" TEXT, "tamanho" INTEGER, "armazenado_em" REAL)')
+        self.conexao.execute('CREATE INDEX IF NOT EXISTS "ix_urls_sha256" ON "urls" ("sha256")')
+        self.conexao.commit()
+        self.acertos = 0
+        self.armazenados = 0
+        self.duplicados = 0
+        self.retomados = 0
+        self.bytes_baixados = 0
+
+    def caminho(self, sha256):
+        return os.path.join(self.diretorio, sha256[:2], sha256[2:4], sha256)
+
+    def consultar(self, url):
+        """
+        Devolve (sha256, tamanho) se a URL já foi baixada e o conteúdo está no repositório, ou None.
+        """
+        linha = self.conexao.execute('SELECT "sha256", "tamanho" FROM "urls" WHERE "url" = ?', (url,)).fetchone()
+        if linha is None or not os.path.exists(self.caminho(linha[0])):
+            return None
+        return linha
+
+    def caminhos_parciais(self, url):
+        base = os.path.join(self.diretorio_parciais, hashlib.sha1(url.encode('utf-8')).hexdigest())
+        return base + '.partial', base + '.json'
+
+    def retomada(self, url):
+        """
+        Devolve a posição a partir da qual o download da URL pode continuar e os cabeçalhos da
+        requisição. Sem um validador ('ETag' ou 'Last-Modified') o download recomeça do zero,
+        já que não haveria como garantir que o restante pertence ao mesmo conteúdo.
+        """
+        parcial, metadados = self.caminhos_parciais(url)
+        if not (os.path.exists(parcial) and os.path.exists(metadados)):
+            return 0, {}
+        with open(metadados, encoding='utf-8') as f:
+            validadores = json.load(f)
+        validador = validadores.get('etag') or validadores.get('last_modified')
+        inicio = os.path.getsize(parcial)
+        if not validador or not inicio:
+            return 0, {}
+        return inicio, {'Range': f"bytes={inicio}-", 'If-Range': validador}
+
+    def gravar_validadores(self, url, cabecalhos):
+        _, metadados = self.caminhos_parciais(url)
+        with open(metadados, 'w', encoding='utf-8') as f:
+            json.dump({'etag': cabecalhos.get('ETag'), 'last_modified': cabecalhos.get('Last-Modified')}, f)
+
+    def descartar_parcial(self, url):
+        for caminho in self.caminhos_parciais(url):
+            if os.path.exists(caminho):
+                os.remove(caminho)
+
+    def armazenar(self, url, sha256, tamanho):
+        """
+        Move o download concluído da URL para o seu endereço no repositório e registra a URL no índice.
+        Se o conteúdo já existir (publicado por outra URL), a cópia recém-baixada é descartada.
+        """
+        parcial, metadados = self.caminhos_parciais(url)
+        destino = self.caminho(sha256)
+        if os.path.exists(destino):
+            os.remove(parcial)
+            self.duplicados += 1
+        else:
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            os.replace(parcial, destino)
+            self.armazenados += 1
+        if os.path.exists(metadados):
+            os.remove(metadados)
+        with self.conexao:
+            self.conexao.execute(
+                'INSERT INTO "urls" ("url", "sha256", "tamanho", "armazenado_em") VALUES (?, ?, ?, ?) '
+                'ON CONFLICT ("url") DO UPDATE SET "sha256" = excluded."sha256", "tamanho" = excluded."tamanho", '
+                '"armazenado_em" = excluded."armazenado_em"',
+                (url, sha256, tamanho, time.time()),
+            )
+        return destino
+
+    def fechar(self):
+        self.conexao.close()
+
+def criar_repositorio(config, paths):
+    """
+    Cria o repositório de documentos configurado.
+
+    Args:
+        config: Configurações do sistema.
+        paths: Dicionário com os caminhos dos arquivos.
+
+    Returns:
+        repositorio: Instância de RepositorioDocumentos, ou None se o download de documentos estiver desativado.
+    """
+    if not config['baixar_documentos']:
+        return None
+    diretorio = config['diretorio_documentos'] or paths['documentos_directory']
+    logging.info(f"Repositório de documentos em {diretorio}.")
+    return RepositorioDocumentos(diretorio)
+
+def _inicio_content_range(valor):
+    """
+    Extrai a posição inicial do cabeçalho 'Content-Range' (ex.: 'bytes 100-199/1000' -> 100).
+    """
+    try:
+        return int(valor.split()[1].split('-')[0])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+def _resumo_parcial(caminho):
+    resumo = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        while bloco := f.read(TAMANHO_BLOCO_REMOTO):
+            resumo.update(bloco)
+    return resumo
+
+def _gravar_bloco(arquivo, resumo, bloco):
+    arquivo.write(bloco)
+    resumo.update(bloco)
+
+async def baixar_documento(session, url, repositorio):
+    """
+    Baixa um documento para o repositório, calculando o SHA-256 durante o download. Um download
+    parcial de uma execução anterior é retomado com 'Range' e 'If-Range'; se o servidor devolver o
+    arquivo inteiro (200), o parcial é descartado e o download recomeça.
 
-    # Garantir que a coluna 'verificacao_arquivos' seja do tipo booleano
-    df_arquivos['verificacao_arquivos'] = df_arquivos['verificacao_arquivos'].fillna(False).astype(bool)
+    Args:
+        session: Sessão HTTP compartilhada.
+        url: URL do documento.
+        repositorio: Repositório de documentos.
 
-    # Filtra os arquivos que possuem títulos com extensões zip, rar ou 7zip e que ainda não foram verificados
-    extensoes_compactadas = ('.zip', '.rar', '.7zip')
-    mask = df_arquivos['titulo'].str.lower().str.endswith(extensoes_compactadas) & (~df_arquivos['verificacao_arquivos'])
-    arquivos_para_verificar = df_arquivos[mask]
+    Returns:
+        (sha256, tamanho, bytes_baixados): Hash e tamanho do conteúdo e bytes efetivamente baixados.
+    """
+    armazenado = repositorio.consultar(url)
+    if armazenado is not None:
+        repositorio.acertos += 1
+        return armazenado[0], armazenado[1], 0
 
-    total_arquivos = len(arquivos_para_verificar)
-    if total_arquivos == 0:
-        logging.info("Nenhum arquivo compactado pendente para verificação.")
+    loop = asyncio.get_running_loop()
+    parcial, _ = repositorio.caminhos_parciais(url)
+    for _ in range(2):
+        inicio, cabecalhos = repositorio.retomada(url)
+        async with session.get(url, timeout=TEMPO_LIMITE_DOWNLOAD, headers=cabecalhos) as response:
+            # O parcial não corresponde mais ao arquivo remoto: recomeça do zero
+            if response.status == 416 and inicio:
+                repositorio.descartar_parcial(url)
+                continue
+            response.raise_for_status()
+            if inicio and response.status == 206:
+                # Nem todo servidor respeita o 'If-Range': o validador e a posição são conferidos aqui
+                validador = response.headers.get('ETag') or response.headers.get('Last-Modified')
+                if validador != cabecalhos['If-Range'] or _inicio_content_range(response.headers.get('Content-Range')) != inicio:
+                    repositorio.descartar_parcial(url)
+                    continue
+                resumo = await loop.run_in_executor(None, _resumo_parcial, parcial)
+                modo = 'ab'
+                repositorio.retomados += 1
+            else:
+                inicio = 0
+                resumo = hashlib.sha256()
+                modo = 'wb'
+                repositorio.gravar_validadores(url, response.headers)
+
+            tamanho = inicio
+            with open(parcial, modo) as f:
+                async for chunk in response.content.iter_chunked(TAMANHO_BLOCO_REMOTO):
+                    await loop.run_in_executor(None, _gravar_bloco, f, resumo, chunk)
+                    tamanho += len(chunk)
+                    repositorio.bytes_baixados += len(chunk)
+        break
+    else:
+        raise aiohttp.ClientError(f"Não foi possível retomar o download de {url}")
+
+    sha256 = resumo.hexdigest()
+    repositorio.armazenar(url, sha256, tamanho)
+    return sha256, tamanho, tamanho - inicio
+
+async def baixar_documentos(session, armazenamento, repositorio, config, diario=None):
+    """
+    Baixa para o repositório local os documentos da tabela de arquivos ainda não armazenados e
+    grava de volta o SHA-256 ('sha256') e o tamanho ('tamanho_bytes') de cada um, marcando a coluna
+    'documento_armazenado'. Documentos com falha continuam pendentes e, se o download foi
+    interrompido no meio, são retomados na próxima execução.
+
+    Args:
+        session: Sessão HTTP compartilhada.
+        armazenamento: Backend de armazenamento dos dados.
+        repositorio: Repositório de documentos.
+        config: Configurações do sistema.
+        diario: Diário de execução (opcional), onde é registrado o estado de cada download.
+    """
+    total = armazenamento.contar_pendentes('arquivos', 'documento_armazenado')
+    if not total:
+        logging.info("Nenhum documento pendente de download.")
         if config['verbose']:
-            print("Nenhum arquivo compactado pendente para verificação.")
+            print("Nenhum documento pendente de download.")
         return
 
     if config['verbose']:
-        print(f"Iniciando verificação de {total_arquivos} arquivos compactados...")
-    logging.info(f"Iniciando verificação de {total_arquivos} arquivos compactados.")
+        print(f"Iniciando download de {total} documentos...")
+    logging.info(f"Iniciando download de {total} documentos para o repositório local.")
 
-    # Função auxiliar para verificar e extrair conteúdo do arquivo
-    async def verificar_e_extrair(session, index, row):
-        url = row['url']
-        numero_controle_pncp = row.get('numero_controle_pncp', 'N/A')  # Supondo que exista essa coluna
-        titulo = row['titulo']
+    chaves = CHAVES_TABELAS['arquivos']
+    downloads = {}
+
+    # Linhas com a mesma URL compartilham um único download
+    def obter(url):
+        tarefa = downloads.get(url)
+        if tarefa is None:
+            tarefa = downloads[url] = asyncio.ensure_future(baixar_documento(session, url, repositorio))
+            tarefa.add_done_callback(lambda _: downloads.pop(url, None))
+        return tarefa
+
+    async def trabalhador(row):
+        chave = tuple(row[chave] for chave in chaves)
+        if diario is not None:
+            diario.registrar('documentos', chave, 'pendente', row['url'])
         try:
-            async with session.get(url, timeout=30) as response:
-                response.raise_for_status()
-                # Cria um diretório temporário para armazenar o arquivo baixado
-                with tempfile.TemporaryDirectory() as tmpdirname:
-                    temp_file_path = os.path.join(tmpdirname, os.path.basename(url))
-                    with open(temp_file_path, 'wb') as f:
-                        while True:
-                            chunk = await response.content.read(1024)
-                            if not chunk:
-                                break
-                            f.write(chunk)
-                    
-                    # Lista para armazenar os nomes dos arquivos internos
-                    arquivos_internos = []
-
-                    # Identifica a extensão do arquivo e extrai os nomes dos arquivos internos
-                    if titulo.lower().endswith('.zip'):
-                        try:
-                            with zipfile.ZipFile(temp_file_path, 'r') as zip_ref:
-                                arquivos_internos = zip_ref.namelist()
-                        except zipfile.BadZipFile:
-                            logging.error(f"Arquivo ZIP inválido: '{titulo}' (URL: {url})")
-                            if config['verbose']:
-                                print(f"Erro: Arquivo ZIP inválido '{titulo}'.")
-                    
-                    elif titulo.lower().endswith('.rar'):
-                        try:
-                            with rarfile.RarFile(temp_file_path, 'r') as rar_ref:
-                                arquivos_internos = rar_ref.namelist()
-                        except rarfile.BadRarFile:
-                            logging.error(f"Arquivo RAR inválido: '{titulo}' (URL: {url})")
-                            if config['verbose']:
-                                print(f"Erro: Arquivo RAR inválido '{titulo}'.")
-                    
-                    elif titulo.lower().endswith('.7zip'):
-                        try:
-                            with py7zr.SevenZipFile(temp_file_path, mode='r') as seven_zip_ref:
-                                arquivos_internos = seven_zip_ref.getnames()
-                        except py7zr.Bad7zFile:
-                            logging.error(f"Arquivo 7ZIP inválido: '{titulo}' (URL: {url})")
-                            if config['verbose']:
-                                print(f"Erro: Arquivo 7ZIP inválido '{titulo}'.")
-    
-                    # Adiciona os nomes dos arquivos internos ao título
-                    if arquivos_internos:
-                        arquivos_str = ','.join(arquivos_internos)
-                        df_arquivos.at[index, 'titulo'] = f"{titulo}, {arquivos_str}"
-                        logging.info(f"Conteúdo de '{titulo}' adicionado ao DataFrame.")
-                        if config['verbose']:
-                            print(f"[{index + 1}/{total_arquivos}] Conteúdo de '{titulo}' adicionado.")
-                    
-                    # Marca a verificação como concluída
-                    df_arquivos.at[index, 'verificacao_arquivos'] = True
-                    logging.info(f"Verificação concluída para '{titulo}'.")
-                    if config['verbose']:
-                        print(f"[{index + 1}/{total_arquivos}] Verificação concluída para '{titulo}'.")
-        
+            return await obter(row['url'])
         except Exception as e:
-            logging.error(f"Erro ao verificar arquivo '{titulo}' (URL: {url}): {str(e)}")
-            if config['verbose']:
-                print(f"[{index + 1}/{total_arquivos}] Erro ao verificar arquivo '{titulo}'.")
-            # Mesmo em caso de erro, marca a verificação como True para evitar tentativas futuras
-            df_arquivos.at[index, 'verificacao_arquivos'] = True
-
-    # Realiza as requisições de verificação assíncronas
-    semaphore = asyncio.Semaphore(config['numero_maximo_conexoes'])
-    async with aiohttp.ClientSession() as session:
-        tasks = []
-        for idx, row in arquivos_para_verificar.iterrows():
-            task = asyncio.create_task(verificar_e_extrair(session, idx, row))
-            tasks.append(task)
-
-        # Executa as tarefas com controle de semáforo
-        await asyncio.gather(*tasks)
-
-    # Salva o DataFrame atualizado de volta para o CSV
+            logging.error(f"Erro ao baixar o documento '{row.get('titulo', '')}' (URL: {row['url']}): {str(e)}")
+            return None
+
+    armazenados = []
+    concluidos = []
+    total_gravados = 0
+
+    def descarregar():
+        nonlocal armazenados, concluidos, total_gravados
+        try:
+            with METRICAS.cronometro('duracao_gravacao_segundos', tabela='arquivos'):
+                armazenamento.atualizar('arquivos', pd.DataFrame(armazenados))
+                armazenamento.salvar()
+                if diario is not None:
+                    diario.concluir('documentos', concluidos)
+            total_gravados += len(armazenados)
+        except Exception as e:
+            logging.error(f"Erro ao salvar os documentos armazenados: {str(e)}")
+        armazenados = []
+        concluidos = []
+
+    pendentes = registros_de_lotes(armazenamento.iterar_pendentes('arquivos', 'documento_armazenado', config['tamanho_lote_gravacao']))
+    progresso = ProgressoEtapa('documentos', total, config['intervalo_progresso'])
+    async for row, resultado in executar_em_pool(pendentes, trabalhador, config['conexoes_arquivos'], nome='documentos'):
+        chave = tuple(row[chave] for chave in chaves)
+        progresso.avancar(falhas=int(resultado is None))
+        if resultado is None:
+            if diario is not None:
+                diario.registrar('documentos', chave, 'falha', row['url'])
+            continue
+        sha256, tamanho, _ = resultado
+        armazenados.append({**dict(zip(chaves, chave)), 'sha256': sha256, 'tamanho_bytes': tamanho, 'documento_armazenado': True})
+        concluidos.append(chave)
+        logging.debug("Documento armazenado: %s (%s bytes).", sha256, tamanho)
+        if len(armazenados) >= config['tamanho_lote_gravacao']:
+            descarregar()
+    if armazenados:
+        descarregar()
+    progresso.finalizar()
+
+    logging.info(f"{total_gravados} documentos armazenados de {total} pendentes: {repositorio.armazenados} novos, "
+                 f"{repositorio.duplicados} com conteúdo repetido, {repositorio.acertos} já presentes, "
+                 f"{repositorio.retomados} retomados, {repositorio.bytes_baixados} bytes baixados.")
+    if config['verbose']:
+        print(f"Download de documentos concluído: {total_gravados} documentos armazenados.")
+
+# ---------------------------- Módulo de Índice de Busca ---------------------------- #
+
+# Campos de cada tabela levados ao índice: 'titulo' (o primeiro preenchido é exibido nos
+# resultados), 'texto' (concatenados no texto pesquisável) e 'valor' (usado no filtro de valores)
+CAMPOS_BUSCA = {
+    'licitacoes': {
+        'tipo': 'licitacao',
+        'titulo': ('title', 'description'),
+        'texto': ('title', 'description', 'orgao_nome', 'unidade_nome', 'municipio_nome', 'modalidade_licitacao_nome', 'situacao_nome'),
+        'valor': 'valor_global',
+    },
+    'itens': {
+        'tipo': 'item',
+        'titulo': ('descricao',),
+        'texto': ('descricao', 'informacaoComplementar', 'materialOuServicoNome', 'itemCategoriaNome'),
+        'valor': 'valorTotal',
+    },
+    'arquivos': {
+        'tipo': 'arquivo',
+        'titulo': ('titulo',),
+        'texto': ('titulo', 'tipoDocumentoNome'),
+        'valor': None,
+    },
+    'documentos': {
+        'tipo': 'documento',
+        'titulo': ('caminho',),
+        'texto': ('caminho',),
+        'valor': None,
+    },
+    'conteudos': {
+        'tipo': 'conteudo',
+        'titulo': ('sha256',),
+        'texto': ('texto',),
+        'valor': None,
+    },
+}
+
+class IndiceBusca:
+    """
+    Índice de busca textual local em SQLite FTS5 sobre licitações, itens, arquivos e documentos.
+
+    A tabela 'registros' guarda, para cada linha indexada, os campos usados nos filtros (órgão, UF,
+    data de publicação e valor); a tabela virtual 'busca' guarda o texto pesquisável, com acentos
+    e maiúsculas ignorados. Itens, arquivos e documentos herdam os filtros da licitação a que
+    pertencem, e os textos extraídos dos documentos (tabela 'conteudos', um por SHA-256) levam aos
+    documentos que têm aquele conteúdo.
+    """
+
+    def __init__(self, caminho_banco):
+        self.conexao = sqlite3.connect(caminho_banco)
+        self.conexao.execute('PRAGMA journal_mode=WAL')
+        self.conexao.execute('PRAGMA synchronous=NORMAL')
+        self.conexao.execute(
+            'CREATE TABLE IF NOT EXISTS "registros" ("id" INTEGER PRIMARY KEY, "tipo" TEXT NOT NULL, "chave" TEXT NOT NULL, '
+            '"numero_controle_pncp" TEXT, "orgao_cnpj" TEXT, "orgao_nome" TEXT, "uf" TEXT, "data_publicacao" TEXT, '
+            '"valor" REAL, "sha256" TEXT, "titulo" TEXT, UNIQUE ("tipo", "chave"))'
+        )
+        self.conexao.execute('CREATE INDEX IF NOT EXISTS "ix_registros_licitacao" ON "registros" ("numero_controle_pncp")')
+        self.conexao.execute('CREATE INDEX IF NOT EXISTS "ix_registros_sha256" ON "registros" ("sha256")')
+        self.conexao.execute("CREATE VIRTUAL TABLE IF NOT EXISTS \"busca\" USING fts5(\"titulo\", \"texto\", tokenize='unicode61 remove_diacritics 2')")
+        self.conexao.execute('CREATE TABLE IF NOT EXISTS "estado" ("chave" TEXT PRIMARY KEY, "valor" TEXT)')
+        self.conexao.commit()
+
+    def ler_marca(self):
+        linha = self.conexao.execute('SELECT "valor" FROM "estado" WHERE "chave" = \'marca_alteracao\'').fetchone()
+        return linha[0] if linha else None
+
+    def gravar_marca(self, marca):
+        with self.conexao:
+            self.conexao.execute('INSERT INTO "estado" ("chave", "valor") VALUES (\'marca_alteracao\', ?) '
+                                 'ON CONFLICT ("chave") DO UPDATE SET "valor" = excluded."valor"', (marca,))
+
+    def indexar(self, tabela, lote):
+        """
+        Insere ou substitui no índice as linhas de um lote da tabela.
+
+        Returns:
+            quantidade: Número de linhas indexadas.
+        """
+        campos = CAMPOS_BUSCA[tabela]
+        chaves = CHAVES_TABELAS[tabela]
+        if lote.empty or any(chave not in lote.columns for chave in chaves):
+            return 0
+        lote = lote.astype(object).where(lote.notna(), None)
+
+        def coluna(nome):
+            return lote[nome] if nome in lote.columns else pd.Series([None] * len(lote), index=lote.index, dtype=object)
+
+        titulos = coluna(None)
+        for nome in campos['titulo']:
+            titulos = titulos.fillna(coluna(nome))
+        textos = [' '.join(str(valor) for valor in linha if valor) for linha in zip(*(coluna(nome) for nome in campos['texto']))]
+        valores = pd.to_numeric(coluna(campos['valor']), errors='coerce') if campos['valor'] else pd.Series(float('nan'), index=lote.index)
+        registros = [
+            (campos['tipo'], '|'.join(str(valor) for valor in chave), licitacao, orgao_cnpj, orgao_nome, uf,
+             data[:10] if data else None, None if pd.isna(valor) else float(valor), sha256, titulo)
+            for chave, licitacao, orgao_cnpj, orgao_nome, uf, data, valor, sha256, titulo in zip(
+                zip(*(lote[chave] for chave in chaves)), coluna('numero_controle_pncp'), coluna('orgao_cnpj'),
+                coluna('orgao_nome'), coluna('uf'), coluna('data_publicacao_pncp'), valores, coluna('sha256'), titulos,
+            )
+        ]
+
+        with self.conexao:
+            # O texto antigo sai do índice antes que o registro seja atualizado
+            self.conexao.executemany(
+                'DELETE FROM "busca" WHERE rowid IN (SELECT "id" FROM "registros" WHERE "tipo" = ? AND "chave" = ?)',
+                ((registro[0], registro[1]) for registro in registros),
+            )
+            self.conexao.executemany(
+                'INSERT INTO "registros" ("tipo", "chave", "numero_controle_pncp", "orgao_cnpj", "orgao_nome", "uf", '
+                '"data_publicacao", "valor", "sha256", "titulo") VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT ("tipo", "chave") DO UPDATE SET "numero_controle_pncp" = excluded."numero_controle_pncp", '
+                '"orgao_cnpj" = excluded."orgao_cnpj", "orgao_nome" = excluded."orgao_nome", "uf" = excluded."uf", '
+                '"data_publicacao" = excluded."data_publicacao", "valor" = excluded."valor", "sha256" = excluded."sha256", '
+                '"titulo" = excluded."titulo"',
+                registros,
+            )
+            self.conexao.executemany(
+                'INSERT INTO "busca" (rowid, "titulo", "texto") SELECT "id", ?, ? FROM "registros" WHERE "tipo" = ? AND "chave" = ?',
+                ((registro[9], texto, registro[0], registro[1]) for registro, texto in zip(registros, textos)),
+            )
+        return len(registros)
+
+    @staticmethod
+    def expressao(consulta):
+        """
+        Converte a consulta do usuário em uma expressão FTS5: cada termo é pesquisado literalmente
+        (todos precisam aparecer) e um '*' no fim do termo o transforma em prefixo.
+        """
+        termos = []
+        for termo in consulta.split():
+            prefixo = termo.endswith('*')
+            termo = termo.rstrip('*')
+            if termo:
+                termos.append('"' + termo.replace('"', '""') + '"' + ('*' if prefixo else ''))
+        return ' '.join(termos)
+
+    def buscar(self, consulta, orgao=None, uf=None, data_inicio=None, data_fim=None, valor_minimo=None, valor_maximo=None, tipos=None, limite=20):
+        """
+        Pesquisa o índice.
+
+        Args:
+            consulta: Termos pesquisados.
+            orgao: CNPJ (só dígitos) ou parte do nome do órgão (opcional).
+            uf: Sigla da UF (opcional).
+            data_inicio: Data mínima de publicação da licitação, 'AAAA-MM-DD' (opcional).
+            data_fim: Data máxima de publicação da licitação, 'AAAA-MM-DD' (opcional).
+            valor_minimo: Valor mínimo do item ou, na falta dele, da licitação (opcional).
+            valor_maximo: Valor máximo do item ou, na falta dele, da licitação (opcional).
+            tipos: Tipos de registro aceitos ('licitacao', 'item', 'arquivo', 'documento') (opcional).
+            limite: Número máximo de resultados.
+
+        Returns:
+            resultados: DataFrame ordenado por relevância, com um trecho do texto encontrado.
+        """
+        filtros = []
+        parametros = [self.expressao(consulta)]
+        if orgao:
+            if orgao.isdigit():
+                filtros.append('l."orgao_cnpj" = ?')
+                parametros.append(orgao)
+            else:
+                filtros.append('l."orgao_nome" LIKE ?')
+                parametros.append(f"%{orgao}%")
+        if uf:
+            filtros.append('l."uf" = ?')
+            parametros.append(uf.upper())
+        if data_inicio:
+            filtros.append('l."data_publicacao" >= ?')
+            parametros.append(data_inicio)
+        if data_fim:
+            filtros.append('l."data_publicacao" <= ?')
+            parametros.append(data_fim)
+        if valor_minimo is not None:
+            filtros.append('COALESCE(a."valor", l."valor") >= ?')
+            parametros.append(valor_minimo)
+        if valor_maximo is not None:
+            filtros.append('COALESCE(a."valor", l."valor") <= ?')
+            parametros.append(valor_maximo)
+        if tipos:
+            filtros.append(f'a."tipo" IN ({", ".join("?" for _ in tipos)})')
+            parametros.extend(tipos)
+        parametros.append(limite)
+
+        # Os conteúdos encontrados são trocados pelos documentos que os contêm
+        consulta_sql = (
+            'WITH "encontrados" AS (SELECT rowid AS "id", "rank", snippet("busca", -1, \'[\', \']\', \'…\', 12) AS "trecho" '
+            'FROM "busca" WHERE "busca" MATCH ?), '
+            '"alvos" AS ('
+            'SELECT r.*, e."rank", e."trecho" FROM "encontrados" e JOIN "registros" r ON r."id" = e."id" WHERE r."tipo" != \'conteudo\' '
+            'UNION ALL '
+            'SELECT d.*, e."rank", e."trecho" FROM "encontrados" e JOIN "registros" c ON c."id" = e."id" AND c."tipo" = \'conteudo\' '
+            'JOIN "registros" d ON d."tipo" = \'documento\' AND d."sha256" = c."chave") '
+            'SELECT a."tipo", a."chave", a."numero_controle_pncp", l."orgao_nome", l."uf", l."data_publicacao", '
+            'COALESCE(a."valor", l."valor") AS "valor", a."titulo", a."trecho" '
+            'FROM "alvos" a LEFT JOIN "registros" l ON l."tipo" = \'licitacao\' AND l."chave" = a."numero_controle_pncp" '
+            + ('WHERE ' + ' AND '.join(filtros) + ' ' if filtros else '')
+            + 'ORDER BY a."rank" LIMIT ?'
+        )
+        return pd.read_sql_query(consulta_sql, self.conexao, params=parametros)
+
+    def fechar(self):
+        self.conexao.close()
+
+def atualizar_indice_busca(armazenamento, caminho_indice, config):
+    """
+    Leva ao índice de busca as linhas inseridas ou alteradas desde a última atualização. Na
+    primeira execução (ou se o índice for apagado), todas as linhas são indexadas.
+
+    Args:
+        armazenamento: Backend de armazenamento dos dados.
+        caminho_indice: Caminho do banco do índice de busca.
+        config: Configurações do sistema.
+
+    Returns:
+        totais: Dicionário com o número de linhas indexadas por tabela.
+    """
+    indice = IndiceBusca(caminho_indice)
+    desde = indice.ler_marca()
+    # A marca é tirada antes da leitura: o que mudar durante a indexação entra na próxima
+    nova_marca = marca_alteracao()
+    totais = {}
     try:
-        df_arquivos.to_csv(paths['arquivos_csv'], index=False,sep='\t')
-        logging.info(f"DataFrame de arquivos atualizado salvo em {paths['arquivos_csv']}.")
-        if config['verbose']:
-            print(f"Verificação de arquivos compactados concluída e salva em '{paths['arquivos_csv']}'.")
+        for tabela in CAMPOS_BUSCA:
+            totais[tabela] = 0
+            for lote in armazenamento.iterar_alterados(tabela, desde, config['tamanho_lote_gravacao']):
+                totais[tabela] += indice.indexar(tabela, lote)
+            logging.info(f"Índice de busca: {totais[tabela]} linhas de '{tabela}' indexadas.")
+        indice.gravar_marca(nova_marca)
     except Exception as e:
-        logging.error(f"Erro ao salvar {paths['arquivos_csv']}: {str(e)}")
-        if config['verbose']:
-            print(f"Erro ao salvar a verificação dos arquivos compactados em '{paths['arquivos_csv']}'.")
+        logging.error(f"Erro ao atualizar o índice de busca: {str(e)}")
+    finally:
+        indice.fechar()
+    return totais
+
+def imprimir_resultados_busca(resultados):
+    """
+    Exibe os resultados de uma busca no console.
+    """
+    if resultados.empty:
+        print("Nenhum resultado encontrado.")
+        return
+    for linha in resultados.itertuples(index=False):
+        valor = f"R$ {linha.valor:,.2f}" if pd.notna(linha.valor) else '-'
+        print(f"[{linha.tipo}] {linha.numero_controle_pncp or linha.chave} | {linha.orgao_nome or '-'} | {linha.uf or '-'} | "
+              f"{linha.data_publicacao or '-'} | {valor}")
+        print(f"    {linha.titulo}")
+        print(f"    {linha.trecho}")
+
+# ---------------------------- Módulo de Execução Distribuída ---------------------------- #
+
+# Estados de um trabalho na fila: 'em_andamento' com prazo vencido volta a ser arrendável
+ESTADOS_FILA = ('pendente', 'em_andamento', 'concluido', 'falha')
+
+# Campos de cada registro guardados na carga dos trabalhos de detalhes
+CAMPOS_TRABALHOS = {
+    'itens': ['numero_controle_pncp', 'orgao_cnpj', 'ano', 'numero_sequencial'],
+    'arquivos': ['numero_controle_pncp', 'orgao_cnpj', 'ano', 'numero_sequencial'],
+    'resultados': ['numero_controle_pncp', 'orgao_cnpj', 'ano', 'numero_sequencial', 'numeroItem',
+                   'temResultado', 'situacaoCompraItem', COLUNA_VERIFICACOES],
+}
+
+# Tabela e coluna de controle marcadas por cada etapa de detalhes
+CONTROLE_ETAPAS = {
+    'itens': ('licitacoes', 'detalhes_baixados'),
+    'arquivos': ('licitacoes', 'documentos_baixados'),
+    'resultados': ('itens', 'Resultados verificados'),
+}
+
+# Tempo máximo, em segundos, que um trabalhador espera o coordenador abrir uma rodada
+ESPERA_MAXIMA_RODADA = 60
+
+class FilaTrabalhos:
+    """
+    Fila durável de trabalhos em SQLite, compartilhada pelo coordenador e pelos trabalhadores, que
+    podem rodar em processos ou máquinas diferentes desde que enxerguem o mesmo sistema de arquivos.
+
+    Cada execução do coordenador é uma rodada. Um trabalhador arrenda trabalhos por um prazo e o
+    renova periodicamente (heartbeat) enquanto os processa; se ele morrer, o prazo vence e os
+    trabalhos voltam a ser entregues a outro trabalhador. Um trabalho que esgota as tentativas fica
+    com o estado 'falha'.
+    """
+
+    def __init__(self, caminho_banco, tentativas_maximas=3, wal=True):
+        self.tentativas_maximas = tentativas_maximas
+        # Sem transações implícitas: o arrendamento abre a sua com BEGIN IMMEDIATE
+        self.conexao = sqlite3.connect(caminho_banco, timeout=TEMPO_ESPERA_TRAVA, isolation_level=None)
+        self.conexao.execute(f"PRAGMA journal_mode={'WAL' if wal else 'DELETE'}")
+        self.conexao.execute('PRAGMA synchronous=NORMAL')
+        self.conexao.execute('CREATE TABLE IF NOT EXISTS "rodadas" ("id" INTEGER PRIMARY KEY AUTOINCREMENT, "inicio" TEXT, "fim" TEXT)')
+        self.conexao.execute('CREATE TABLE IF NOT EXISTS "trabalhos" ("id" INTEGER PRIMARY KEY AUTOINCREMENT, "rodada" INTEGER, '
+                             '"etapa" TEXT, "chave" TEXT, "carga" TEXT, "estado" TEXT, "tentativas" INTEGER DEFAULT 0, '
+                             '"trabalhador" TEXT, "prazo" REAL, "atualizado_em" REAL, UNIQUE ("rodada", "etapa", "chave"))')
+        self.conexao.execute('CREATE INDEX IF NOT EXISTS "ix_trabalhos_estado" ON "trabalhos" ("rodada", "estado", "id")')
+
+    def abrir_rodada(self):
+        """
+        Retoma a rodada aberta mais recente ou começa uma nova.
+
+        Returns:
+            (rodada, retomada): Identificador da rodada e se ela foi retomada.
+        """
+        linha = self.conexao.execute('SELECT "id" FROM "rodadas" WHERE "fim" IS NULL ORDER BY "id" DESC LIMIT 1').fetchone()
+        if linha is not None:
+            return linha[0], True
+        cursor = self.conexao.execute('INSERT INTO "rodadas" ("inicio") VALUES (?)', (time.strftime('%Y-%m-%dT%H:%M:%S'),))
+        return cursor.lastrowid, False
+
+    def rodada_aberta(self):
+        linha = self.conexao.execute('SELECT "id" FROM "rodadas" WHERE "fim" IS NULL ORDER BY "id" DESC LIMIT 1').fetchone()
+        return linha[0] if linha else None
+
+    def encerrar(self, rodada):
+        self.conexao.execute('UPDATE "rodadas" SET "fim" = ? WHERE "id" = ?', (time.strftime('%Y-%m-%dT%H:%M:%S'), rodada))
+
+    def enfileirar(self, rodada, etapa, trabalhos):
+        """
+        Acrescenta trabalhos à fila; um trabalho com a mesma chave na rodada é ignorado.
+
+        Args:
+            rodada: Identificador da rodada.
+            etapa: Etapa dos trabalhos ('licitacoes', 'itens', 'arquivos' ou 'resultados').
+            trabalhos: Iterável de tuplas (chave, carga), com a carga serializável em JSON.
+
+        Returns:
+            total: Número de trabalhos efetivamente enfileirados.
+        """
+        agora = time.time()
+        antes = self.conexao.total_changes
+        self.conexao.execute('BEGIN IMMEDIATE')
+        try:
+            self.conexao.executemany(
+                'INSERT OR IGNORE INTO "trabalhos" ("rodada", "etapa", "chave", "carga", "estado", "atualizado_em") VALUES (?, ?, ?, ?, \'pendente\', ?)',
+                ((rodada, etapa, chave, json.dumps(carga), agora) for chave, carga in trabalhos),
+            )
+            self.conexao.execute('COMMIT')
+        except BaseException:
+            self.conexao.execute('ROLLBACK')
+            raise
+        return self.conexao.total_changes - antes
+
+    def arrendar(self, rodada, trabalhador, quantidade, duracao):
+        """
+        Arrenda até 'quantidade' trabalhos pendentes (ou com prazo vencido) para um trabalhador.
+
+        Args:
+            rodada: Identificador da rodada.
+            trabalhador: Identificador do trabalhador.
+            quantidade: Número máximo de trabalhos a arrendar.
+            duracao: Duração do arrendamento, em segundos.
+
+        Returns:
+            trabalhos: Lista de tuplas (id, etapa, carga).
+        """
+        agora = time.time()
+        self.conexao.execute('BEGIN IMMEDIATE')
+        try:
+            # Arrendamentos vencidos que já esgotaram as tentativas não voltam para a fila
+            self.conexao.execute('UPDATE "trabalhos" SET "estado" = \'falha\', "atualizado_em" = ? '
+                                 'WHERE "rodada" = ? AND "estado" = \'em_andamento\' AND "prazo" < ? AND "tentativas" >= ?',
+                                 (agora, rodada, agora, self.tentativas_maximas))
+            linhas = self.conexao.execute(
+                'SELECT "id", "etapa", "carga" FROM "trabalhos" WHERE "rodada" = ? AND '
+                '("estado" = \'pendente\' OR ("estado" = \'em_andamento\' AND "prazo" < ?)) ORDER BY "id" LIMIT ?',
+                (rodada, agora, quantidade),
+            ).fetchall()
+            self.conexao.executemany(
+                'UPDATE "trabalhos" SET "estado" = \'em_andamento\', "trabalhador" = ?, "prazo" = ?, '
+                '"tentativas" = "tentativas" + 1, "atualizado_em" = ? WHERE "id" = ?',
+                ((trabalhador, agora + duracao, agora, linha[0]) for linha in linhas),
+            )
+            self.conexao.execute('COMMIT')
+        except BaseException:
+            self.conexao.execute('ROLLBACK')
+            raise
+        return [(identificador, etapa, json.loads(carga)) for identificador, etapa, carga in linhas]
+
+    def renovar(self, identificadores, trabalhador, duracao):
+        """
+        Estende o prazo dos trabalhos ainda arrendados pelo trabalhador (heartbeat).
+        """
+        agora = time.time()
+        self.conexao.executemany(
+            'UPDATE "trabalhos" SET "prazo" = ?, "atualizado_em" = ? WHERE "id" = ? AND "trabalhador" = ? AND "estado" = \'em_andamento\'',
+            ((agora + duracao, agora, identificador, trabalhador) for identificador in identificadores),
+        )
+
+    def concluir(self, identificador, trabalhador):
+        """
+        Marca como concluído um trabalho ainda arrendado pelo trabalhador.
+
+        Args:
+            identificador: Identificador do trabalho.
+            trabalhador: Identificador do trabalhador.
+
+        Returns:
+            bool: False se o arrendamento foi perdido (prazo vencido e trabalho entregue a outro
+            trabalhador); nesse caso a conclusão é descartada.
+        """
+        cursor = self.conexao.execute(
+            'UPDATE "trabalhos" SET "estado" = \'concluido\', "atualizado_em" = ? '
+            'WHERE "id" = ? AND "trabalhador" = ? AND "estado" = \'em_andamento\'',
+            (time.time(), identificador, trabalhador),
+        )
+        return cursor.rowcount == 1
+
+    def falhar(self, identificador, trabalhador, carga=None):
+        """
+        Devolve à fila um trabalho ainda arrendado pelo trabalhador, ou o marca como 'falha' se as
+        tentativas se esgotaram.
+
+        Args:
+            identificador: Identificador do trabalho.
+            trabalhador: Identificador do trabalhador.
+            carga: Nova carga do trabalho (opcional), por exemplo apenas as entidades que falharam.
+
+        Returns:
+            bool: False se o arrendamento foi perdido; nesse caso a falha é descartada.
+        """
+        cursor = self.conexao.execute(
+            'UPDATE "trabalhos" SET "estado" = CASE WHEN "tentativas" >= ? THEN \'falha\' ELSE \'pendente\' END, '
+            '"carga" = COALESCE(?, "carga"), "atualizado_em" = ? '
+            'WHERE "id" = ? AND "trabalhador" = ? AND "estado" = \'em_andamento\'',
+            (self.tentativas_maximas, None if carga is None else json.dumps(carga), time.time(), identificador, trabalhador),
+        )
+        return cursor.rowcount == 1
+
+    def contar(self, rodada):
+        """
+        Conta os trabalhos da rodada por etapa e estado.
+
+        Returns:
+            resumo: Dicionário {(etapa, estado): quantidade}.
+        """
+        linhas = self.conexao.execute('SELECT "etapa", "estado", COUNT(*) FROM "trabalhos" WHERE "rodada" = ? GROUP BY "etapa", "estado"', (rodada,))
+        return {(etapa, estado): quantidade for etapa, estado, quantidade in linhas}
+
+    def fechar(self):
+        self.conexao.close()
+
+def criar_fila(config, paths):
+    return FilaTrabalhos(paths['fila_db'], config['tentativas_trabalho'], wal=not config['banco_em_rede'])
+
+class RegistroTrabalho:
+    """
+    Faz o papel do DiarioExecucao nas funções de requisição e gravação enquanto um trabalhador
+    processa um trabalho da fila: guarda apenas as chaves cujas requisições falharam, para que
+    somente elas voltem à fila.
+    """
+
+    def __init__(self):
+        self.falhas = set()
+
+    def concluido(self, etapa, chave):
+        return False
+
+    def registrar(self, etapa, chave, estado, url=None, detalhe=None):
+        if estado == 'falha':
+            self.falhas.add((etapa, chave_diario(chave)))
+
+    def registrador(self, etapa, chave, url):
+        def registrar(estado, detalhe=None):
+            self.registrar(etapa, chave, estado, url, detalhe)
+        return registrar
+
+    def concluir(self, etapa, chaves):
+        for chave in chaves:
+            self.falhas.discard((etapa, chave_diario(chave)))
+
+    def falhou(self, etapa, chave):
+        return (etapa, chave_diario(chave)) in self.falhas
+
+def trabalhos_de_registros(registros, etapa, tamanho_trabalho):
+    """
+    Agrupa registros pendentes em trabalhos de até 'tamanho_trabalho' entidades.
+
+    Args:
+        registros: Iterável de registros (dicionários) lidos do armazenamento.
+        etapa: Etapa dos trabalhos ('itens', 'arquivos' ou 'resultados').
+        tamanho_trabalho: Número máximo de entidades por trabalho.
+
+    Yields:
+        (chave, carga): Chave do trabalho (primeira e última entidades) e lista de registros.
+    """
+    campos = CAMPOS_TRABALHOS[etapa]
+    chaves = CHAVES_TABELAS[CONTROLE_ETAPAS[etapa][0]]
+    carga = []
+    for registro in registros:
+        carga.append({campo: registro.get(campo) for campo in campos})
+        if len(carga) >= tamanho_trabalho:
+            yield chave_diario(tuple(carga[0][c] for c in chaves) + tuple(carga[-1][c] for c in chaves)), carga
+            carga = []
+    if carga:
+        yield chave_diario(tuple(carga[0][c] for c in chaves) + tuple(carga[-1][c] for c in chaves)), carga
+
+async def processar_trabalho(session, limitador, armazenamento, etapa, carga, config):
+    """
+    Executa um trabalho da fila com as mesmas funções de requisição e gravação da execução normal.
+
+    Args:
+        session: Sessão HTTP compartilhada.
+        limitador: Limitador de concorrência compartilhado.
+        armazenamento: Backend de armazenamento dos dados.
+        etapa: Etapa do trabalho ('licitacoes', 'itens', 'arquivos' ou 'resultados').
+        carga: Páginas (licitações) ou registros (detalhes) do trabalho.
+        config: Configurações do sistema.
+
+    Returns:
+        restantes: Parte da carga cujas requisições falharam (lista vazia se tudo foi gravado).
+    """
+    registro = RegistroTrabalho()
+    if etapa == 'licitacoes':
+        chaves = [tuple(chave) for chave in carga]
+        fluxo = fetch_licitacoes(session, limitador, None, None, None, config, registro, chaves=chaves)
+        await gravar_licitacoes(fluxo, armazenamento, config, registro)
+        return [list(chave) for chave in chaves if registro.falhou(etapa, chave)]
+
+    tabela_controle, coluna_controle = CONTROLE_ETAPAS[etapa]
+    if etapa == 'resultados':
+        fluxo = fetch_resultados(session, limitador, carga, config, len(carga), registro)
+        if config['filtro_resultados']:
+            # A seleção foi feita pelo coordenador; aqui só as revisitas vazias são reagendadas
+            agenda = AgendaResultados(armazenamento, config)
+            for item in carga:
+                agenda.acompanhar(item)
+            fluxo = agenda.filtrar(fluxo)
+    else:
+        fluxo = fetch_detalhes(session, limitador, carga, etapa, config, len(carga), registro)
+    await gravar_detalhes(fluxo, armazenamento, etapa, tabela_controle, coluna_controle, config, registro)
+    # As chaves das falhas seguem as usadas por fetch_detalhes e fetch_resultados no diário
+    if etapa == 'resultados':
+        return [r for r in carga if registro.falhou(etapa, (r['numero_controle_pncp'], r['numeroItem']))]
+    return [r for r in carga if registro.falhou(etapa, r['numero_controle_pncp'])]
+
+async def executar_trabalhador(config, armazenamento, fila, identificador):
+    """
+    Laço de um trabalhador: arrenda trabalhos da rodada aberta, processa até
+    'trabalhos_simultaneos' deles ao mesmo tempo e renova os arrendamentos enquanto isso.
+    Termina quando a rodada em que trabalhava é encerrada pelo coordenador.
+
+    Args:
+        config: Configurações do sistema.
+        armazenamento: Backend de armazenamento dos dados (SQLite compartilhado).
+        fila: Fila de trabalhos compartilhada.
+        identificador: Identificador do trabalhador (ex.: 'host:pid').
+
+    Returns:
+        processados: Número de trabalhos concluídos por este trabalhador.
+    """
+    limitador = criar_limitador(config)
+    duracao = config['prazo_arrendamento']
+    intervalo = config['intervalo_fila']
+    em_andamento = {}
+    processados = 0
+    rodada = None
+    inicio_espera = time.monotonic()
+
+    def arrendamento_perdido(identificador_trabalho, etapa):
+        logging.warning(f"Trabalho {identificador_trabalho} ({etapa}): arrendamento perdido para outro trabalhador; o resultado deste foi descartado.")
+        return False
+
+    async def processar(identificador_trabalho, etapa, carga):
+        try:
+            restantes = await processar_trabalho(session, limitador, armazenamento, etapa, carga, config)
+        except Exception as e:
+            logging.error(f"Erro ao processar o trabalho {identificador_trabalho} ({etapa}): {str(e)}")
+            if not fila.falhar(identificador_trabalho, identificador):
+                return arrendamento_perdido(identificador_trabalho, etapa)
+            return False
+        if restantes:
+            if not fila.falhar(identificador_trabalho, identificador, restantes):
+                return arrendamento_perdido(identificador_trabalho, etapa)
+            logging.warning(f"Trabalho {identificador_trabalho} ({etapa}): {len(restantes)} de {len(carga)} entidades falharam e voltam para a fila.")
+            return False
+        if not fila.concluir(identificador_trabalho, identificador):
+            return arrendamento_perdido(identificador_trabalho, etapa)
+        return True
+
+    async def renovar_arrendamentos():
+        while True:
+            await asyncio.sleep(duracao / 3)
+            if em_andamento:
+                fila.renovar(list(em_andamento.values()), identificador, duracao)
+
+    async with criar_sessao(config) as session:
+        batimento = asyncio.create_task(renovar_arrendamentos())
+        try:
+            while True:
+                if len(em_andamento) < config['trabalhos_simultaneos']:
+                    rodada_atual = fila.rodada_aberta()
+                    if rodada_atual is None and not em_andamento:
+                        # Sem rodada aberta: o coordenador terminou (ou ainda não começou)
+                        if rodada is not None or time.monotonic() - inicio_espera > ESPERA_MAXIMA_RODADA:
+                            break
+                    elif rodada_atual is not None:
+                        rodada = rodada_atual
+                        for identificador_trabalho, etapa, carga in fila.arrendar(rodada, identificador, config['trabalhos_simultaneos'] - len(em_andamento), duracao):
+                            em_andamento[asyncio.create_task(processar(identificador_trabalho, etapa, carga))] = identificador_trabalho
+                if not em_andamento:
+                    await asyncio.sleep(intervalo)
+                    continue
+                concluidas, _ = await asyncio.wait(list(em_andamento), timeout=intervalo, return_when=asyncio.FIRST_COMPLETED)
+                for tarefa in concluidas:
+                    del em_andamento[tarefa]
+                    if tarefa.result():
+                        processados += 1
+        finally:
+            batimento.cancel()
+            for tarefa in em_andamento:
+                tarefa.cancel()
+    logging.info(f"Trabalhador {identificador} encerrado: {processados} trabalhos concluídos.")
+    return processados
+
+def executar_trabalhador_processo(config, paths, identificador=None):
+    """
+    Ponto de entrada de um processo trabalhador (iniciado por --trabalhador ou pelo coordenador).
+
+    Args:
+        config: Configurações do sistema.
+        paths: Dicionário com os caminhos dos arquivos.
+        identificador: Identificador do trabalhador (padrão: 'host:pid').
+
+    Returns:
+        processados: Número de trabalhos concluídos.
+    """
+    if not logging.getLogger('').handlers:
+        setup_logging(paths['log_file'], config['formato_log'], config['nivel_log'])
+    identificador = identificador or f"{socket.gethostname()}:{os.getpid()}"
+    armazenamento = ArmazenamentoSQLite(paths['banco_sqlite'], wal=not config['banco_em_rede'])
+    fila = criar_fila(config, paths)
+    logging.info(f"Trabalhador {identificador} iniciado.")
+    try:
+        return asyncio.run(executar_trabalhador(config, armazenamento, fila, identificador))
+    finally:
+        fila.fechar()
+        armazenamento.fechar()
+        # Cada trabalhador grava o próprio resumo de métricas ao lado do resumo do coordenador
+        if config['resumo_metricas'] and paths.get('metricas_json'):
+            raiz, extensao = os.path.splitext(paths['metricas_json'])
+            METRICAS.gravar_resumo(f"{raiz}_{''.join(c if c.isalnum() else '_' for c in identificador)}{extensao}")
+
+def iniciar_trabalhadores_locais(config, paths, quantidade):
+    """
+    Inicia processos trabalhadores nesta máquina.
+
+    Returns:
+        processos: Lista de multiprocessing.Process já iniciados.
+    """
+    contexto = multiprocessing.get_context('spawn')
+    processos = []
+    for indice in range(quantidade):
+        processo = contexto.Process(target=executar_trabalhador_processo, args=(config, paths, f"{socket.gethostname()}:local{indice + 1}"), daemon=True)
+        processo.start()
+        processos.append(processo)
+    return processos
+
+async def aguardar_etapas(fila, rodada, etapas, config, processos=None):
+    """
+    Espera até que a rodada não tenha mais trabalhos pendentes ou em andamento nas etapas dadas,
+    registrando o progresso no log.
+
+    Raises:
+        RuntimeError: Se todos os trabalhadores locais terminaram com trabalhos ainda na fila.
+    """
+    ultimo_relatorio = 0
+    while True:
+        contagem = fila.contar(rodada)
+        abertos = sum(quantidade for (etapa, estado), quantidade in contagem.items()
+                      if etapa in etapas and estado in ('pendente', 'em_andamento'))
+        if time.monotonic() - ultimo_relatorio >= 10 or not abertos:
+            ultimo_relatorio = time.monotonic()
+            for etapa in etapas:
+                resumo = ', '.join(f"{estado}={contagem.get((etapa, estado), 0)}" for estado in ESTADOS_FILA)
+                logging.info(f"Fila, rodada {rodada}, etapa '{etapa}': {resumo}.")
+                if config['verbose']:
+                    print(f"Fila, etapa '{etapa}': {resumo}")
+        if not abertos:
+            return
+        if processos and not any(processo.is_alive() for processo in processos):
+            raise RuntimeError("Todos os trabalhadores locais terminaram com trabalhos ainda na fila.")
+        await asyncio.sleep(config['intervalo_fila'])
+
+async def coordenar_raspagem(config, armazenamento, fila, paths, diario=None, repositorio=None):
+    """
+    Executa a raspagem em modo distribuído: o coordenador divide cada etapa em trabalhos na fila
+    compartilhada e espera que os trabalhadores os concluam antes de enfileirar a etapa seguinte,
+    que depende dos dados gravados pela anterior (páginas de busca, depois itens e arquivos das
+    licitações pendentes, depois resultados dos itens pendentes). O download de documentos e a
+    verificação de arquivos compactados rodam no próprio coordenador ao final.
+
+    Uma rodada interrompida é retomada: as etapas já enfileiradas não são enfileiradas de novo.
+
+    Args:
+        config: Configurações do sistema.
+        armazenamento: Backend de armazenamento dos dados (SQLite compartilhado).
+        fila: Fila de trabalhos compartilhada.
+        paths: Dicionário com os caminhos dos arquivos (usado pelos trabalhadores locais).
+        diario: Diário de execução (opcional), usado nas etapas finais.
+        repositorio: Repositório local de documentos (opcional).
+    """
+    rodada, retomada = fila.abrir_rodada()
+    if retomada:
+        logging.info(f"Retomando a rodada {rodada} da fila de trabalhos.")
+    processos = iniciar_trabalhadores_locais(config, paths, config['trabalhadores_locais'])
+    enfileiradas = {etapa for etapa, _ in fila.contar(rodada)}
+    tamanho_trabalho = config['tamanho_trabalho']
+    tamanho_lote = config['tamanho_lote_gravacao']
+
+    try:
+        # Páginas da busca, em grupos de 'tamanho_trabalho' páginas por trabalho
+        if 'licitacoes' not in enfileiradas:
+            if config['planejar_busca']:
+                async with criar_sessao(config) as session:
+                    chaves = [list(chave) for chave in await planejar_paginas(session, criar_limitador(config), config)]
+            else:
+                pages = list(range(config['pagina_inicial'], config['pagina_final']))
+                chaves = [[tipo, ordem, page, config['tam_pagina']] for ordem in config['ordenacao'] for tipo in config['tipos_documento'] for page in pages]
+            grupos = (chaves[i:i + tamanho_trabalho] for i in range(0, len(chaves), tamanho_trabalho))
+            total = fila.enfileirar(rodada, 'licitacoes', ((chave_diario(tuple(grupo[0]) + tuple(grupo[-1])), grupo) for grupo in grupos))
+            logging.info(f"{total} trabalhos de páginas de licitações enfileirados na rodada {rodada}.")
+        await aguardar_etapas(fila, rodada, ['licitacoes'], config, processos)
+
+        # Itens e arquivos das licitações pendentes, depois resultados dos itens pendentes
+        for etapas in (('itens', 'arquivos'), ('resultados',)):
+            for etapa in etapas:
+                if etapa in enfileiradas:
+                    continue
+                tabela_controle, coluna_controle = CONTROLE_ETAPAS[etapa]
+                pendentes = registros_de_lotes(armazenamento.iterar_pendentes(tabela_controle, coluna_controle, tamanho_lote))
+                if etapa == 'resultados' and config['filtro_resultados']:
+                    pendentes = AgendaResultados(armazenamento, config).selecionar(pendentes)
+                total = fila.enfileirar(rodada, etapa, trabalhos_de_registros(pendentes, etapa, tamanho_trabalho))
+                logging.info(f"{total} trabalhos de {etapa} enfileirados na rodada {rodada}.")
+            await aguardar_etapas(fila, rodada, list(etapas), config, processos)
+
+        falhas = {etapa: quantidade for (etapa, estado), quantidade in fila.contar(rodada).items() if estado == 'falha'}
+        for etapa, quantidade in sorted(falhas.items()):
+            logging.warning(f"Rodada {rodada}: {quantidade} trabalhos de {etapa} esgotaram as tentativas; suas entidades seguem pendentes para a próxima execução.")
+        # Encerrar a rodada libera os trabalhadores
+        fila.encerrar(rodada)
+    finally:
+        for processo in processos:
+            processo.join(timeout=2 * config['intervalo_fila'] + 5)
+            if processo.is_alive():
+                processo.terminate()
+
+    async with criar_sessao(config) as session:
+        if repositorio is not None:
+            await baixar_documentos(session, armazenamento, repositorio, config, diario)
+        await verify_compressed_files(session, armazenamento, config, diario, repositorio)
+    if diario is not None:
+        diario.finalizar()
 
 # ---------------------------- Alterações na Função Principal ---------------------------- #
 
+async def executar_raspagem(config, armazenamento, diario=None, cache=None, repositorio=None):
+    """
+    Executa as etapas de raspagem compartilhando uma única sessão HTTP durante toda a execução.
+
+    Args:
+        config: Configurações do sistema.
+        armazenamento: Backend de armazenamento dos dados.
+        diario: Diário de execução (opcional), usado para retomar uma execução interrompida.
+        cache: Cache de respostas em disco (opcional).
+        repositorio: Repositório local de documentos (opcional).
+    """
+    # Define as páginas a serem requisitadas (por exemplo, da página inicial até a 20)
+    pages = list(range(config['pagina_inicial'], config['pagina_final']))
+    tamanho_lote = config['tamanho_lote_gravacao']
+
+    # Limitador de concorrência compartilhado por todas as etapas da API
+    limitador = criar_limitador(config)
+
+    async with criar_sessao(config) as session:
+        # Realiza as requisições principais de forma assíncrona, gravando as páginas à medida que chegam
+        if config['modo_incremental']:
+            marcas = {}
+            fluxo_licitacoes = fetch_licitacoes_incremental(session, limitador, armazenamento, config['tipos_documento'], pages, config, marcas, cache)
+            await gravar_licitacoes(fluxo_licitacoes, armazenamento, config)
+            # As marcas d'água só avançam depois que as licitações foram gravadas
+            for chave, valor in marcas.items():
+                armazenamento.gravar_estado(chave, valor)
+                logging.info(f"Marca d'água '{chave}' atualizada para {valor}.")
+        else:
+            chaves = await planejar_paginas(session, limitador, config, cache) if config['planejar_busca'] else None
+            fluxo_licitacoes = fetch_licitacoes(session, limitador, config['tipos_documento'], config['ordenacao'], pages, config, diario, cache, chaves)
+            await gravar_licitacoes(fluxo_licitacoes, armazenamento, config, diario)
+
+        # Realiza as requisições de itens, lendo as licitações pendentes do armazenamento sob demanda
+        total_pendentes_itens = armazenamento.contar_pendentes('licitacoes', 'detalhes_baixados')
+        if total_pendentes_itens:
+            if config['verbose']:
+                print(f"Iniciando requisições de itens para {total_pendentes_itens} licitações...")
+            logging.info(f"Iniciando requisições de itens para {total_pendentes_itens} licitações.")
+
+            pendentes = registros_de_lotes(armazenamento.iterar_pendentes('licitacoes', 'detalhes_baixados', tamanho_lote))
+            fluxo_itens = fetch_detalhes(session, limitador, pendentes, 'itens', config, total_pendentes_itens, diario, cache)
+            await gravar_detalhes(fluxo_itens, armazenamento, 'itens', 'licitacoes', 'detalhes_baixados', config, diario)
+        else:
+            if config['verbose']:
+                print("Nenhum registro pendente para itens.")
+            logging.info("Nenhum registro pendente para itens.")
+
+        # Realiza as requisições de resultados de cada um dos itens
+        if armazenamento.contar('itens'):
+            total_pendentes_resultados = armazenamento.contar_pendentes('itens', 'Resultados verificados')
+            if total_pendentes_resultados:
+                if config['verbose']:
+                    print(f"Iniciando requisições de resultados para {total_pendentes_resultados} itens...")
+                logging.info(f"Iniciando requisições de resultados para {total_pendentes_resultados} itens.")
+
+                # Marca 'Resultados verificados' apenas para os itens consultados com sucesso
+                pendentes = registros_de_lotes(armazenamento.iterar_pendentes('itens', 'Resultados verificados', tamanho_lote))
+                agenda = None
+                if config['filtro_resultados']:
+                    # Só são consultados os itens que podem ter resultado ou cuja revisita venceu
+                    agenda = AgendaResultados(armazenamento, config)
+                    pendentes = agenda.selecionar(pendentes)
+                fluxo_resultados = fetch_resultados(session, limitador, pendentes, config, None if agenda else total_pendentes_resultados, diario, cache)
+                if agenda is not None:
+                    fluxo_resultados = agenda.filtrar(fluxo_resultados)
+                await gravar_detalhes(fluxo_resultados, armazenamento, 'resultados', 'itens', 'Resultados verificados', config, diario)
+            else:
+                if config['verbose']:
+                    print("Nenhum item pendente para buscar resultados.")
+                logging.info("Nenhum item pendente para buscar resultados.")
+        else:
+            if config['verbose']:
+                print("Nenhum item para buscar resultados.")
+            logging.info("Nenhum item para buscar resultados.")
+
+        # Realiza as requisições de arquivos
+        total_pendentes_arquivos = armazenamento.contar_pendentes('licitacoes', 'documentos_baixados')
+        if total_pendentes_arquivos:
+            if config['verbose']:
+                print(f"Iniciando requisições de arquivos para {total_pendentes_arquivos} licitações...")
+            logging.info(f"Iniciando requisições de arquivos para {total_pendentes_arquivos} licitações.")
+
+            pendentes = registros_de_lotes(armazenamento.iterar_pendentes('licitacoes', 'documentos_baixados', tamanho_lote))
+            fluxo_arquivos = fetch_detalhes(session, limitador, pendentes, 'arquivos', config, total_pendentes_arquivos, diario, cache)
+            await gravar_detalhes(fluxo_arquivos, armazenamento, 'arquivos', 'licitacoes', 'documentos_baixados', config, diario)
+        else:
+            if config['verbose']:
+                print("Nenhum registro pendente para arquivos.")
+            logging.info("Nenhum registro pendente para arquivos.")
+
+        # Baixa os documentos e verifica os arquivos compactados (os downloads de arquivos não passam pelo cache).
+        # Os documentos vêm antes: a verificação passa a ler do repositório os arquivos já baixados.
+        if config['modo_replay']:
+            logging.info("Modo replay: download de documentos e verificação de arquivos compactados ignorados.")
+        else:
+            if repositorio is not None:
+                await baixar_documentos(session, armazenamento, repositorio, config, diario)
+            await verify_compressed_files(session, armazenamento, config, diario, repositorio)
+
+    # Todas as etapas terminaram: a próxima execução começa um novo diário
+    if diario is not None:
+        for (etapa, estado), quantidade in sorted(diario.resumo().items()):
+            logging.info(f"Diário de execução: etapa '{etapa}', estado '{estado}': {quantidade} trabalhos.")
+        diario.finalizar()
+
 def main():
     """
     Função principal que orquestra a execução do script.
@@ -711,12 +5380,14 @@ def main():
     # Configura os diretórios e arquivos
     paths = setup_directories()
 
-    # Configura o sistema de logs com o caminho correto
-    setup_logging(paths['log_file'])
-
     # Carrega as configurações e aplica os parâmetros da CLI
     config = load_config(args)
 
+    # Configura o sistema de logs com o caminho correto
+    setup_logging(paths['log_file'], config['formato_log'], config['nivel_log'])
+    for aviso in config.pop('avisos_configuracao'):
+        logging.warning(aviso)
+
     # Exibe as informações iniciais
     if config['verbose']:
         print("Iniciando raspagem com os seguintes parâmetros:")
@@ -724,142 +5395,122 @@ def main():
             if key != 'verbose':
                 print(f"- {key}: {value}")
 
-    logging.info("Iniciando raspagem de licitações.")
-
-    # Carrega os dataframes existentes ou cria novos
-    df_licitacoes, df_itens, df_arquivos, df_resultados = load_dataframes(paths)
+    # Abre o backend de armazenamento configurado
+    armazenamento = criar_armazenamento(config, paths)
 
-    # Define as páginas a serem requisitadas (por exemplo, da página inicial até a 20)
-    pages = list(range(config['pagina_inicial'], config['pagina_final']))
+    # Modos de execução única: importação dos TSVs legados e exportação das tabelas
+    if args.importar_tsv:
+        totais = importar_tsv(paths, armazenamento)
+        armazenamento.fechar()
+        for tabela, total in totais.items():
+            print(f"Tabela '{tabela}': {total} linhas importadas.")
+        return
+    if args.exportar:
+        destino = args.destino_exportacao or paths['exportacao_directory']
+        caminhos = exportar_tabelas(armazenamento, destino, args.exportar)
+        armazenamento.fechar()
+        for caminho in caminhos:
+            print(f"Tabela exportada: {caminho}")
+        return
+    if args.atualizar_parquet:
+        totais = atualizar_dataset_parquet(armazenamento, paths['parquet_directory'], config)
+        armazenamento.fechar()
+        for tabela, total in totais.items():
+            print(f"Tabela '{tabela}': {total} linhas gravadas no dataset Parquet.")
+        return
+    if args.indexar_busca:
+        totais = atualizar_indice_busca(armazenamento, paths['busca_db'], config)
+        armazenamento.fechar()
+        for tabela, total in totais.items():
+            print(f"Tabela '{tabela}': {total} linhas indexadas.")
+        return
+    if args.buscar:
+        armazenamento.fechar()
+        indice = IndiceBusca(paths['busca_db'])
+        try:
+            resultados = indice.buscar(
+                args.buscar, orgao=args.orgao, uf=args.uf, data_inicio=args.data_inicio, data_fim=args.data_fim,
+                valor_minimo=args.valor_minimo, valor_maximo=args.valor_maximo,
+                tipos=args.tipo_registro.split(',') if args.tipo_registro else None, limite=args.limite,
+            )
+        except sqlite3.OperationalError as e:
+            print(f"Erro na busca: {str(e)}")
+            return
+        finally:
+            indice.fechar()
+        imprimir_resultados_busca(resultados)
+        return
 
-    # Realiza as requisições principais de forma assíncrona
-    loop = asyncio.get_event_loop()
-    try:
-        respostas = loop.run_until_complete(fetch_licitacoes(config['tipos_documento'], config['ordenacao'], pages, config))
-    except Exception as e:
-        logging.critical(f"Erro durante a requisição das licitações: {str(e)}")
-        if config['verbose']:
-            print(f"Erro crítico: {str(e)}")
-        sys.exit(1)
+    # Modo distribuído: os processos compartilham o banco SQLite e a fila de trabalhos
+    distribuido = args.coordenador or args.trabalhador
+    if distribuido:
+        if config['armazenamento'] != 'sqlite' or config['modo_replay']:
+            mensagem = "O modo distribuído exige o armazenamento SQLite e não funciona no modo replay."
+            logging.error(mensagem)
+            print(mensagem)
+            armazenamento.fechar()
+            sys.exit(1)
+        if config['modo_incremental']:
+            logging.warning("O modo incremental é ignorado no modo distribuído: todas as páginas configuradas são enfileiradas.")
+    if args.trabalhador:
+        armazenamento.fechar()
+        processados = executar_trabalhador_processo(config, paths)
+        print(f"Trabalhador encerrado: {processados} trabalhos concluídos.")
+        return
 
-    # Processa as licitações obtidas
-    df_licitacoes = process_licitacoes(respostas, df_licitacoes)
+    logging.info("Iniciando raspagem de licitações.")
 
-    # Salva o dataframe atualizado
-    save_dataframes(df_licitacoes, df_itens, df_arquivos, paths)
+    # Abre o diário de execução, retomando a execução anterior se ela foi interrompida
+    diario = DiarioExecucao(paths['diario_db'])
+    if diario.retomada:
+        print(f"Retomando execução interrompida: {len(diario.concluidos)} trabalhos já concluídos serão pulados.")
 
-    # Identifica licitações que ainda não tiveram os detalhes baixados
-    if 'detalhes_baixados' not in df_licitacoes.columns:
-        df_licitacoes['detalhes_baixados'] = False
-    if 'documentos_baixados' not in df_licitacoes.columns:
-        df_licitacoes['documentos_baixados'] = False
+    # Abre o cache de respostas da API (obrigatório no modo replay); os trabalhadores do modo distribuído não o usam
+    cache = criar_cache(config, paths) if not distribuido else None
 
-    registros_pendentes_itens = df_licitacoes[df_licitacoes['detalhes_baixados'] == False].to_dict('records')
-    registros_pendentes_arquivos = df_licitacoes[df_licitacoes['documentos_baixados'] == False].to_dict('records')
+    # Abre o repositório local de documentos, se o download de documentos estiver ativo
+    repositorio = criar_repositorio(config, paths)
 
-    # Realiza as requisições de itens
-    if registros_pendentes_itens:
-        if config['verbose']:
-            print(f"Iniciando requisições de itens para {len(registros_pendentes_itens)} licitações...")
-        logging.info(f"Iniciando requisições de itens para {len(registros_pendentes_itens)} licitações.")
-        
-        for i in range(0, len(registros_pendentes_itens), 500):
-            lote = registros_pendentes_itens[i:i + 500]
-            if config['verbose']:
-                print(f"Processando lote de itens {i + 1} a {min(i + 500, len(registros_pendentes_itens))}...")
-            logging.info(f"Processando lote de itens {i + 1} a {min(i + 500, len(registros_pendentes_itens))}...")
-            
-            # Processa o lote
-            detalhes_itens = loop.run_until_complete(fetch_detalhes(lote, 'itens', config))
-            df_itens = processar_detalhes_registros(detalhes_itens, df_itens, 'itens')
-            
-            # Atualiza o DataFrame e salva progresso
-            df_licitacoes.loc[df_licitacoes['detalhes_baixados'] == False, 'detalhes_baixados'] = True
-            save_dataframes(df_licitacoes, df_itens, df_arquivos, paths)
-    else:
-        if config['verbose']:
-            print("Nenhum registro pendente para itens.")
-        logging.info("Nenhum registro pendente para itens.")
-
-    # Realiza as requisições de resultados de cada um dos itens
-    if not df_itens.empty:
-        if 'Resultados verificados' not in df_itens.columns:
-            df_itens['Resultados verificados'] = False
-            df_itens.to_csv(paths['itens_csv'], index=False, sep='\t')
-            logging.info("Coluna 'Resultados verificados' adicionada ao DataFrame de itens.")
-
-        registros_itens = df_itens[df_itens['Resultados verificados'].astype(str) == 'False']
-        if not registros_itens.empty:
-            if config['verbose']:
-                print(f"Iniciando requisições de resultados para {len(registros_itens)} itens...")
-            logging.info(f"Iniciando requisições de resultados para {len(registros_itens)} itens.")
-            
-            for i in range(0, len(registros_itens), 500):
-                lote = registros_itens.iloc[i:i + 500]
-                if config['verbose']:
-                    print(f"Processando lote de resultados {i + 1} a {min(i + 500, len(registros_itens))}...")
-                logging.info(f"Processando lote de resultados {i + 1} a {min(i + 500, len(registros_itens))}...")
-                
-                # Processa o lote
-                resultados = loop.run_until_complete(fetch_resultados(lote, config))
-                df_resultados = processar_detalhes_registros(resultados, pd.DataFrame(), 'resultados')
-                
-                # Salva os resultados em um arquivo CSV separado (acrescenta ao arquivo existente)
-                resultados_path = os.path.join(paths['main_directory'], 'resultados.csv')
-                if os.path.exists(resultados_path):
-                    df_resultados.to_csv(resultados_path, mode='a', header=False, index=False,sep='\t')
-                else:
-                    df_resultados.to_csv(resultados_path, index=False,sep='\t')
-                
-                # Atualiza a coluna 'Resultados verificados' para True para os itens processados
-                df_itens.loc[lote.index, 'Resultados verificados'] = True
-                
-                # Salva o dataframe de itens atualizado após cada lote
-                df_itens.to_csv(paths['itens_csv'], index=False,sep='\t')
+    # Executa todas as etapas em um único loop de eventos e uma única sessão HTTP
+    try:
+        if args.coordenador:
+            fila = criar_fila(config, paths)
+            try:
+                asyncio.run(executar_com_metricas(config, coordenar_raspagem(config, armazenamento, fila, paths, diario, repositorio)))
+            finally:
+                fila.fechar()
         else:
-            if config['verbose']:
-                print("Nenhum item pendente para buscar resultados.")
-            logging.info("Nenhum item pendente para buscar resultados.")
-    else:
-        if config['verbose']:
-            print("Nenhum item para buscar resultados.")
-        logging.info("Nenhum item para buscar resultados.")
-
-
-
-    # Realiza as requisições de arquivos
-    if registros_pendentes_arquivos:
-        if config['verbose']:
-            print(f"Iniciando requisições de arquivos para {len(registros_pendentes_arquivos)} licitações...")
-        logging.info(f"Iniciando requisições de arquivos para {len(registros_pendentes_arquivos)} licitações.")
-        
-        for i in range(0, len(registros_pendentes_arquivos), 500):
-            lote = registros_pendentes_arquivos[i:i + 500]
-            if config['verbose']:
-                print(f"Processando lote de arquivos {i + 1} a {min(i + 500, len(registros_pendentes_arquivos))}...")
-            logging.info(f"Processando lote de arquivos {i + 1} a {min(i + 500, len(registros_pendentes_arquivos))}...")
-            
-            # Processa o lote
-            detalhes_arquivos = loop.run_until_complete(fetch_detalhes(lote, 'arquivos', config))
-            df_arquivos = processar_detalhes_registros(detalhes_arquivos, df_arquivos, 'arquivos')
-            
-            # Atualiza o DataFrame e salva progresso
-            df_licitacoes.loc[df_licitacoes['documentos_baixados'] == False, 'documentos_baixados'] = True
-            save_dataframes(df_licitacoes, df_itens, df_arquivos, paths)
-    else:
+            asyncio.run(executar_com_metricas(config, executar_raspagem(config, armazenamento, diario, cache, repositorio)))
+    except Exception as e:
+        logging.critical(f"Erro durante a raspagem: {str(e)}")
         if config['verbose']:
-            print("Nenhum registro pendente para arquivos.")
-        logging.info("Nenhum registro pendente para arquivos.")
+            print(f"Erro crítico: {str(e)}")
+        armazenamento.fechar()
+        sys.exit(1)
+    finally:
+        diario.fechar()
+        if cache is not None:
+            logging.info(f"Cache de respostas: {cache.acertos} acertos, {cache.revalidacoes} respostas 304, {cache.ausencias} ausências.")
+            cache.fechar()
+        if repositorio is not None:
+            repositorio.fechar()
+        if config['resumo_metricas']:
+            METRICAS.gravar_resumo(paths['metricas_json'])
 
+    # Atualiza o índice de busca com as linhas novas ou alteradas nesta execução
+    if config['indice_busca']:
+        atualizar_indice_busca(armazenamento, paths['busca_db'], config)
 
-    # Executa a verificação dos arquivos compactados
-    loop.run_until_complete(verify_compressed_files(paths, config))
+    # Acrescenta ao dataset Parquet particionado as linhas novas ou alteradas nesta execução
+    if config['dataset_parquet']:
+        atualizar_dataset_parquet(armazenamento, paths['parquet_directory'], config)
 
     # Exibe o resumo da execução
-    total_licitacoes = len(df_licitacoes)
-    total_itens = len(df_itens)
-    total_arquivos = len(df_arquivos)
-    total_resultados = len(df_resultados)
+    total_licitacoes = armazenamento.contar('licitacoes')
+    total_itens = armazenamento.contar('itens')
+    total_arquivos = armazenamento.contar('arquivos')
+    total_resultados = armazenamento.contar('resultados')
+    armazenamento.fechar()
 
     if config['verbose']:
         print("Raspagem concluída com sucesso!")
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+"""
+Configuração comum dos testes: raspagem.py e benchmark.py são scripts na raiz do repositório.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import raspagem  # noqa: E402
+
+@pytest.fixture
+def paths(tmp_path):
+    """
+    Caminhos dos arquivos do ArmazenamentoTSV dentro de um diretório temporário.
+    """
+    paths = {chave: str(tmp_path / f"{tabela}.csv") for tabela, chave in raspagem.ARQUIVOS_TABELAS.items()}
+    paths['estado_json'] = str(tmp_path / 'estado.json')
+    paths['indices_directory'] = str(tmp_path / 'indices')
+    return paths
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+Testes do pool de trabalhadores executar_em_pool.
+"""
+
+import asyncio
+
+import raspagem
+
+def test_resultados_de_todos_os_trabalhos():
+    async def dobrar(trabalho):
+        await asyncio.sleep(0)
+        if trabalho == 3:
+            raise ValueError('falha simulada')
+        return trabalho * 2
+
+    async def cenario():
+        return [item async for item in raspagem.executar_em_pool(range(10), dobrar, 3)]
+
+    resultados = dict(asyncio.run(cenario()))
+    assert resultados == {i: (None if i == 3 else i * 2) for i in range(10)}
+
+def test_interrupcao_encerra_trabalhadores_e_fecha_a_origem():
+    estado = {'origem_fechada': False, 'em_voo': 0, 'canceladas': 0}
+
+    async def origem():
+        try:
+            for trabalho in range(1000):
+                yield trabalho
+        finally:
+            estado['origem_fechada'] = True
+
+    async def lento(trabalho):
+        estado['em_voo'] += 1
+        try:
+            await asyncio.sleep(0 if trabalho == 0 else 10)
+        except asyncio.CancelledError:
+            estado['canceladas'] += 1
+            raise
+        finally:
+            estado['em_voo'] -= 1
+        return trabalho
+
+    async def cenario():
+        pool = raspagem.executar_em_pool(origem(), lento, 4)
+        async for _ in pool:
+            break
+        await pool.aclose()
+        # Nenhuma tarefa do pool continua viva depois que a iteração foi interrompida
+        return [tarefa for tarefa in asyncio.all_tasks() if tarefa is not asyncio.current_task()]
+
+    restantes = asyncio.run(cenario())
+    assert restantes == []
+    assert estado['origem_fechada']
+    assert estado['em_voo'] == 0 and estado['canceladas'] > 0
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Testes do ArmazenamentoTSV: acréscimo das linhas novas, registro de atualizações e sua reaplicação
+depois de uma execução interrompida.
+"""
+
+import os
+
+import pandas as pd
+
+import raspagem
+
+def licitacoes(inicio, fim, objeto='original'):
+    return pd.DataFrame({
+        'numero_controle_pncp': [f"{i:05d}" for i in range(inicio, fim)],
+        'objeto': [f"{objeto} {i}" for i in range(inicio, fim)],
+    })
+
+def por_chave(df):
+    return df.set_index('numero_controle_pncp').sort_index()
+
+def tabela(armazenamento, nome):
+    return pd.concat(armazenamento.iterar(nome, 4), ignore_index=True)
+
+def test_upsert_acrescenta_novas_e_registra_atualizacoes(paths):
+    armazenamento = raspagem.ArmazenamentoTSV(paths)
+    armazenamento.upsert('licitacoes', licitacoes(0, 10))
+    armazenamento.salvar()
+    tamanho = os.path.getsize(paths['licitacoes_csv'])
+    armazenamento.upsert('licitacoes', licitacoes(5, 15, 'revisado'))
+    armazenamento.salvar()
+
+    # As 5 linhas novas vão para o fim do TSV; as 5 existentes, para o registro
+    assert armazenamento.contar('licitacoes') == 15
+    assert len(pd.read_csv(paths['licitacoes_csv'], sep='\t', dtype=str)) == 15
+    assert os.path.getsize(paths['licitacoes_csv']) > tamanho
+    with open(f"{paths['licitacoes_csv']}.atualizacoes", encoding='utf-8') as f:
+        assert len(f.readlines()) == 5
+
+    df = por_chave(tabela(armazenamento, 'licitacoes'))
+    assert df.loc['00004', 'objeto'] == 'original 4'
+    assert df.loc['00005', 'objeto'] == 'revisado 5'
+    assert df.loc['00014', 'objeto'] == 'revisado 14'
+    armazenamento.fechar()
+
+def test_upsert_preserva_colunas_de_controle(paths):
+    armazenamento = raspagem.ArmazenamentoTSV(paths)
+    armazenamento.upsert('licitacoes', licitacoes(0, 4))
+    armazenamento.atualizar('licitacoes', pd.DataFrame({'numero_controle_pncp': ['00001'], 'detalhes_baixados': [True]}))
+    armazenamento.upsert('licitacoes', licitacoes(0, 4, 'revisado').assign(detalhes_baixados=False))
+    assert armazenamento.contar_pendentes('licitacoes', 'detalhes_baixados') == 3
+    pendentes = pd.concat(armazenamento.iterar_pendentes('licitacoes', 'detalhes_baixados', 4))
+    assert '00001' not in set(pendentes['numero_controle_pncp'])
+    armazenamento.fechar()
+
+    reaberto = raspagem.ArmazenamentoTSV(paths)
+    df = por_chave(tabela(reaberto, 'licitacoes'))
+    assert df.loc['00001', 'detalhes_baixados'] == 'True'
+    assert df.loc['00001', 'objeto'] == 'revisado 1'
+
+def test_registro_reaplicado_apos_interrupcao(paths):
+    armazenamento = raspagem.ArmazenamentoTSV(paths)
+    armazenamento.upsert('licitacoes', licitacoes(0, 10))
+    armazenamento.salvar()
+    armazenamento.upsert('licitacoes', licitacoes(0, 3, 'revisado'))
+    armazenamento.atualizar('licitacoes', pd.DataFrame({'numero_controle_pncp': ['00007'], 'documentos_baixados': [True]}))
+    armazenamento.salvar()
+    esperado = por_chave(tabela(armazenamento, 'licitacoes'))
+    # Simula a morte do processo: o armazenamento não é fechado e o TSV não é regravado
+    del armazenamento
+    registro = f"{paths['licitacoes_csv']}.atualizacoes"
+    assert os.path.exists(registro)
+    # A última linha do registro ficou pela metade
+    with open(registro, 'a', encoding='utf-8') as f:
+        f.write('{"chave": "00008", "valores": {"obj')
+
+    reaberto = raspagem.ArmazenamentoTSV(paths)
+    recuperado = por_chave(tabela(reaberto, 'licitacoes'))
+    pd.testing.assert_frame_equal(recuperado, esperado)
+    assert reaberto.contar_pendentes('licitacoes', 'documentos_baixados') == 9
+
+    # Ao fechar, o TSV é regravado com as atualizações e o registro é apagado
+    reaberto.fechar()
+    assert not os.path.exists(registro)
+    regravado = por_chave(pd.read_csv(paths['licitacoes_csv'], sep='\t', dtype=str))
+    assert regravado.loc['00002', 'objeto'] == 'revisado 2'
+    assert regravado.loc['00007', 'documentos_baixados'] == 'True'
+    assert len(regravado) == 10
+
+def test_regravacao_pelo_limite_durante_a_leitura(paths):
+    armazenamento = raspagem.ArmazenamentoTSV(paths, tamanho_lote=4, limite_atualizacoes=3)
+    armazenamento.upsert('licitacoes', licitacoes(0, 20))
+    armazenamento.salvar()
+    lidas = []
+    for lote in armazenamento.iterar_pendentes('licitacoes', 'detalhes_baixados', 4):
+        lidas.extend(lote['numero_controle_pncp'])
+        # Cada lote concluído passa do limite do registro e regrava o TSV no meio da leitura
+        armazenamento.atualizar('licitacoes', lote[['numero_controle_pncp']].assign(detalhes_baixados=True))
+        armazenamento.salvar()
+        assert not os.path.exists(f"{paths['licitacoes_csv']}.atualizacoes")
+    assert lidas == [f"{i:05d}" for i in range(20)]
+    assert armazenamento.contar_pendentes('licitacoes', 'detalhes_baixados') == 0
+    armazenamento.fechar()
+
+def test_colunas_novas_ampliam_o_cabecalho(paths):
+    armazenamento = raspagem.ArmazenamentoTSV(paths)
+    armazenamento.upsert('licitacoes', licitacoes(0, 3))
+    armazenamento.upsert('licitacoes', licitacoes(3, 5).assign(valor_total='10'))
+    armazenamento.fechar()
+    df = por_chave(pd.read_csv(paths['licitacoes_csv'], sep='\t', dtype=str))
+    assert df['valor_total'].isna().sum() == 3
+    assert (df.loc[['00003', '00004'], 'valor_total'] == '10').all()
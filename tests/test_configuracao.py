@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+Testes do carregamento das configurações de config.ini.
+"""
+
+import logging
+
+import raspagem
+
+def carregar(tmp_path, monkeypatch, conteudo, argv=()):
+    (tmp_path / 'config.ini').write_text(f"[DEFAULT]\n{conteudo}", encoding='utf-8')
+    monkeypatch.chdir(tmp_path)
+    return raspagem.load_config(raspagem.parse_arguments(list(argv)))
+
+def test_avisos_guardados_ate_o_log_ser_configurado(tmp_path, monkeypatch, caplog):
+    caplog.set_level(logging.DEBUG)
+    config = carregar(tmp_path, monkeypatch, (
+        "executor_compactados = fibra\n"
+        "dimensoes_busca = uf,cor\n"
+        "formato_log = xml\n"
+    ))
+    assert config['executor_compactados'] == 'thread'
+    assert config['dimensoes_busca'] == ['uf']
+    assert config['formato_log'] == 'json'
+    assert len(config['avisos_configuracao']) == 3
+    assert not caplog.records
+
+def test_configuracao_valida_sem_avisos(tmp_path, monkeypatch):
+    config = carregar(tmp_path, monkeypatch, "formato_log = texto\n")
+    assert config['formato_log'] == 'texto'
+    assert config['avisos_configuracao'] == []
+
+def test_opcoes_booleanas(tmp_path, monkeypatch):
+    config = carregar(tmp_path, monkeypatch, (
+        "modo_incremental = Sim\n"
+        "compressao_http = nao\n"
+        "banco_em_rede = 1\n"
+        "cache_respostas = yes\n"
+    ), argv=['--sem-cache', '--replay'])
+    assert config['modo_incremental'] and config['banco_em_rede']
+    assert not config['compressao_http']
+    # Sem valor no arquivo vale o padrão; os parâmetros da CLI têm precedência
+    assert config['indice_busca'] and not config['indexar_documentos']
+    assert config['modo_replay'] and not config['cache_respostas']
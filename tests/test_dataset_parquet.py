@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+Testes do DatasetParquet: memória limitada dos buffers e substituição das versões antigas.
+"""
+
+import pandas as pd
+import pytest
+
+import raspagem
+
+pytest.importorskip('pyarrow')
+
+UFS = ['AC', 'MG', 'SP', 'RJ', 'BA', 'PR']
+
+def licitacoes(inicio, fim, objeto='original'):
+    return pd.DataFrame({
+        'numero_controle_pncp': [f"{i:014d}-1-{i:06d}/{2020 + i % 4}" for i in range(inicio, fim)],
+        'uf': [UFS[i % len(UFS)] for i in range(inicio, fim)],
+        'objeto': [f"{objeto} {i}" for i in range(inicio, fim)],
+    })
+
+def atualizar(dataset, lotes, marca):
+    for lote in lotes:
+        anos, ufs = raspagem.particoes_lote(lote, None)
+        dataset.acrescentar('licitacoes', lote, anos, ufs, marca)
+        # Os buffers de todas as partições nunca passam do limite
+        assert sum(dataset.linhas_buffers.values()) <= dataset.linhas_memoria
+    return dataset.finalizar(marca)
+
+def test_buffers_limitados_e_versoes_substituidas(tmp_path):
+    diretorio = str(tmp_path / 'parquet')
+    dataset = raspagem.DatasetParquet(diretorio, linhas_grupo=1000, partes_maximas=100, linhas_memoria=50)
+    atualizar(dataset, [licitacoes(i, i + 40) for i in range(0, 600, 40)], '20240101T000000')
+
+    revisao = raspagem.DatasetParquet(diretorio, linhas_grupo=1000, partes_maximas=100, linhas_memoria=50)
+    atualizar(revisao, [licitacoes(100, 160, 'revisado'), licitacoes(600, 620)], '20240102T000000')
+
+    df = pd.read_parquet(f"{diretorio}/licitacoes").set_index('numero_controle_pncp')
+    assert len(df) == 620 and df.index.is_unique
+    assert (df['objeto'].str.startswith('revisado') == [100 <= int(n[:14]) < 160 for n in df.index]).all()
+    assert set(df['uf'].astype(str)) == set(UFS)
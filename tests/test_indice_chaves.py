@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+Testes do IndiceChaves e do seu uso como índice de chaves do ArmazenamentoTSV.
+"""
+
+import json
+import logging
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import raspagem
+
+def chaves(inicio, fim):
+    return np.array([f"{i:06d}{raspagem.SEPARADOR_CHAVE}{i % 7}" for i in range(inicio, fim)], dtype=object)
+
+def itens(inicio, fim):
+    return pd.DataFrame({
+        'numero_controle_pncp': [f"{i:06d}" for i in range(inicio, fim)],
+        'numeroItem': [str(i % 7) for i in range(inicio, fim)],
+        'descricao': [f"item {i}" for i in range(inicio, fim)],
+    })
+
+def test_resumo_tem_algoritmo_fixo():
+    # O índice persistido depende de resumos que não mudam entre versões do Python ou do pandas
+    assert raspagem.resumos_chaves(['00001\x1f1'])[0].hex() == '2c9e475175c8afe99bd72f9ba44438ff'
+
+def test_contem_adicionar_e_persistir(tmp_path):
+    caminho = str(tmp_path / 'indice')
+    indice = raspagem.IndiceChaves(caminho)
+    indice.reconstruir([chaves(0, 1000), chaves(1000, 2000)], 'marca-1')
+    assert len(indice) == 2000
+    assert indice.contem(chaves(0, 2000)).all()
+    assert not indice.contem(chaves(2000, 4000)).any()
+
+    indice.adicionar(chaves(1990, 2100))
+    assert len(indice) == 2100 and len(indice.delta) == 100
+    indice.salvar('marca-2')
+
+    reaberto = raspagem.IndiceChaves(caminho)
+    assert reaberto.marca == 'marca-2'
+    assert len(reaberto) == 2100
+    assert reaberto.contem(chaves(0, 2100)).all()
+    assert not reaberto.contem(chaves(2100, 3000)).any()
+
+def test_delta_e_fundido_ao_vetor_principal(tmp_path, monkeypatch):
+    monkeypatch.setattr(raspagem, 'LIMITE_DELTA_INDICE', 50)
+    caminho = str(tmp_path / 'indice')
+    indice = raspagem.IndiceChaves(caminho)
+    indice.reconstruir([chaves(0, 200)], 'm')
+    indice.adicionar(chaves(200, 260))
+    indice.salvar('m')
+    assert len(indice.principal) == 260 and len(indice.delta) == 0
+    reaberto = raspagem.IndiceChaves(caminho)
+    assert reaberto.contem(chaves(0, 260)).all()
+    assert not reaberto.contem(chaves(260, 1000)).any()
+
+def test_filtro_de_bloom_descarta_quase_todas_as_chaves_ausentes(tmp_path):
+    indice = raspagem.IndiceChaves(str(tmp_path / 'indice'))
+    indice.reconstruir([chaves(0, 20000)], 'm')
+    ausentes = raspagem.resumos_chaves(chaves(20000, 40000))
+    assert indice._no_bloom(ausentes).mean() < 0.03
+
+@pytest.mark.parametrize('metadados', [
+    {'algoritmo': 'siphash-64', 'chaves': 100, 'marca': 'm'},
+    {'chaves': 100, 'marca': 'm'},
+    {'algoritmo': raspagem.ALGORITMO_RESUMO, 'chaves': 99, 'marca': 'm'},
+])
+def test_indice_incompativel_e_descartado(tmp_path, metadados):
+    caminho = str(tmp_path / 'indice')
+    raspagem.IndiceChaves(caminho).reconstruir([chaves(0, 100)], 'm')
+    with open(f"{caminho}.json", 'w', encoding='utf-8') as f:
+        json.dump(metadados, f)
+    indice = raspagem.IndiceChaves(caminho)
+    assert indice.marca is None and len(indice) == 0
+
+def test_tsv_reabre_o_indice_sem_reconstruir(paths, caplog):
+    armazenamento = raspagem.ArmazenamentoTSV(paths)
+    armazenamento.upsert('itens', itens(0, 500))
+    armazenamento.fechar()
+
+    caplog.set_level(logging.INFO)
+    reaberto = raspagem.ArmazenamentoTSV(paths)
+    assert reaberto.contar('itens') == 500
+    assert not [r for r in caplog.records if 'reconstruído' in r.getMessage()]
+    reaberto.upsert('itens', itens(400, 600))
+    reaberto.fechar()
+    assert len(pd.read_csv(paths['itens_csv'], sep='\t', dtype=str)) == 600
+
+@pytest.mark.parametrize('alteracao', ['tsv_alterado', 'outro_algoritmo'])
+def test_tsv_reconstroi_indice_desatualizado(paths, caplog, alteracao):
+    armazenamento = raspagem.ArmazenamentoTSV(paths)
+    armazenamento.upsert('itens', itens(0, 500))
+    armazenamento.fechar()
+    if alteracao == 'tsv_alterado':
+        # Linhas acrescentadas ao TSV sem passar pelo armazenamento (ex.: execução interrompida)
+        raspagem.normalizar_para_texto(itens(500, 520), 'itens').reindex(
+            columns=pd.read_csv(paths['itens_csv'], sep='\t', nrows=0).columns
+        ).to_csv(paths['itens_csv'], sep='\t', mode='a', header=False, index=False)
+    else:
+        caminho = f"{paths['indices_directory']}/itens.json"
+        with open(caminho, encoding='utf-8') as f:
+            metadados = json.load(f)
+        metadados['algoritmo'] = 'siphash-64'
+        with open(caminho, 'w', encoding='utf-8') as f:
+            json.dump(metadados, f)
+
+    caplog.set_level(logging.INFO)
+    reaberto = raspagem.ArmazenamentoTSV(paths)
+    total = 520 if alteracao == 'tsv_alterado' else 500
+    assert reaberto.contar('itens') == total
+    assert [r for r in caplog.records if 'reconstruído' in r.getMessage()]
+    # Chaves já gravadas continuam reconhecidas: o upsert não duplica linhas
+    reaberto.upsert('itens', itens(0, 520))
+    reaberto.fechar()
+    assert len(pd.read_csv(paths['itens_csv'], sep='\t', dtype=str)) == 520
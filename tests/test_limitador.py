@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+Testes do LimitadorAdaptativo (AIMD), isolado e contra o servidor falso que responde 429 com Retry-After.
+"""
+
+import asyncio
+import time
+
+import raspagem
+from benchmark import ServidorPNCPFalso, criar_config, registros_sinteticos
+
+def criar_limitador(inicial=16, minimo=1, maximo=64, latencia_alvo=1.0, taxa_erro_maxima=0.5):
+    return raspagem.LimitadorAdaptativo(inicial, minimo, maximo, latencia_alvo, taxa_erro_maxima)
+
+def test_reduz_pela_metade_em_429_503_e_timeout():
+    for falha in ({'status': 429}, {'status': 503}, {'timeout': True}):
+        limitador = criar_limitador()
+        limitador.registrar_falha(0.01, **falha)
+        assert limitador.limite == 8
+
+def test_reduz_uma_vez_por_ida_e_volta():
+    limitador = criar_limitador()
+    limitador.registrar_falha(0.01, status=429)
+    limitador.registrar_falha(0.01, status=503)
+    limitador.registrar_falha(0.01, timeout=True)
+    assert limitador.limite == 8
+    # Passado o intervalo de ida e volta (max(p95, 1s)), uma nova falha volta a reduzir
+    limitador.ultima_reducao -= 1.0
+    limitador.registrar_falha(0.01, status=429)
+    assert limitador.limite == 4
+
+def test_reducao_respeita_o_minimo():
+    limitador = criar_limitador(inicial=3, minimo=2)
+    limitador.registrar_falha(0.01, status=429)
+    assert limitador.limite == 2
+
+def test_cresce_de_forma_aditiva_quando_saudavel():
+    limitador = criar_limitador(inicial=4)
+    # Sem amostras suficientes na janela, o limite não muda
+    for _ in range(9):
+        limitador.registrar_sucesso(0.01)
+    assert limitador.limite == 4
+    limite = limitador.limite
+    for _ in range(20):
+        anterior = limitador.limite
+        limitador.registrar_sucesso(0.01)
+        # Cada resposta saudável soma 1/limite: cerca de +1 a cada 'limite' respostas
+        assert limitador.limite == anterior + 1.0 / anterior
+    assert limite + 3 < limitador.limite < limite + 5
+
+def test_nao_cresce_com_latencia_acima_do_alvo():
+    limitador = criar_limitador(inicial=4, latencia_alvo=0.1)
+    for _ in range(50):
+        limitador.registrar_sucesso(0.5)
+    assert limitador.limite == 4
+
+def test_nao_cresce_alem_do_maximo():
+    limitador = criar_limitador(inicial=8, maximo=8)
+    for _ in range(50):
+        limitador.registrar_sucesso(0.01)
+    assert limitador.limite == 8
+
+def test_retry_after_suspende_novas_requisicoes():
+    async def cenario():
+        limitador = criar_limitador()
+        inicio = time.monotonic()
+        limitador.registrar_falha(0.01, status=429, retry_after=0.3)
+        await limitador.adquirir()
+        return time.monotonic() - inicio
+
+    assert asyncio.run(cenario()) >= 0.3
+
+class LimitadorRegistrado(raspagem.LimitadorAdaptativo):
+    """
+    Registra o instante de início de cada requisição e as pausas pedidas pelo servidor.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.inicios = []
+        self.pausas = []
+        self.limites = []
+
+    async def adquirir(self):
+        await super().adquirir()
+        self.inicios.append(time.monotonic())
+
+    def registrar_falha(self, latencia, status=None, retry_after=None, timeout=False):
+        super().registrar_falha(latencia, status, retry_after, timeout)
+        if retry_after:
+            self.pausas.append((time.monotonic(), self.pausa_ate))
+        self.limites.append(self.limite)
+
+def test_limitador_contra_servidor_com_limitacao():
+    async def cenario():
+        servidor = await ServidorPNCPFalso(latencia=0.02, capacidade=2, retry_after=0.5).iniciar()
+        try:
+            config = criar_config(servidor.url_base, numero_maximo_conexoes=8, concorrencia_maxima=8,
+                                  tentativas_maximas=8, latencia_alvo_p95=0.5)
+            limitador = LimitadorRegistrado(8, 1, 8, 0.5, 0.05)
+            registros = registros_sinteticos(30)
+            concluidas = 0
+            async with raspagem.criar_sessao(config) as session:
+                async for _, itens in raspagem.fetch_detalhes(session, limitador, registros, 'itens', config):
+                    concluidas += itens is not None
+            return servidor, limitador, concluidas
+        finally:
+            await servidor.parar()
+
+    servidor, limitador, concluidas = asyncio.run(cenario())
+    assert concluidas == 30
+    assert servidor.limitadas > 0 and limitador.pausas
+    # As respostas 429 reduziram o limite abaixo do inicial
+    assert min(limitador.limites) < 8
+    # Nenhuma requisição começa entre o recebimento de um 429 e o fim do Retry-After
+    for recebido, prazo in limitador.pausas:
+        assert not [inicio for inicio in limitador.inicios if recebido < inicio < prazo]
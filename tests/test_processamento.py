@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""
+Testes do processamento das respostas da busca de licitações.
+"""
+
+import raspagem
+
+def licitacao(numero, atualizacao, objeto):
+    registro = {'numero_controle_pncp': numero, 'objeto': objeto}
+    if atualizacao:
+        registro['data_atualizacao_pncp'] = atualizacao
+    return registro
+
+def test_licitacao_repetida_no_lote_mantem_a_versao_mais_recente():
+    respostas = [
+        {'items': [licitacao('a', '2024-01-02T00:00:00', 'nova'), licitacao('b', None, 'b')]},
+        {'items': [licitacao('a', '2024-01-01T00:00:00', 'antiga'), licitacao('c', '2024-01-01T00:00:00', 'c')]},
+        {'items': [licitacao('c', '2024-01-01T00:00:00', 'c repetida')]},
+    ]
+    df = raspagem.process_licitacoes(respostas).set_index('numero_controle_pncp')
+    assert list(df.index) == ['a', 'b', 'c']
+    assert df.loc['a', 'objeto'] == 'nova'
+    # Com a mesma data de atualização, fica a última versão recebida
+    assert df.loc['c', 'objeto'] == 'c repetida'
+    # A impressão digital gravada é a da versão mantida
+    assert df.loc['a', raspagem.COLUNA_IMPRESSAO] == raspagem.impressao_digital(respostas[0]['items'][0])
+
+def test_respostas_sem_registros():
+    assert raspagem.process_licitacoes([None, {'items': []}]).empty
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Testes de fetch_with_retry e fetch_paginado contra um servidor aiohttp mínimo.
+"""
+
+import asyncio
+import collections
+
+from aiohttp import web
+
+import raspagem
+from benchmark import criar_config
+
+REGISTROS = list(range(5))
+
+async def servidor_paginas(requisicoes):
+    """
+    Sobe um servidor em que itens e arquivos têm 5 registros, sem total nas respostas; só os
+    itens publicam '/quantidade'.
+    """
+    async def pagina(request):
+        requisicoes[request.path] += 1
+        numero = int(request.query['pagina'])
+        tamanho = int(request.query['tamanhoPagina'])
+        return web.json_response(REGISTROS[(numero - 1) * tamanho:numero * tamanho])
+
+    async def quantidade(request):
+        requisicoes[request.path] += 1
+        return web.json_response(len(REGISTROS))
+
+    async def ausente(request):
+        requisicoes[request.path] += 1
+        return web.Response(status=404)
+
+    app = web.Application()
+    app.router.add_get('/compra/itens', pagina)
+    app.router.add_get('/compra/itens/quantidade', quantidade)
+    app.router.add_get('/compra/arquivos', pagina)
+    app.router.add_get('/compra/arquivos/quantidade', ausente)
+    app.router.add_get('/ausente', ausente)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    return runner, f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+
+def executar(corrotina):
+    async def cenario():
+        requisicoes = collections.Counter()
+        runner, url_base = await servidor_paginas(requisicoes)
+        try:
+            config = criar_config(url_base, tentativas_maximas=3)
+            limitador = raspagem.criar_limitador(config)
+            async with raspagem.criar_sessao(config) as session:
+                resultado = await corrotina(session, limitador, config, url_base)
+            return resultado, requisicoes
+        finally:
+            await runner.cleanup()
+    return asyncio.run(cenario())
+
+def test_erro_4xx_nao_e_retentado():
+    async def corrotina(session, limitador, config, url_base):
+        return await raspagem.fetch_with_retry(session, f"{url_base}/ausente", None, config, limitador=limitador)
+
+    resultado, requisicoes = executar(corrotina)
+    assert resultado is None
+    assert requisicoes['/ausente'] == 1
+
+def test_quantidade_consultada_so_para_itens():
+    async def corrotina(session, limitador, config, url_base):
+        params = {'pagina': 1, 'tamanhoPagina': 2}
+        itens = await raspagem.fetch_paginado(limitador, session, f"{url_base}/compra/itens", params, config)
+        arquivos = await raspagem.fetch_paginado(limitador, session, f"{url_base}/compra/arquivos", params, config)
+        return itens, arquivos
+
+    (itens, arquivos), requisicoes = executar(corrotina)
+    assert itens == arquivos == REGISTROS
+    # Itens: primeira página, quantidade e as 2 páginas restantes em paralelo
+    assert requisicoes['/compra/itens/quantidade'] == 1
+    assert requisicoes['/compra/itens'] == 3
+    # Arquivos: sem consulta à quantidade, páginas em sequência até uma incompleta
+    assert requisicoes['/compra/arquivos/quantidade'] == 0
+    assert requisicoes['/compra/arquivos'] == 3
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+Testes da retomada de uma execução interrompida pelo DiarioExecucao.
+"""
+
+import asyncio
+
+import pytest
+
+import raspagem
+from benchmark import ServidorPNCPFalso, criar_config
+
+class QuedaSimulada(Exception):
+    pass
+
+class ServidorRegistrado(ServidorPNCPFalso):
+    """
+    Servidor falso que registra as páginas de busca e as licitações cujos itens foram requisitados.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.paginas_buscadas = []
+        self.itens_requisitados = []
+
+    async def busca(self, request):
+        self.paginas_buscadas.append(int(request.query['pagina']))
+        return await super().busca(request)
+
+    async def itens(self, request):
+        self.itens_requisitados.append(request.match_info['seq'])
+        return await super().itens(request)
+
+class ArmazenamentoInterrompido(raspagem.ArmazenamentoSQLite):
+    """
+    Simula a morte do processo: a partir do salvamento de número 'queda', o lote não é confirmado
+    e a execução é interrompida.
+    """
+
+    def __init__(self, caminho_banco, queda):
+        super().__init__(caminho_banco)
+        self.queda = queda
+        self.salvamentos = 0
+
+    def salvar(self):
+        self.salvamentos += 1
+        if self.salvamentos >= self.queda:
+            self.conexao.rollback()
+            raise QuedaSimulada()
+        super().salvar()
+
+def test_diario_pula_apenas_os_trabalhos_concluidos(tmp_path):
+    caminho = str(tmp_path / 'diario.db')
+    diario = raspagem.DiarioExecucao(caminho)
+    assert not diario.retomada
+    diario.concluir('licitacoes', [('edital', 'data', 1, 20), ('edital', 'data', 2, 20)])
+    # Um trabalho concluído que depois falhou vale pelo estado mais recente
+    diario.registrar('licitacoes', ('edital', 'data', 2, 20), 'falha')
+    diario.registrar('licitacoes', ('edital', 'data', 3, 20), 'pendente')
+    diario.confirmar()
+    # Estados ainda no buffer quando o processo morre se perdem, mas não viram 'ok'
+    diario.registrar('licitacoes', ('edital', 'data', 4, 20), 'ok')
+    diario.conexao.close()
+
+    retomado = raspagem.DiarioExecucao(caminho)
+    assert retomado.retomada and retomado.execucao == diario.execucao
+    assert retomado.concluido('licitacoes', ('edital', 'data', 1, 20))
+    for pagina in (2, 3, 4):
+        assert not retomado.concluido('licitacoes', ('edital', 'data', pagina, 20))
+    retomado.finalizar()
+    retomado.fechar()
+
+    # Depois de finalizada, a próxima abertura começa uma execução nova
+    nova = raspagem.DiarioExecucao(caminho)
+    assert not nova.retomada and nova.execucao != diario.execucao
+    assert not nova.concluido('licitacoes', ('edital', 'data', 1, 20))
+    nova.fechar()
+
+# 10 páginas de busca são gravadas uma a uma: a queda 3 ocorre na busca, a 14 na etapa de itens
+@pytest.mark.parametrize('queda', [3, 14])
+def test_execucao_interrompida_e_retomada(tmp_path, queda):
+    """
+    Interrompe a raspagem no meio (na gravação de licitações ou de detalhes) e a retoma com o
+    mesmo diário e o mesmo banco: o resultado final é o de uma execução sem interrupção, e as
+    páginas de busca concluídas antes da queda não são requisitadas de novo.
+    """
+    caminho_banco = str(tmp_path / 'raspagem.db')
+    caminho_diario = str(tmp_path / 'diario.db')
+    paginas = 10
+
+    async def executar(servidor, armazenamento, diario):
+        config = criar_config(servidor.url_base, pagina_inicial=1, pagina_final=paginas + 1, tam_pagina=20,
+                              tipos_documento=['edital'], ordenacao=['data'], tamanho_lote_gravacao=20,
+                              filtro_resultados=False)
+        await raspagem.executar_raspagem(config, armazenamento, diario)
+
+    async def cenario():
+        servidor = await ServidorRegistrado(latencia=0, itens_por_licitacao=2, total_licitacoes=paginas * 20).iniciar()
+        try:
+            armazenamento = ArmazenamentoInterrompido(caminho_banco, queda)
+            diario = raspagem.DiarioExecucao(caminho_diario)
+            with pytest.raises(QuedaSimulada):
+                await executar(servidor, armazenamento, diario)
+            armazenamento.conexao.close()
+            diario.conexao.close()
+
+            diario = raspagem.DiarioExecucao(caminho_diario)
+            paginas_concluidas = sum(etapa == 'licitacoes' for etapa, _ in diario.concluidos)
+            armazenamento = raspagem.ArmazenamentoSQLite(caminho_banco)
+            # Licitações cujos itens já estavam gravados antes da queda
+            com_itens = 0
+            if armazenamento._existe('licitacoes'):
+                com_itens = armazenamento.contar('licitacoes') - armazenamento.contar_pendentes('licitacoes', 'detalhes_baixados')
+            servidor.paginas_buscadas = []
+            servidor.itens_requisitados = []
+            await executar(servidor, armazenamento, diario)
+            return diario, armazenamento, paginas_concluidas, com_itens, servidor
+        finally:
+            await servidor.parar()
+
+    diario, armazenamento, paginas_concluidas, com_itens, servidor = asyncio.run(cenario())
+    buscas = servidor.paginas_buscadas
+    assert diario.retomada
+    assert paginas_concluidas > 0
+    assert len(buscas) == len(set(buscas)) == paginas - paginas_concluidas
+    # Os itens só são requisitados, uma vez, para as licitações que ainda não os tinham
+    assert len(servidor.itens_requisitados) == len(set(servidor.itens_requisitados)) == paginas * 20 - com_itens
+    if queda > paginas:
+        assert com_itens > 0
+    assert armazenamento.contar('licitacoes') == paginas * 20
+    assert armazenamento.contar('itens') == paginas * 20 * 2
+    assert armazenamento.contar_pendentes('licitacoes', 'detalhes_baixados') == 0
+    assert armazenamento.contar_pendentes('licitacoes', 'documentos_baixados') == 0
+    assert armazenamento.contar_pendentes('itens', 'Resultados verificados') == 0
+    armazenamento.fechar()
+    diario.fechar()
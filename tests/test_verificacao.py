@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Testes da verificação de arquivos compactados (verify_compressed_files) contra o servidor falso.
+"""
+
+import asyncio
+import logging
+import os
+import zipfile
+
+import pandas as pd
+import pytest
+from aiohttp import web
+
+import raspagem
+from benchmark import ServidorPNCPFalso, criar_config
+
+def arquivos(url_base, quantidade):
+    # Metade compactados, metade PDFs, que a verificação deve ignorar
+    return pd.DataFrame([
+        {
+            'numero_controle_pncp': f"{i:014d}-1-{i:06d}/2024",
+            'sequencialDocumento': '1',
+            'titulo': f"edital_{i}.{'zip' if i % 2 else 'pdf'}",
+            'url': f"{url_base}/arquivos/grande.zip",
+        }
+        for i in range(quantidade)
+    ])
+
+def gerar_zip(diretorio):
+    os.makedirs(diretorio)
+    with zipfile.ZipFile(os.path.join(diretorio, 'grande.zip'), 'w') as arquivo_zip:
+        for i in range(3):
+            arquivo_zip.writestr(f"anexo_{i:03d}.pdf", b'%PDF' + bytes(1024))
+
+def criar(backend, paths, tmp_path):
+    if backend == 'tsv':
+        return raspagem.ArmazenamentoTSV(paths, tamanho_lote=7)
+    return raspagem.ArmazenamentoSQLite(str(tmp_path / 'raspagem.db'))
+
+@pytest.mark.parametrize('backend', ['sqlite', 'tsv'])
+def test_verificacao_em_lotes(backend, paths, tmp_path, caplog):
+    async def cenario():
+        servidor = await ServidorPNCPFalso(latencia=0).iniciar()
+        servidor.diretorio_arquivos = str(tmp_path / 'servidor')
+        gerar_zip(servidor.diretorio_arquivos)
+        armazenamento = criar(backend, paths, tmp_path)
+        try:
+            armazenamento.upsert('arquivos', arquivos(servidor.url_base, 30))
+            config = criar_config(servidor.url_base, tamanho_lote_gravacao=4, conexoes_arquivos=3)
+            async with raspagem.criar_sessao(config) as session:
+                await raspagem.verify_compressed_files(session, armazenamento, config)
+            return pd.concat(armazenamento.iterar('arquivos', 100), ignore_index=True)
+        finally:
+            armazenamento.fechar()
+            await servidor.parar()
+
+    caplog.set_level(logging.INFO)
+    df = asyncio.run(cenario()).set_index('numero_controle_pncp').sort_index()
+    assert any('Iniciando verificação de 15 arquivos compactados' in r.getMessage() for r in caplog.records)
+    compactados = df.iloc[1::2]
+    assert compactados['verificacao_arquivos'].isin(['True', '1']).all()
+    assert compactados['titulo'].str.endswith(', anexo_000.pdf,anexo_001.pdf,anexo_002.pdf').all()
+    # Os PDFs não são tocados e continuam pendentes
+    pdfs = df.iloc[::2]
+    assert not pdfs['verificacao_arquivos'].isin(['True', '1']).any()
+    assert pdfs['titulo'].str.fullmatch(r'edital_\d+\.pdf').all()
+
+def test_trecho_sem_tamanho_total_baixa_o_arquivo_completo(tmp_path):
+    gerar_zip(str(tmp_path / 'servidor'))
+    with open(tmp_path / 'servidor' / 'grande.zip', 'rb') as f:
+        conteudo = f.read()
+    requisicoes = []
+
+    async def arquivo(request):
+        # Responde ao Range com a cauda pedida, mas sem informar o tamanho total
+        intervalo = request.headers.get('Range')
+        requisicoes.append(intervalo)
+        if intervalo:
+            cauda = conteudo[request.http_range]
+            inicio = len(conteudo) - len(cauda)
+            return web.Response(status=206, body=cauda, headers={'Content-Range': f"bytes {inicio}-{len(conteudo) - 1}/*"})
+        return web.Response(body=conteudo)
+
+    async def cenario():
+        app = web.Application()
+        app.router.add_get('/grande.zip', arquivo)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        url_base = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+        try:
+            config = criar_config(url_base)
+            async with raspagem.criar_sessao(config) as session:
+                return await raspagem.listar_arquivo_remoto(session, f"{url_base}/grande.zip", 'edital.zip', config)
+        finally:
+            await runner.cleanup()
+
+    arquivos_internos, baixados, tamanho = asyncio.run(cenario())
+    assert arquivos_internos == ['anexo_000.pdf', 'anexo_001.pdf', 'anexo_002.pdf']
+    assert baixados == tamanho == len(conteudo)
+    assert requisicoes == [f"bytes=-{raspagem.TAMANHO_BLOCO_REMOTO}", None]